@@ -1,13 +1,23 @@
 from playwright.sync_api import sync_playwright
 import json
 import os
-from pathlib import Path
 import getpass
+import re
 import time
 import sys
 
-# Fixed data directory for all credentials
-DATA_DIR = Path(r"C:\Users\MenaceXnadin\Documents\merosharedata")
+from nepse_resilience import (
+    RetryPolicy,
+    CircuitBreaker,
+    RateGovernor,
+    PermanentError,
+    retry_call,
+)
+from nepse_events import NULL_EVENTS, elapsed_ms
+from nepse_config import DATA_DIR, DEFAULT_MAX_TABS
+from nepse_dp import load_dp_directory
+from nepse_portfolio import save_holdings
+
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG_FILE = DATA_DIR / "family_members.json"
@@ -72,13 +82,9 @@ def add_family_member():
             break
     
     print("\n--- Meroshare Credentials ---")
-    print("Common DPs (or use option 6 to see all):")
-    print("  139  - CREATIVE SECURITIES PRIVATE LIMITED (13300)")
-    print("  146  - GLOBAL IME CAPITAL LIMITED (11200)")
-    print("  175  - NMB CAPITAL LIMITED (11000)")
-    print("  190  - SIDDHARTHA CAPITAL LIMITED (10900)\n")
+    print("Search DPs with 'nepse dp-list --search <name>' (or option 6)\n")
     
-    dp_value = input("Enter DP value (e.g., 139): ").strip()
+    dp_value = prompt_dp_value()
     username = input("Enter username: ").strip()
     password = getpass.getpass("Enter password: ")
     pin = getpass.getpass("Enter 4-digit transaction PIN: ")
@@ -1128,9 +1134,23 @@ def apply_ipo(auto_load=True, headless=False):
         finally:
             browser.close()
 
-def get_portfolio_for_member(member, headless=False):
-    """Get portfolio for a specific family member"""
+def get_portfolio_for_member(member, headless=False, events=NULL_EVENTS):
+    """
+    Get portfolio for a specific family member
+    
+    Args:
+        member: Family member dict
+        headless: Run browser in headless mode (no GUI)
+        events: EventStream receiving login/portfolio/result events
+    
+    Returns:
+        List of holding dicts, or None if the portfolio could not be fetched
+    """
     print(f"\nFetching portfolio for: {member['name']}...")
+    started = time.monotonic()
+    holdings = None
+    error = None
+    logged_in = False
     
     # Call existing get_portfolio but with member's credentials passed directly
     # We'll modify it to accept parameters
@@ -1145,6 +1165,7 @@ def get_portfolio_for_member(member, headless=False):
             password = member['password']
             
             print(); print_progress(1, 7, "Navigating to Meroshare...")
+            MEROSHARE_GOVERNOR.login()
             page.goto("https://meroshare.cdsc.com.np/#/login", wait_until="networkidle")
             time.sleep(2)
             
@@ -1208,9 +1229,12 @@ def get_portfolio_for_member(member, headless=False):
             time.sleep(2)
             
             print(f"✓ Logged in as {member['name']}")
+            logged_in = True
+            events.emit("login", member=member['name'], ok=True, elapsed_ms=elapsed_ms(started))
             
             # Navigate to portfolio
             print("\n📊 Navigating to Portfolio...")
+            MEROSHARE_GOVERNOR.request()
             page.goto("https://meroshare.cdsc.com.np/#/portfolio", wait_until="networkidle")
             time.sleep(3)
             
@@ -1219,6 +1243,8 @@ def get_portfolio_for_member(member, headless=False):
             time.sleep(2)
             
             rows = page.query_selector_all("table.table tbody:first-of-type tr")
+            holdings = []
+            total_value_ltp = 0.0
             
             if rows and len(rows) > 0:
                 print("\n" + "="*120)
@@ -1227,8 +1253,6 @@ def get_portfolio_for_member(member, headless=False):
                 print(f"{'#':<5} {'Scrip':<12} {'Balance':<12} {'Last Price':<12} {'Value(Last)':<15} {'LTP':<12} {'Value(LTP)':<15}")
                 print("-"*120)
                 
-                total_value_ltp = 0.0
-                
                 for row in rows:
                     cells = row.query_selector_all("td")
                     if cells and len(cells) >= 7:
@@ -1247,24 +1271,59 @@ def get_portfolio_for_member(member, headless=False):
                         except:
                             pass
                         
+                        holdings.append({
+                            "scrip": scrip,
+                            "current_balance": balance,
+                            "last_closing_price": last_price,
+                            "value_as_of_last_price": value_last,
+                            "last_transaction_price": ltp,
+                            "value_as_of_ltp": value_ltp
+                        })
                         print(f"{num:<5} {scrip:<12} {balance:<12} {last_price:<12} {value_last:<15} {ltp:<12} {value_ltp:<15}")
                 
                 print("-"*120)
                 print(f"{'TOTAL':<71} Rs. {total_value_ltp:,.2f}")
                 print("="*120)
             
+            events.emit("portfolio", member=member['name'], ok=True, holdings=holdings,
+                        total_value_ltp=round(total_value_ltp, 2), elapsed_ms=elapsed_ms(started))
+            # Keep a snapshot so `nepse value` can revalue without logging in
+            save_holdings(member['name'], holdings)
+            
             if not headless:
                 print("\nBrowser will stay open for 20 seconds...")
                 time.sleep(20)
                 
         except Exception as e:
             print(f"\n✗ Error: {e}")
+            error = str(e)
+            if not logged_in:
+                events.emit("login", member=member['name'], ok=False, error=error,
+                            elapsed_ms=elapsed_ms(started))
         finally:
             browser.close()
+    
+    events.emit("result", member=member['name'], ok=error is None, error=error,
+                elapsed_ms=elapsed_ms(started))
+    # Holdings parsed before a failure are incomplete
+    return holdings if error is None else None
 
-def test_login_for_member(member, headless=True):
-    """Test login for a specific family member"""
+def test_login_for_member(member, headless=True, events=NULL_EVENTS):
+    """
+    Test login for a specific family member
+    
+    Args:
+        member: Family member dict
+        headless: Run browser in headless mode (no GUI)
+        events: EventStream receiving a 'login' event
+    
+    Returns:
+        True if the login succeeded
+    """
     print(f"\nTesting login for: {member['name']}...")
+    started = time.monotonic()
+    success = False
+    error = None
     
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless, slow_mo=100 if not headless else 0)
@@ -1277,6 +1336,7 @@ def test_login_for_member(member, headless=True):
             password = member['password']
             
             print(); print_progress(1, 7, "Navigating to Meroshare...")
+            MEROSHARE_GOVERNOR.login()
             page.goto("https://meroshare.cdsc.com.np/#/login", wait_until="networkidle")
             time.sleep(2)
             
@@ -1368,8 +1428,10 @@ def test_login_for_member(member, headless=True):
             
             if "#/login" not in current_url.lower():
                 print(f"\n✓✓✓ LOGIN SUCCESSFUL for {member['name']}! ✓✓✓")
+                success = True
             else:
                 print(f"\n⚠ Login may have failed for {member['name']}")
+                error = _login_error_text(page) or "Still on login page"
                 page.screenshot(path=f"login_test_{member['name']}.png")
             
             if not headless:
@@ -1378,13 +1440,531 @@ def test_login_for_member(member, headless=True):
                 
         except Exception as e:
             print(f"\n✗ Error: {e}")
+            error = str(e)
             import traceback
             traceback.print_exc()
         finally:
             browser.close()
+    
+    events.emit("login", member=member['name'], ok=success, error=error,
+                elapsed_ms=elapsed_ms(started))
+    return success
+
+# Retry policies for apply-all steps; the breaker is shared by every worker
+LOGIN_RETRY = RetryPolicy(max_attempts=3, base_delay=3.0)
+LISTING_RETRY = RetryPolicy(max_attempts=3, base_delay=2.0)
+SUBMIT_RETRY = RetryPolicy(max_attempts=3, base_delay=5.0)
+MEROSHARE_BREAKER = CircuitBreaker("meroshare", failure_threshold=5, reset_timeout=30.0)
+
+# Request/login rate limits shared by every worker thread and process
+MEROSHARE_GOVERNOR = RateGovernor(
+    "meroshare.cdsc.com.np",
+    requests_per_sec=2.0,
+    logins_per_sec=0.33,
+    state_dir=DATA_DIR / "ratelimit",
+)
+
+def _with_attempts(policy, retries):
+    """Return a copy of a retry policy with a different attempt count"""
+    if retries is None:
+        return policy
+    return RetryPolicy(retries, policy.base_delay, policy.max_delay, policy.jitter)
+
+def _retry_notice(label):
+    """Build an on_retry callback that prints a one-line retry notice"""
+    def notice(attempt, error, delay):
+        print(f"{label} ⚠ attempt {attempt} failed: {error} - retrying in {delay:.1f}s")
+    return notice
+
+def _close_page(page):
+    """Close a browser tab, ignoring errors from already-closed pages"""
+    try:
+        page.close()
+    except:
+        pass
+
+def _login_error_text(page):
+    """Return the first visible login error/toast message, if any"""
+    try:
+        errors = page.query_selector_all("#toast-container .toast-message, .toast-error, .alert-danger, .invalid-feedback")
+        for error in errors:
+            text = error.inner_text().strip()
+            if text:
+                return text
+    except:
+        pass
+    return ""
+
+def _open_issue_list(page, label, policy=LISTING_RETRY):
+    """
+    Navigate to the ASBA page and wait for the issue list, with retries
+    
+    Raises PermanentError when Meroshare reports 'No Data Available'.
+    """
+    def attempt_listing(attempt):
+        MEROSHARE_GOVERNOR.request()
+        page.goto("https://meroshare.cdsc.com.np/#/asba", wait_until="networkidle")
+        time.sleep(3)
+        try:
+            page.wait_for_selector(".company-list", timeout=10000)
+        except Exception:
+            if page.query_selector("text=No Data Available"):
+                raise PermanentError("No Data Available")
+            raise
+        time.sleep(2)
+    
+    retry_call(attempt_listing, policy, MEROSHARE_BREAKER, on_retry=_retry_notice(f"{label} Issue list"))
+
+def _login_member_tab(context, member, tab_index, policy=LOGIN_RETRY, events=NULL_EVENTS):
+    """
+    Open a new tab and log a family member into Meroshare
+    
+    Transient failures are retried per ``policy``; a login rejected with an
+    error message is not retried so accounts don't get locked.
+    
+    Args:
+        context: Playwright browser context to open the tab in
+        member: Family member dict
+        tab_index: 1-based tab number used in log messages
+        policy: RetryPolicy for the login step
+        events: EventStream receiving a 'login' event
+    
+    Returns:
+        dict with success flag, member, page, tab_index and optional error
+    """
+    member_name = member['name']
+    page = context.new_page()
+    started = time.monotonic()
+    attempts = [0]
+    
+    def attempt_login(attempt):
+        attempts[0] = attempt
+        print(f"[Tab {tab_index}] Starting login for: {member_name}" + (f" (attempt {attempt})" if attempt > 1 else ""))
+        
+        # Navigate
+        MEROSHARE_GOVERNOR.login()
+        page.goto("https://meroshare.cdsc.com.np/#/login", wait_until="networkidle")
+        time.sleep(2)
+        
+        # Select DP
+        page.click("span.select2-selection")
+        time.sleep(1)
+        page.wait_for_selector(".select2-results", timeout=5000)
+        
+        search_box = page.query_selector("input.select2-search__field")
+        if search_box:
+            search_box.type(member['dp_value'])
+            time.sleep(0.5)
+            first_result = page.query_selector("li.select2-results__option--highlighted, li.select2-results__option[aria-selected='true']")
+            if first_result:
+                first_result.click()
+            else:
+                page.keyboard.press("Enter")
+        time.sleep(1)
+        
+        # Fill username
+        username_selectors = [
+            "input[formcontrolname='username']",
+            "input#username",
+            "input[placeholder*='User']"
+        ]
+        for selector in username_selectors:
+            try:
+                page.fill(selector, member['username'], timeout=2000)
+                break
+            except:
+                continue
+        
+        # Fill password
+        password_selectors = [
+            "input[formcontrolname='password']",
+            "input[type='password']"
+        ]
+        for selector in password_selectors:
+            try:
+                page.fill(selector, member['password'], timeout=2000)
+                break
+            except:
+                continue
+        
+        # Click login
+        login_button_selectors = [
+            "button.btn.sign-in",
+            "button[type='submit']",
+            "button:has-text('Login')"
+        ]
+        for selector in login_button_selectors:
+            try:
+                page.click(selector, timeout=2000)
+                break
+            except:
+                continue
+        
+        # Wait for login
+        try:
+            page.wait_for_function("window.location.hash !== '#/login'", timeout=8000)
+            time.sleep(2)
+        except:
+            time.sleep(2)
+        
+        # Check if logged in
+        if "#/login" not in page.url.lower():
+            return
+        
+        error_text = _login_error_text(page)
+        if error_text:
+            raise PermanentError(f"Login rejected: {error_text}")
+        raise Exception("Login did not complete")
+    
+    try:
+        retry_call(attempt_login, policy, MEROSHARE_BREAKER, on_retry=_retry_notice(f"[Tab {tab_index}] Login"))
+        print(f"✓ [Tab {tab_index}] Login successful: {member_name}")
+        page_data = {"success": True, "member": member, "page": page, "tab_index": tab_index}
+    except PermanentError as e:
+        print(f"✗ [Tab {tab_index}] Login failed: {member_name} - {e}")
+        page_data = {"success": False, "member": member, "page": page, "tab_index": tab_index, "error": str(e)}
+    except Exception as e:
+        print(f"✗ [Tab {tab_index}] Error logging in {member_name}: {e}")
+        page_data = {"success": False, "member": member, "page": page, "tab_index": tab_index, "error": str(e)}
+    
+    events.emit("login", member=member_name, tab=tab_index, ok=page_data['success'],
+                attempts=attempts[0], elapsed_ms=elapsed_ms(started), error=page_data.get('error'))
+    return page_data
+
+def _apply_ipo_on_page(page_data, selected_ipo, policy=SUBMIT_RETRY, listing_policy=LISTING_RETRY,
+                       events=NULL_EVENTS):
+    """
+    Apply the selected IPO from an already logged-in member tab
+    
+    Every attempt starts from the ASBA page and re-reads the ``btn-issue``
+    label first, so a retry never resubmits an application that already
+    went through.
+    
+    Args:
+        page_data: Successful login dict returned by _login_member_tab
+        selected_ipo: IPO dict with at least 'company_name'
+        policy: RetryPolicy for the whole apply step
+        listing_policy: RetryPolicy for loading the issue list
+        events: EventStream receiving an 'apply' event
+    
+    Returns:
+        Application result dict for the final summary
+    """
+    member = page_data['member']
+    page = page_data['page']
+    tab_index = page_data['tab_index']
+    member_name = member['name']
+    state = {"submit_clicked": False, "attempts": 0}
+    started = time.monotonic()
+    
+    print("\n" + "="*60)
+    print(f"[Tab {tab_index}] APPLYING FOR: {member_name}")
+    print("="*60)
+    
+    def attempt_apply(attempt):
+        state["attempts"] = attempt
+        
+        # Navigate to ASBA
+        print(f"[Tab {tab_index}] Navigating to IPO page...")
+        _open_issue_list(page, f"[Tab {tab_index}]", listing_policy)
+        
+        # Find the IPO and re-read its button label (idempotency check)
+        company_rows = page.query_selector_all(".company-list")
+        apply_button = None
+        button_text = ""
+        
+        for row in company_rows:
+            try:
+                company_name_elem = row.query_selector(".company-name span")
+                if company_name_elem and selected_ipo['company_name'] in company_name_elem.inner_text():
+                    apply_button = row.query_selector("button.btn-issue")
+                    if apply_button:
+                        button_text = apply_button.inner_text().strip().lower()
+                        break
+            except:
+                continue
+        
+        if not apply_button:
+            raise PermanentError("IPO not found in the list")
+        
+        # Button shows 'Edit'/'View' once an application exists
+        if "edit" in button_text or "view" in button_text:
+            if state["submit_clicked"]:
+                print(f"✓ [Tab {tab_index}] Earlier submission went through for {member_name} (button shows: '{button_text.title()}')")
+                return {"member": member_name, "success": True}
+            print(f"[Tab {tab_index}] ⚠ IPO already applied (button shows: '{button_text.title()}')")
+            print(f"[Tab {tab_index}] ✓ Skipping - IPO already applied for {member_name}")
+            return {"member": member_name, "success": True, "status": "already_applied"}
+        
+        print(f"[Tab {tab_index}] Clicking Apply button (button shows: '{button_text.title()}')...")
+        MEROSHARE_GOVERNOR.request()
+        apply_button.click()
+        time.sleep(3)
+        
+        # Fill form
+        print(f"[Tab {tab_index}] Filling application form...")
+        page.wait_for_selector("select#selectBank", timeout=10000)
+        time.sleep(2)
+        
+        # Select bank
+        bank_options = page.query_selector_all("select#selectBank option")
+        valid_banks = [opt for opt in bank_options if opt.get_attribute("value")]
+        if valid_banks:
+            page.select_option("select#selectBank", valid_banks[0].get_attribute("value"))
+        time.sleep(2)
+        
+        # Select account
+        page.wait_for_selector("select#accountNumber", timeout=5000)
+        account_options = page.query_selector_all("select#accountNumber option")
+        valid_accounts = [opt for opt in account_options if opt.get_attribute("value")]
+        if valid_accounts:
+            page.select_option("select#accountNumber", valid_accounts[0].get_attribute("value"))
+        time.sleep(2)
+        
+        # Fill kitta
+        print(f"[Tab {tab_index}] Kitta: {member['applied_kitta']}")
+        page.fill("input#appliedKitta", str(member['applied_kitta']))
+        time.sleep(1)
+        
+        # Fill CRN
+        print(f"[Tab {tab_index}] CRN: {member['crn_number']}")
+        page.fill("input#crnNumber", member['crn_number'])
+        time.sleep(1)
+        
+        # Accept disclaimer
+        disclaimer_checkbox = page.query_selector("input#disclaimer")
+        if disclaimer_checkbox:
+            disclaimer_checkbox.check()
+        time.sleep(1)
+        
+        # Click proceed
+        print(f"[Tab {tab_index}] Clicking Proceed...")
+        proceed_button = page.query_selector("button.btn-primary[type='submit']")
+        if proceed_button:
+            proceed_button.click()
+        time.sleep(3)
+        
+        # Enter PIN
+        print(f"[Tab {tab_index}] Entering transaction PIN...")
+        page.wait_for_selector("input#transactionPIN", timeout=10000)
+        time.sleep(2)
+        page.fill("input#transactionPIN", member['transaction_pin'])
+        time.sleep(2)
+        
+        # Submit
+        print(f"[Tab {tab_index}] Submitting application...")
+        MEROSHARE_GOVERNOR.request()
+        clicked = False
+        
+        # Try multiple methods to click Apply button
+        try:
+            apply_buttons = page.query_selector_all("button:has-text('Apply')")
+            for btn in apply_buttons:
+                if btn.is_visible() and not btn.is_disabled():
+                    state["submit_clicked"] = True
+                    btn.click()
+                    clicked = True
+                    break
+        except:
+            pass
+        
+        if not clicked:
+            try:
+                submit_button = page.query_selector("div.confirm-page-btn button.btn-primary[type='submit']")
+                if submit_button and submit_button.is_visible():
+                    state["submit_clicked"] = True
+                    submit_button.click()
+                    clicked = True
+            except:
+                pass
+        
+        if not clicked:
+            try:
+                state["submit_clicked"] = True
+                page.evaluate("""
+                    const buttons = document.querySelectorAll('button');
+                    for (const btn of buttons) {
+                        if (btn.textContent.includes('Apply') && btn.type === 'submit') {
+                            btn.click();
+                            break;
+                        }
+                    }
+                """)
+                clicked = True
+            except:
+                pass
+        
+        if not clicked:
+            raise Exception("Failed to click submit button")
+        
+        time.sleep(5)
+        
+        print(f"✓ [Tab {tab_index}] Application submitted for {member_name}!")
+        return {"member": member_name, "success": True}
+    
+    try:
+        result = retry_call(attempt_apply, policy, MEROSHARE_BREAKER, on_retry=_retry_notice(f"[Tab {tab_index}] Apply"))
+        result["attempts"] = state["attempts"]
+    except Exception as e:
+        print(f"✗ [Tab {tab_index}] Failed for {member_name}: {e}")
+        try:
+            page.screenshot(path=f"error_{member_name}.png")
+        except:
+            pass
+        result = {"member": member_name, "success": False, "error": str(e), "attempts": state["attempts"]}
+    
+    events.emit("apply", member=member_name, tab=tab_index, issue=selected_ipo['company_name'],
+                ok=result['success'], status=_application_status(result), attempts=result['attempts'],
+                elapsed_ms=elapsed_ms(started), error=result.get('error'))
+    return result
+
+def _application_status(result):
+    """Status string for an application result: applied, already_applied or failed"""
+    if not result['success']:
+        return "failed"
+    return result.get('status', 'applied')
+
+# Exit codes for apply-all (meaningful for cron/schedulers running --job)
+EXIT_OK = 0              # every selected member applied (or already had)
+EXIT_PARTIAL = 1         # some members failed to log in or apply
+EXIT_FAILED = 2          # nobody applied, or the run was aborted
+EXIT_NO_ISSUE = 3        # no open issue matched the job's issue matcher
+EXIT_BAD_JOB = 4         # job file missing/invalid or names unknown members
+
+FAILURE_POLICIES = ("continue", "abort")
+
+class JobSpecError(ValueError):
+    """Raised when an apply-all job file is missing or invalid"""
+
+def load_apply_job(job_file):
+    """
+    Load and validate a declarative apply-all job file
+    
+    Example job file::
+    
+        {
+          "members": ["Dad", "Mom"],
+          "issue": {"symbol": "SHL", "company": "Some Hydropower"},
+          "kitta": {"Dad": 20},
+          "on_login_failure": "continue",
+          "on_apply_failure": "continue"
+        }
+    
+    ``members`` may be omitted or ``"all"``; ``issue`` needs at least one of
+    ``company`` (case-insensitive substring) or ``symbol``.
+    
+    Returns:
+        Normalised job dict
+    """
+    try:
+        with open(job_file, 'r') as f:
+            raw = json.load(f)
+    except OSError as e:
+        raise JobSpecError(f"Cannot read job file {job_file}: {e}")
+    except ValueError as e:
+        raise JobSpecError(f"Job file {job_file} is not valid JSON: {e}")
+    
+    if not isinstance(raw, dict):
+        raise JobSpecError("Job file must contain a JSON object")
+    
+    members = raw.get('members', 'all')
+    if members != 'all':
+        if not isinstance(members, list) or not members:
+            raise JobSpecError("'members' must be \"all\" or a non-empty list of member names")
+        for name in members:
+            if not isinstance(name, str) or not name.strip():
+                raise JobSpecError(f"'members' entries must be member names, got {json.dumps(name)}")
+        members = [name.strip() for name in members]
+    
+    issue = raw.get('issue') or {}
+    if not isinstance(issue, dict):
+        raise JobSpecError("'issue' must be an object such as {\"symbol\": \"SHL\"}")
+    for key in ("company", "symbol"):
+        if not isinstance(issue.get(key, ''), str):
+            raise JobSpecError(f"'issue.{key}' must be text")
+    company = issue.get('company', '').strip()
+    symbol = issue.get('symbol', '').strip().upper()
+    if not company and not symbol:
+        raise JobSpecError("'issue' must set 'company' and/or 'symbol' to pick the IPO")
+    
+    kitta = raw.get('kitta', {})
+    if not isinstance(kitta, dict):
+        raise JobSpecError("'kitta' must map member names to kitta")
+    try:
+        kitta = {str(name).lower(): int(value) for name, value in kitta.items()}
+    except (TypeError, ValueError):
+        raise JobSpecError("'kitta' values must be whole numbers")
+    
+    job = {
+        "members": members,
+        "issue": {"company": company, "symbol": symbol},
+        "kitta": kitta,
+        "on_login_failure": raw.get('on_login_failure', 'continue'),
+        "on_apply_failure": raw.get('on_apply_failure', 'continue'),
+    }
+    for key in ("on_login_failure", "on_apply_failure"):
+        if job[key] not in FAILURE_POLICIES:
+            raise JobSpecError(f"'{key}' must be one of: {', '.join(FAILURE_POLICIES)}")
+    return job
+
+def _select_job_members(members, job):
+    """Apply a job's member list and kitta overrides to the family members"""
+    if job['members'] == 'all':
+        selected = list(members)
+    else:
+        by_name = {m['name'].lower(): m for m in members}
+        unknown = [name for name in job['members'] if name.lower() not in by_name]
+        if unknown:
+            raise JobSpecError(f"Unknown member(s) in job: {', '.join(unknown)}")
+        selected = [by_name[name.lower()] for name in job['members']]
+    
+    result = []
+    for member in selected:
+        override = job['kitta'].get(member['name'].lower(), job['kitta'].get('default'))
+        if override is not None:
+            member = dict(member, applied_kitta=override)
+        result.append(member)
+    return result
+
+def _match_job_issue(available_ipos, issue):
+    """Return the first listed IPO matching the job's company/symbol matcher"""
+    company = issue['company'].lower()
+    symbol = issue['symbol']
+    for ipo in available_ipos:
+        if company and company not in ipo['company_name'].lower():
+            continue
+        if symbol and not re.search(r'\b' + re.escape(symbol) + r'\b', ipo.get('row_text', '').upper()):
+            continue
+        return ipo
+    return None
 
-def apply_ipo_for_all_members(headless=True):
-    """Apply IPO for all family members - Sequential Login + Sequential Application"""
+def apply_ipo_for_all_members(headless=True, max_tabs=DEFAULT_MAX_TABS, retries=None,
+                              requests_per_sec=None, logins_per_sec=None, job=None,
+                              events=NULL_EVENTS):
+    """
+    Apply IPO for all family members using a sliding window of logged-in tabs
+    
+    At most ``max_tabs`` member tabs are alive at any time. Each tab is closed
+    as soon as its application is confirmed and the next pending member is
+    logged in to take its place, so browser memory stays flat regardless of
+    family size.
+    
+    Login, issue listing and submit are retried with jittered exponential
+    backoff behind a shared circuit breaker, and paced by the shared rate
+    governor.
+    
+    Args:
+        headless: Run browser in headless mode (no GUI)
+        max_tabs: Maximum number of concurrently open member tabs
+        retries: Attempts per step (default: per-step policy defaults)
+        requests_per_sec: Override the governor's request rate
+        logins_per_sec: Override the governor's new-login rate
+        job: Job dict from load_apply_job; runs without any prompts
+        events: EventStream receiving per-member login/apply/result events
+    
+    Returns:
+        One of the EXIT_* codes
+    """
     
     # Load family members
     config = load_family_members()
@@ -1392,7 +1972,20 @@ def apply_ipo_for_all_members(headless=True):
     
     if not members:
         print("\n⚠ No family members found. Add members first!\n")
-        return
+        return EXIT_BAD_JOB if job else EXIT_FAILED
+    
+    if job:
+        try:
+            members = _select_job_members(members, job)
+        except JobSpecError as e:
+            print(f"\n✗ {e}")
+            return EXIT_BAD_JOB
+    
+    max_tabs = max(1, int(max_tabs))
+    login_policy = _with_attempts(LOGIN_RETRY, retries)
+    listing_policy = _with_attempts(LISTING_RETRY, retries)
+    submit_policy = _with_attempts(SUBMIT_RETRY, retries)
+    MEROSHARE_GOVERNOR.configure(requests_per_sec, logins_per_sec)
     
     # Display members
     print("\n" + "="*60)
@@ -1402,135 +1995,87 @@ def apply_ipo_for_all_members(headless=True):
         print(f"{idx}. {member['name']} - Kitta: {member['applied_kitta']} | CRN: {member['crn_number']}")
     print("="*60)
     
-    # Confirmation
-    confirm = input(f"\n⚠ Apply IPO for ALL {len(members)} members? (yes/no): ").strip().lower()
-    if confirm != 'yes':
-        print("✗ Operation cancelled")
-        return
+    # Confirmation (the job file is the confirmation in unattended mode)
+    if job:
+        print(f"\n→ Job mode: applying for {len(members)} member(s) without prompts")
+    else:
+        confirm = input(f"\n⚠ Apply IPO for ALL {len(members)} members? (yes/no): ").strip().lower()
+        if confirm != 'yes':
+            print("✗ Operation cancelled")
+            return EXIT_FAILED
+    
+    # Stays EXIT_FAILED unless the run reaches the final summary
+    exit_code = EXIT_FAILED
+    run_started = time.monotonic()
+    events.emit("run_start", members=[m['name'] for m in members], max_tabs=max_tabs)
     
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=headless, slow_mo=100 if not headless else 0)
         context = browser.new_context()
         
+        # Members still waiting for a tab, logged-in tabs waiting to apply,
+        # and members whose login failed (their tabs are closed immediately)
+        pending = list(enumerate(members, 1))
+        live_tabs = []
+        failed_logins = []
+        
+        def fill_window():
+            """
+            Log in pending members until the tab window is full
+            
+            Returns False (and stops logging in) as soon as a login fails
+            under a job with on_login_failure=abort.
+            """
+            while pending and len(live_tabs) < max_tabs:
+                tab_index, member = pending.pop(0)
+                page_data = _login_member_tab(context, member, tab_index, login_policy, events)
+                if page_data['success']:
+                    live_tabs.append(page_data)
+                else:
+                    _close_page(page_data['page'])
+                    failed_logins.append(page_data)
+                    events.emit("result", member=member['name'], ok=False, status="login_failed",
+                                error=page_data.get('error'))
+                    if job and job['on_login_failure'] == 'abort':
+                        return False
+            return True
+        
         try:
-            # ========== PHASE 1: CREATE TABS & LOGIN ALL MEMBERS ==========
+            # ========== PHASE 1: LOGIN FIRST WINDOW OF MEMBERS ==========
             print("\n" + "="*60)
-            print("PHASE 1: MULTI-TAB LOGIN (ALL MEMBERS)")
+            print(f"PHASE 1: MULTI-TAB LOGIN (UP TO {max_tabs} TABS)")
             print("="*60)
             
-            pages_data = []
-            
-            # Create tabs and login sequentially (but keep all tabs open)
-            print(f"\n🚀 Opening {len(members)} tabs and logging in...\n")
-            
-            for idx, member in enumerate(members, 1):
-                member_name = member['name']
-                page = context.new_page()
-                
-                try:
-                    print(f"[Tab {idx}] Starting login for: {member_name}")
-                    
-                    # Navigate
-                    page.goto("https://meroshare.cdsc.com.np/#/login", wait_until="networkidle")
-                    time.sleep(2)
-                    
-                    # Select DP
-                    page.click("span.select2-selection")
-                    time.sleep(1)
-                    page.wait_for_selector(".select2-results", timeout=5000)
-                    
-                    search_box = page.query_selector("input.select2-search__field")
-                    if search_box:
-                        search_box.type(member['dp_value'])
-                        time.sleep(0.5)
-                        first_result = page.query_selector("li.select2-results__option--highlighted, li.select2-results__option[aria-selected='true']")
-                        if first_result:
-                            first_result.click()
-                        else:
-                            page.keyboard.press("Enter")
-                    time.sleep(1)
-                    
-                    # Fill username
-                    username_selectors = [
-                        "input[formcontrolname='username']",
-                        "input#username",
-                        "input[placeholder*='User']"
-                    ]
-                    for selector in username_selectors:
-                        try:
-                            page.fill(selector, member['username'], timeout=2000)
-                            break
-                        except:
-                            continue
-                    
-                    # Fill password
-                    password_selectors = [
-                        "input[formcontrolname='password']",
-                        "input[type='password']"
-                    ]
-                    for selector in password_selectors:
-                        try:
-                            page.fill(selector, member['password'], timeout=2000)
-                            break
-                        except:
-                            continue
-                    
-                    # Click login
-                    login_button_selectors = [
-                        "button.btn.sign-in",
-                        "button[type='submit']",
-                        "button:has-text('Login')"
-                    ]
-                    for selector in login_button_selectors:
-                        try:
-                            page.click(selector, timeout=2000)
-                            break
-                        except:
-                            continue
-                    
-                    # Wait for login
-                    try:
-                        page.wait_for_function("window.location.hash !== '#/login'", timeout=8000)
-                        time.sleep(2)
-                    except:
-                        time.sleep(2)
-                    
-                    # Check if logged in
-                    if "#/login" not in page.url.lower():
-                        print(f"✓ [Tab {idx}] Login successful: {member_name}")
-                        pages_data.append({"success": True, "member": member, "page": page, "tab_index": idx})
-                    else:
-                        print(f"✗ [Tab {idx}] Login failed: {member_name}")
-                        pages_data.append({"success": False, "member": member, "page": page, "tab_index": idx, "error": "Login failed"})
-                        
-                except Exception as e:
-                    print(f"✗ [Tab {idx}] Error logging in {member_name}: {e}")
-                    pages_data.append({"success": False, "member": member, "page": page, "tab_index": idx, "error": str(e)})
+            print(f"\n🚀 Opening up to {min(max_tabs, len(members))} tabs and logging in...\n")
+            fill_window()
             
             # Summary of login phase
-            successful_logins = [p for p in pages_data if p['success']]
-            failed_logins = [p for p in pages_data if not p['success']]
-            
+            attempted = len(members) - len(pending)
             print("\n" + "="*60)
-            print(f"LOGIN SUMMARY: {len(successful_logins)}/{len(members)} successful")
+            print(f"LOGIN SUMMARY: {len(live_tabs)}/{attempted} successful")
             print("="*60)
-            for p in successful_logins:
-                print(f"✓ {p['member']['name']}")
-            if failed_logins:
-                for p in failed_logins:
-                    print(f"✗ {p['member']['name']} - {p.get('error', 'Unknown error')}")
+            for tab in live_tabs:
+                print(f"✓ {tab['member']['name']}")
+            for tab in failed_logins:
+                print(f"✗ {tab['member']['name']} - {tab.get('error', 'Unknown error')}")
+            if pending:
+                print(f"… {len(pending)} more member(s) will log in as tabs free up")
             print("="*60)
             
-            if not successful_logins:
+            if not live_tabs:
                 print("\n✗ No successful logins. Exiting...")
-                return
+                return exit_code
             
             # Continue with successful logins only
             if failed_logins:
-                proceed = input(f"\n⚠ {len(failed_logins)} login(s) failed. Continue with {len(successful_logins)} member(s)? (yes/no): ").strip().lower()
+                if job:
+                    proceed = 'yes' if job['on_login_failure'] == 'continue' else 'no'
+                    print(f"\n→ {len(failed_logins)} login(s) failed; job policy: {job['on_login_failure']}")
+                else:
+                    proceed = input(f"\n⚠ {len(failed_logins)} login(s) failed. Continue with the remaining member(s)? (yes/no): ").strip().lower()
                 if proceed != 'yes':
                     print("✗ Operation cancelled")
-                    return
+                    return exit_code
             
             # ========== PHASE 2: SEQUENTIAL IPO APPLICATION ==========
             print("\n" + "="*60)
@@ -1538,38 +2083,32 @@ def apply_ipo_for_all_members(headless=True):
             print("="*60)
             
             # Use first successful login to select IPO
-            first_page = successful_logins[0]['page']
+            first_page = live_tabs[0]['page']
             
             print("\nNavigating to IPO page to select IPO...")
-            first_page.goto("https://meroshare.cdsc.com.np/#/asba", wait_until="networkidle")
-            time.sleep(3)
-            
             print("Fetching available IPOs...\n")
             
-            # Check if there are any IPOs available
+            # Check if there are any IPOs available (retries transient failures)
             try:
-                first_page.wait_for_selector(".company-list", timeout=10000)
-                time.sleep(2)
+                _open_issue_list(first_page, f"[Tab {live_tabs[0]['tab_index']}]", listing_policy)
             except Exception as e:
                 print("⚠ No IPOs currently available on Meroshare")
                 print("✗ Cannot proceed with IPO application\n")
                 
-                # Check if there's a "no data" message
-                try:
-                    no_data = first_page.query_selector("text=No Data Available")
-                    if no_data:
-                        print("→ Meroshare shows: 'No Data Available'")
-                except:
-                    pass
+                if isinstance(e, PermanentError):
+                    print("→ Meroshare shows: 'No Data Available'")
+                else:
+                    print(f"→ {e}")
                 
                 first_page.screenshot(path="no_ipos_available.png")
                 print("📸 Screenshot saved: no_ipos_available.png\n")
                 
-                if not headless:
+                if not headless and not job:
                     print("Browser will stay open for 20 seconds...")
                     time.sleep(20)
                 
-                return
+                exit_code = EXIT_NO_ISSUE if job else EXIT_FAILED
+                return exit_code
             
             company_rows = first_page.query_selector_all(".company-list")
             
@@ -1590,14 +2129,16 @@ def apply_ipo_for_all_members(headless=True):
                                 "index": len(available_ipos) + 1,
                                 "company_name": company_name,
                                 "share_type": share_type,
-                                "share_group": share_group
+                                "share_group": share_group,
+                                "row_text": row.inner_text()
                             })
                 except Exception as e:
                     pass
             
             if not available_ipos:
                 print("✗ No IPOs available to apply!")
-                return
+                exit_code = EXIT_NO_ISSUE if job else EXIT_FAILED
+                return exit_code
             
             print("="*60)
             print("AVAILABLE IPOs (Ordinary Shares)")
@@ -1608,183 +2149,53 @@ def apply_ipo_for_all_members(headless=True):
                 print()
             print("="*60)
             
-            if not headless:
-                selection = input(f"\nSelect IPO to apply for all members (1-{len(available_ipos)}): ").strip()
-                try:
-                    selected_idx = int(selection) - 1
-                    if selected_idx < 0 or selected_idx >= len(available_ipos):
-                        print("✗ Invalid selection!")
-                        return
-                except ValueError:
-                    print("✗ Invalid input!")
-                    return
+            if job:
+                selected_ipo = _match_job_issue(available_ipos, job['issue'])
+                if not selected_ipo:
+                    matcher = " / ".join(v for v in (job['issue']['company'], job['issue']['symbol']) if v)
+                    print(f"✗ No open IPO matches job issue '{matcher}'")
+                    exit_code = EXIT_NO_ISSUE
+                    return exit_code
             else:
-                selected_idx = 0
-            
-            selected_ipo = available_ipos[selected_idx]
+                if not headless:
+                    selection = input(f"\nSelect IPO to apply for all members (1-{len(available_ipos)}): ").strip()
+                    try:
+                        selected_idx = int(selection) - 1
+                        if selected_idx < 0 or selected_idx >= len(available_ipos):
+                            print("✗ Invalid selection!")
+                            return exit_code
+                    except ValueError:
+                        print("✗ Invalid input!")
+                        return exit_code
+                else:
+                    selected_idx = 0
+                
+                selected_ipo = available_ipos[selected_idx]
             print(f"\n✓ Selected IPO: {selected_ipo['company_name']}")
-            print(f"\n⚠ Will apply this IPO for {len(successful_logins)} member(s)\n")
+            events.emit("issue_selected", company=selected_ipo['company_name'],
+                        share_type=selected_ipo['share_type'], share_group=selected_ipo['share_group'])
+            print(f"\n⚠ Will apply this IPO for {len(live_tabs) + len(pending)} member(s)\n")
             
-            # Apply IPO for each member sequentially
+            # Apply for the oldest live tab, close it, then refill the window
             application_results = []
             
-            for page_data in successful_logins:
-                member = page_data['member']
-                page = page_data['page']
-                tab_index = page_data['tab_index']
-                member_name = member['name']
-                
-                print("\n" + "="*60)
-                print(f"[Tab {tab_index}] APPLYING FOR: {member_name}")
-                print("="*60)
-                
-                try:
-                    # Navigate to ASBA
-                    print(f"[Tab {tab_index}] Navigating to IPO page...")
-                    page.goto("https://meroshare.cdsc.com.np/#/asba", wait_until="networkidle")
-                    time.sleep(3)
-                    
-                    # Find and click the IPO
-                    page.wait_for_selector(".company-list", timeout=10000)
-                    time.sleep(2)
-                    
-                    company_rows = page.query_selector_all(".company-list")
-                    ipo_found = False
-                    already_applied = False
-                    
-                    for row in company_rows:
-                        try:
-                            company_name_elem = row.query_selector(".company-name span")
-                            if company_name_elem and selected_ipo['company_name'] in company_name_elem.inner_text():
-                                apply_button = row.query_selector("button.btn-issue")
-                                if apply_button:
-                                    # Check button text to see if already applied (shows 'Edit')
-                                    button_text = apply_button.inner_text().strip().lower()
-                                    
-                                    if "edit" in button_text or "view" in button_text:
-                                        print(f"[Tab {tab_index}] ⚠ IPO already applied (button shows: '{button_text.title()}')")
-                                        already_applied = True
-                                        ipo_found = True
-                                        break
-                                    else:
-                                        print(f"[Tab {tab_index}] Clicking Apply button (button shows: '{button_text.title()}')...")
-                                        apply_button.click()
-                                        ipo_found = True
-                                        break
-                        except:
-                            continue
-                    
-                    if not ipo_found:
-                        raise Exception("IPO not found in the list")
-                    
-                    if already_applied:
-                        print(f"[Tab {tab_index}] ✓ Skipping - IPO already applied for {member_name}")
-                        application_results.append({"member": member_name, "success": True, "status": "already_applied"})
-                        continue
-                    
-                    time.sleep(3)
-                    
-                    # Fill form
-                    print(f"[Tab {tab_index}] Filling application form...")
-                    page.wait_for_selector("select#selectBank", timeout=10000)
-                    time.sleep(2)
-                    
-                    # Select bank
-                    bank_options = page.query_selector_all("select#selectBank option")
-                    valid_banks = [opt for opt in bank_options if opt.get_attribute("value")]
-                    if valid_banks:
-                        page.select_option("select#selectBank", valid_banks[0].get_attribute("value"))
-                    time.sleep(2)
-                    
-                    # Select account
-                    page.wait_for_selector("select#accountNumber", timeout=5000)
-                    account_options = page.query_selector_all("select#accountNumber option")
-                    valid_accounts = [opt for opt in account_options if opt.get_attribute("value")]
-                    if valid_accounts:
-                        page.select_option("select#accountNumber", valid_accounts[0].get_attribute("value"))
-                    time.sleep(2)
-                    
-                    # Fill kitta
-                    print(f"[Tab {tab_index}] Kitta: {member['applied_kitta']}")
-                    page.fill("input#appliedKitta", str(member['applied_kitta']))
-                    time.sleep(1)
-                    
-                    # Fill CRN
-                    print(f"[Tab {tab_index}] CRN: {member['crn_number']}")
-                    page.fill("input#crnNumber", member['crn_number'])
-                    time.sleep(1)
-                    
-                    # Accept disclaimer
-                    disclaimer_checkbox = page.query_selector("input#disclaimer")
-                    if disclaimer_checkbox:
-                        disclaimer_checkbox.check()
-                    time.sleep(1)
-                    
-                    # Click proceed
-                    print(f"[Tab {tab_index}] Clicking Proceed...")
-                    proceed_button = page.query_selector("button.btn-primary[type='submit']")
-                    if proceed_button:
-                        proceed_button.click()
-                    time.sleep(3)
-                    
-                    # Enter PIN
-                    print(f"[Tab {tab_index}] Entering transaction PIN...")
-                    page.wait_for_selector("input#transactionPIN", timeout=10000)
-                    time.sleep(2)
-                    page.fill("input#transactionPIN", member['transaction_pin'])
-                    time.sleep(2)
-                    
-                    # Submit
-                    print(f"[Tab {tab_index}] Submitting application...")
-                    clicked = False
-                    
-                    # Try multiple methods to click Apply button
-                    try:
-                        apply_buttons = page.query_selector_all("button:has-text('Apply')")
-                        for btn in apply_buttons:
-                            if btn.is_visible() and not btn.is_disabled():
-                                btn.click()
-                                clicked = True
-                                break
-                    except:
-                        pass
-                    
-                    if not clicked:
-                        try:
-                            submit_button = page.query_selector("div.confirm-page-btn button.btn-primary[type='submit']")
-                            if submit_button and submit_button.is_visible():
-                                submit_button.click()
-                                clicked = True
-                        except:
-                            pass
-                    
-                    if not clicked:
-                        try:
-                            page.evaluate("""
-                                const buttons = document.querySelectorAll('button');
-                                for (const btn of buttons) {
-                                    if (btn.textContent.includes('Apply') && btn.type === 'submit') {
-                                        btn.click();
-                                        break;
-                                    }
-                                }
-                            """)
-                            clicked = True
-                        except:
-                            pass
-                    
-                    if not clicked:
-                        raise Exception("Failed to click submit button")
-                    
-                    time.sleep(5)
-                    
-                    print(f"✓ [Tab {tab_index}] Application submitted for {member_name}!")
-                    application_results.append({"member": member_name, "success": True})
-                    
-                except Exception as e:
-                    print(f"✗ [Tab {tab_index}] Failed for {member_name}: {e}")
-                    application_results.append({"member": member_name, "success": False, "error": str(e)})
-                    page.screenshot(path=f"error_{member_name}.png")
+            while live_tabs:
+                page_data = live_tabs.pop(0)
+                result = _apply_ipo_on_page(page_data, selected_ipo, submit_policy, listing_policy, events)
+                application_results.append(result)
+                events.emit("result", member=result['member'], ok=result['success'],
+                            status=_application_status(result), error=result.get('error'))
+                _close_page(page_data['page'])
+                if job and not result['success'] and job['on_apply_failure'] == 'abort':
+                    print("\n✗ Aborting remaining applications (job policy: on_apply_failure=abort)")
+                    for tab in live_tabs:
+                        _close_page(tab['page'])
+                    break
+                if not fill_window():
+                    print("\n✗ Aborting remaining applications (job policy: on_login_failure=abort)")
+                    for tab in live_tabs:
+                        _close_page(tab['page'])
+                    break
             
             # ========== FINAL SUMMARY ==========
             print("\n" + "="*60)
@@ -1814,11 +2225,21 @@ def apply_ipo_for_all_members(headless=True):
                 for r in failed_apps:
                     print(f"  ✗ {r['member']} - {r.get('error', 'Unknown error')}")
             
+            if failed_logins:
+                print(f"\n✗ LOGIN FAILED: {len(failed_logins)}")
+                for tab in failed_logins:
+                    print(f"  ✗ {tab['member']['name']} - {tab.get('error', 'Unknown error')}")
+            
             print("="*60)
+            print(f"⏱  {MEROSHARE_GOVERNOR.report()}")
             
-            if not headless:
-                print("\nBrowser will stay open for 60 seconds for verification...")
-                time.sleep(60)
+            skipped = len(members) - len(application_results) - len(failed_logins)
+            if successful_apps and not failed_apps and not failed_logins and not skipped:
+                exit_code = EXIT_OK
+            elif successful_apps:
+                exit_code = EXIT_PARTIAL
+            else:
+                exit_code = EXIT_FAILED
             
         except Exception as e:
             print(f"\n✗ Critical error: {e}")
@@ -1826,25 +2247,31 @@ def apply_ipo_for_all_members(headless=True):
             traceback.print_exc()
         finally:
             browser.close()
+            events.emit("run_end", exit_code=exit_code, elapsed_ms=elapsed_ms(run_started),
+                        governor=MEROSHARE_GOVERNOR.stats())
+    
+    return exit_code
+
 
-def get_dp_list():
-    """Fetch and display available DP list with values from API"""
-    import requests
+def get_dp_list(search=None, refresh=False):
+    """
+    Display available DPs from the cached DP directory
     
+    Args:
+        search: Optional fuzzy query (name, code or ID) to filter the list
+        refresh: Re-download the directory even if the snapshot is fresh
+    """
     try:
-        print("\nFetching DP list from Meroshare API...")
+        print("\nLoading DP directory...")
+        directory = load_dp_directory(refresh=refresh)
         
-        # Fetch data from API
-        response = requests.get("https://webbackend.cdsc.com.np/api/meroShare/capital/")
-        response.raise_for_status()
+        if directory.stale:
+            print("⚠ Meroshare API unreachable - showing last saved DP list")
         
-        dp_data = response.json()
-        
-        # Sort by name for better readability
-        dp_data.sort(key=lambda x: x['name'])
+        dp_data = directory.search(search, limit=len(directory)) if search else directory.entries
         
         print("\n" + "="*80)
-        print("AVAILABLE DEPOSITORY PARTICIPANTS (DPs)")
+        print("AVAILABLE DEPOSITORY PARTICIPANTS (DPs)" + (f" matching '{search}'" if search else ""))
         print("="*80)
         print(f"{'ID':<6} {'Code':<8} {'Name'}")
         print("-"*80)
@@ -1856,15 +2283,49 @@ def get_dp_list():
             print(f"{dp_id:<6} {code:<8} {name}")
         
         print("="*80)
-        print(f"Total DPs: {len(dp_data)}")
+        print(f"Total DPs: {len(dp_data)}" + (f" of {len(directory)}" if search else ""))
+        if directory.fetched_at:
+            print(f"Snapshot: {time.strftime('%Y-%m-%d %H:%M', time.localtime(directory.fetched_at))}")
         print("\nNote: Use the ID (first column) when setting up credentials")
         print("      (e.g., 139 for CREATIVE SECURITIES, 146 for GLOBAL IME CAPITAL)\n")
         
-    except requests.RequestException as e:
+    except Exception as e:
         print(f"✗ Error fetching DP list from API: {e}")
         print("  Please check your internet connection.\n")
-    except Exception as e:
-        print(f"✗ Unexpected error: {e}\n")
+
+def prompt_dp_value():
+    """
+    Ask for a DP value and validate it against the DP directory
+    
+    Accepts a DP ID or code; anything else is treated as a search and the
+    closest matches are shown. If no directory is available (offline with
+    no snapshot) the value is accepted as typed.
+    """
+    try:
+        directory = load_dp_directory()
+    except Exception:
+        directory = None
+        print("⚠ DP list unavailable - value will not be validated")
+    
+    while True:
+        dp_value = input("Enter DP ID (or part of the DP name to search): ").strip()
+        if not dp_value:
+            continue
+        if directory is None:
+            return dp_value
+        
+        dp = directory.get(dp_value)
+        if dp:
+            print(f"  ✓ {dp['name']} ({dp['code']})")
+            return dp_value
+        
+        matches = directory.search(dp_value, limit=8)
+        if not matches:
+            print(f"  ✗ No DP matches '{dp_value}'. Use 'nepse dp-list' to see all DPs.")
+            continue
+        print(f"  ✗ '{dp_value}' is not a DP ID. Did you mean:")
+        for dp in matches:
+            print(f"    {dp['id']:<6} {dp['code']:<8} {dp['name']}")
 
 def main():
     """Main menu"""
@@ -1932,9 +2393,9 @@ def main():
         cmd_topgl()
         input("\nPress Enter to continue...")
     elif choice == "13":
-        symbol = input("\nEnter stock symbol (e.g., NABIL): ").strip().upper()
-        if symbol:
-            cmd_stonk(symbol)
+        symbols = input("\nEnter stock symbol(s) (e.g., NABIL or NABIL NICA): ").strip().upper().split()
+        if symbols:
+            cmd_stonk(*symbols)
             input("\nPress Enter to continue...")
     elif choice == "0":
         print("Goodbye!")
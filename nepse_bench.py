@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks and regression checks for the nepse CLI
+
+Usage:
+    python nepse_bench.py startup          Import-time / startup regression check
+    python nepse_bench.py parse [--fetch]  Full vs targeted HTML parsing on saved pages
+    python nepse_bench.py replay           Parser/command regression check on recorded pages
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ============================================
+# Startup benchmark
+# ============================================
+
+# Modules that must never load just to start the CLI or run a market command
+HEAVY_MODULES = ("main", "playwright", "bs4", "lxml", "cloudscraper", "numpy")
+
+# (label, code run in a fresh interpreter, forbid heavy modules?)
+# The ipo case imports everything `nepse ipo` needs before its first request.
+STARTUP_CASES = [
+    ("import nepse_cli", "import nepse_cli", True),
+    ("nepse ipo -> first request", "import nepse_cli; nepse_cli.nepse_http.get_session()", False),
+]
+
+STARTUP_BUDGET_MS = 100
+
+
+def _run_python(args):
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=REPO_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def import_profile(code):
+    """
+    Run ``code`` under ``python -X importtime``
+
+    Returns:
+        dict mapping every imported module name to its cumulative import
+        time in microseconds, plus the summed top-level cumulative time
+    """
+    result = _run_python(["-X", "importtime", "-c", code])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    top_level_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        name = raw_name.strip()
+        modules[name] = int(cumulative_us)
+        # Nested imports are indented by two extra spaces per level
+        if not raw_name.startswith("  "):
+            top_level_us += int(cumulative_us)
+    return modules, top_level_us
+
+
+def wall_time_ms(code, runs=5):
+    """Median wall time of a fresh interpreter running ``code``"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _run_python(["-c", code])
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def bench_startup(budget_ms=STARTUP_BUDGET_MS, runs=5):
+    """Check CLI startup cost; returns a process exit code (0 = pass)"""
+    failures = []
+
+    print("=" * 90)
+    print("STARTUP BENCHMARK")
+    print("=" * 90)
+    print(f"{'Case':<32} {'Imports (ms)':<14} {'Wall (ms)':<12} {'Heavy modules loaded'}")
+    print("-" * 90)
+
+    for label, code, forbid_heavy in STARTUP_CASES:
+        modules, import_us = import_profile(code)
+        wall_ms = wall_time_ms(code, runs)
+        heavy = sorted({name.split(".")[0] for name in modules} & set(HEAVY_MODULES))
+        print(f"{label:<32} {import_us / 1000:<14.1f} {wall_ms:<12.1f} {', '.join(heavy) or '-'}")
+
+        if forbid_heavy and heavy:
+            failures.append(f"{label}: imports heavy module(s) {', '.join(heavy)}")
+        if wall_ms > budget_ms:
+            failures.append(f"{label}: {wall_ms:.1f} ms exceeds {budget_ms} ms budget")
+
+    print("=" * 90)
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        return 1
+    print(f"✓ All startup cases within {budget_ms} ms and free of heavy imports")
+    return 0
+
+
+# ============================================
+# Fixture corpus (nepse record)
+# ============================================
+
+DEFAULT_SYMBOL = "NABIL"
+MANIFEST_FILE = "manifest.json"
+EXPECTED_DIR = "expected"
+
+
+def default_fixtures_dir():
+    from nepse_config import DATA_DIR
+
+    return DATA_DIR / "fixtures"
+
+
+def command_cases(symbol=DEFAULT_SYMBOL):
+    """(label, command, args) for every market command replayed offline"""
+    import nepse_cli
+
+    return [
+        ("ipo", nepse_cli.cmd_ipo, ()),
+        ("nepse", nepse_cli.cmd_nepse, ()),
+        ("subidx BANKING", nepse_cli.cmd_subidx, ("BANKING",)),
+        ("subidx --all", nepse_cli.cmd_subidx_all, ()),
+        ("mktsum", nepse_cli.cmd_mktsum, ()),
+        ("topgl", nepse_cli.cmd_topgl, ()),
+        (f"stonk {symbol}", nepse_cli.cmd_stonk, (symbol,)),
+    ]
+
+
+def parse_cases(symbol=DEFAULT_SYMBOL):
+    """(label, url, parse(response)) for every page the commands parse"""
+    import nepse_cli
+    import nepse_ipo
+    import nepse_market
+
+    return [
+        ("market", nepse_market.MARKET_URL,
+         lambda response: nepse_market.parse_market_html(response.text).to_dict()),
+        ("market-summary", nepse_cli.MARKET_SUMMARY_URL, nepse_cli.parse_market_summary),
+        ("topgl", nepse_cli.TOPGL_URL, nepse_cli.parse_topgl),
+        ("live-trading", nepse_cli.SS_LIVE_URL, nepse_cli.parse_live_trading),
+        ("alpha-live", nepse_cli.ALPHA_LIVE_URL, nepse_cli._parse_alpha_index),
+        ("company", f"https://www.sharesansar.com/company/{symbol}",
+         lambda response: nepse_cli.parse_company_details(response, symbol)),
+        ("ipo", nepse_ipo.IPO_API_URL,
+         lambda response: [asdict(nepse_ipo.Offering.from_api(row))
+                           for row in nepse_ipo.parse_page(response).get('content', [])]),
+    ]
+
+
+def _normalize(result):
+    """Parser output as plain JSON data, so results and saved expectations compare equal"""
+    return json.loads(json.dumps(result, default=str, sort_keys=True))
+
+
+def _fixture_name(url):
+    name = re.sub(r"[^A-Za-z0-9]+", "-", url.split("://", 1)[-1]).strip("-")
+    return f"{name}.body"
+
+
+def load_corpus(fixtures_dir):
+    """
+    Recorded responses of a fixture corpus
+
+    Returns:
+        (manifest dict, URL -> CachedResponse); ({}, {}) if nothing is recorded
+    """
+    import nepse_http
+
+    fixtures_dir = Path(fixtures_dir)
+    try:
+        with open(fixtures_dir / MANIFEST_FILE, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    responses = {}
+    for url, entry in manifest.get("responses", {}).items():
+        try:
+            content = (fixtures_dir / entry["file"]).read_bytes()
+        except OSError:
+            continue
+        responses[url] = nepse_http.CachedResponse(url, entry["status"], content, entry["headers"],
+                                                   from_cache=True, fetched_at=entry["fetched_at"])
+    return manifest, responses
+
+
+def save_expected(fixtures_dir, symbol, responses):
+    """Write each parser's output on the corpus as the expected result"""
+    expected_dir = Path(fixtures_dir) / EXPECTED_DIR
+    expected_dir.mkdir(parents=True, exist_ok=True)
+    for label, url, parse in parse_cases(symbol):
+        if url in responses:
+            with open(expected_dir / f"{label}.json", "w") as f:
+                json.dump(_normalize(parse(responses[url])), f, indent=1, sort_keys=True)
+
+
+def record_fixtures(fixtures_dir, symbol=DEFAULT_SYMBOL):
+    """
+    Download every page the market commands read into ``fixtures_dir``
+
+    Each command runs once against the live sites (cache bypassed) and
+    every response it downloads is saved with its status and headers.
+    Parser pages no command happened to need (e.g. the hedged live-trading
+    fallback) are fetched directly. The parsers' current output is saved
+    as the expected result for ``replay``.
+
+    Returns:
+        Number of responses recorded
+    """
+    import nepse_http
+
+    fixtures_dir = Path(fixtures_dir)
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    symbol = symbol.upper()
+    recorded = {}
+    lock = threading.Lock()
+
+    def keep(response):
+        if response.status_code == 200:
+            with lock:
+                recorded[response.url] = response
+
+    cache_enabled = nepse_http.set_cache_enabled(False)
+    nepse_http.set_recorder(keep)
+    try:
+        for label, command, args in command_cases(symbol):
+            nepse_http.clear_memo()
+            with contextlib.redirect_stdout(io.StringIO()):
+                command(*args)
+            print(f"✓ {label}")
+        for label, url, _ in parse_cases(symbol):
+            if url not in recorded:
+                try:
+                    session = nepse_http.get_scraper() if "nepsealpha" in url else None
+                    nepse_http.fetch(url, session=session)
+                except Exception as e:
+                    print(f"⚠️  {label}: {str(e)[:80]}")
+    finally:
+        nepse_http.set_recorder(None)
+        nepse_http.set_cache_enabled(cache_enabled)
+        nepse_http.clear_memo()
+
+    entries = {}
+    for url, response in sorted(recorded.items()):
+        name = _fixture_name(url)
+        (fixtures_dir / name).write_bytes(response.content)
+        entries[url] = {"file": name, "status": response.status_code, "headers": response.headers,
+                        "fetched_at": response.fetched_at}
+        print(f"  {len(response.content) / 1024:>8.1f} KB  {url}")
+    with open(fixtures_dir / MANIFEST_FILE, "w") as f:
+        json.dump({"recorded_at": time.time(), "symbol": symbol, "responses": entries}, f, indent=2)
+
+    save_expected(fixtures_dir, symbol, recorded)
+    print(f"\n✓ Recorded {len(entries)} responses to {fixtures_dir}")
+    return len(entries)
+
+
+# ============================================
+# Parse benchmark
+# ============================================
+
+# Company page whose layout rows carry extra classes ("row mb-2"); targeted
+# parsing must still count them, or the sector row index shifts
+SAMPLE_COMPANY_PAGE = """<html><body><div class="container">
+<div class="row">Menu</div>
+<div class="row mb-2">Search</div>
+<div class="row">Ticker</div>
+<div class="row mt-3 hidden-xs">Banner</div>
+<div class="row"><h1 style="color: #333;font-size: 20px;font-weight: 600;">Sample Bank Limited</h1></div>
+<div class="row company-info">
+ <div class="col-md-12">Summary</div>
+ <div class="col-md-12"><h4>Listed</h4>
+  <h4>Sector: <span class="text-org">Commercial Banks</span></h4>
+  <h4>Share Registrar: <span class="text-org">Sample Capital Ltd.</span></h4></div>
+</div>
+</div></body></html>"""
+
+
+def sample_cases():
+    """(label, response, parse) for built-in pages with markup that trips targeted parsing"""
+    import nepse_cli
+    import nepse_http
+
+    page = nepse_http.CachedResponse("https://www.sharesansar.com/company/SAMPLE", 200,
+                                     SAMPLE_COMPANY_PAGE.encode("utf-8"), {}, from_cache=True)
+    return [
+        ("company (multi)", page, lambda response: nepse_cli.parse_company_details(response, "SAMPLE")),
+    ]
+
+
+def _measure(func, runs, *args):
+    """(median ms, peak KB, result) of ``func(*args)``"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak / 1024, result
+
+
+def bench_parse(fixtures_dir, runs=5):
+    """Compare full-document and targeted parsing; returns an exit code"""
+    import nepse_market
+
+    manifest, responses = load_corpus(fixtures_dir)
+    failures = []
+
+    print("=" * 110)
+    print(f"PARSE BENCHMARK  ({fixtures_dir})")
+    print("=" * 110)
+    print(f"{'Page':<16} {'Size KB':>8} {'Full ms':>9} {'Target ms':>10} {'Speedup':>8} "
+          f"{'Full peak KB':>13} {'Target peak KB':>15}  {'Output'}")
+    print("-" * 110)
+
+    cases = []
+    for label, url, parse in parse_cases(manifest.get("symbol", DEFAULT_SYMBOL)):
+        if url not in responses:
+            print(f"{label:<16} not recorded")
+            continue
+        cases.append((label, responses[url], parse))
+    recorded = len(cases)
+    cases.extend(sample_cases())
+
+    for label, response, parse in cases:
+        results = {}
+        for mode, targeted in (("full", False), ("targeted", True)):
+            nepse_market.TARGETED_PARSING = targeted
+            try:
+                results[mode] = _measure(parse, runs, response)
+            finally:
+                nepse_market.TARGETED_PARSING = True
+
+        full_ms, full_kb, full_result = results["full"]
+        target_ms, target_kb, target_result = results["targeted"]
+        same = full_result == target_result
+        if not same:
+            failures.append(f"{label}: targeted parse differs from full parse")
+        print(f"{label:<16} {len(response.content) / 1024:>8.1f} {full_ms:>9.1f} {target_ms:>10.1f} "
+              f"{full_ms / max(target_ms, 1e-6):>7.1f}x {full_kb:>13.0f} {target_kb:>15.0f}  "
+              f"{'same' if same else 'DIFFERENT'}")
+
+    print("=" * 110)
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        return 1
+    if not recorded:
+        print("✗ No fixtures found - run `nepse record` (or this command with --fetch) first")
+        return 1
+    print("✓ Targeted parsing matches full parsing on every fixture")
+    return 0
+
+
+# ============================================
+# Replay benchmark
+# ============================================
+
+def first_difference(expected, actual, path="$"):
+    """Path and values of the first place two JSON values differ, or None"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual:
+                return f"{path}.{key}: missing"
+            if key not in expected:
+                return f"{path}.{key}: unexpected"
+            diff = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        for i, (old, new) in enumerate(zip(expected, actual)):
+            diff = first_difference(old, new, f"{path}[{i}]")
+            if diff:
+                return diff
+        if len(expected) != len(actual):
+            return f"{path}: {len(expected)} items -> {len(actual)}"
+        return None
+    if expected != actual:
+        return f"{path}: {str(expected)[:30]!r} -> {str(actual)[:30]!r}"
+    return None
+
+
+def _error_lines(output):
+    """Warning/error lines a command printed instead of data"""
+    return [line.strip() for line in output.splitlines() if line.lstrip().startswith(("⚠️", "🔌", "❌"))]
+
+
+def bench_replay(fixtures_dir, runs=5, update=False):
+    """
+    Replay a recorded corpus through every parser and command; returns an exit code
+
+    Parsers are checked against the outputs saved at record time (``update``
+    saves the current outputs instead, after an intentional change). Commands
+    run with the network replaced by the corpus and fail on printed errors.
+    """
+    import tempfile
+
+    import nepse_history
+    import nepse_http
+    import nepse_market
+
+    fixtures_dir = Path(fixtures_dir)
+    manifest, responses = load_corpus(fixtures_dir)
+    if not responses:
+        print(f"✗ No recorded responses in {fixtures_dir} - run `nepse record` first")
+        return 1
+    symbol = manifest.get("symbol", DEFAULT_SYMBOL)
+    if update:
+        save_expected(fixtures_dir, symbol, responses)
+        print(f"✓ Saved current parser outputs as expected results in {fixtures_dir / EXPECTED_DIR}\n")
+
+    failures = []
+    print("=" * 100)
+    print(f"PARSER REPLAY  ({fixtures_dir}, recorded {time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest.get('recorded_at', 0)))})")
+    print("=" * 100)
+    print(f"{'Parser':<16} {'Size KB':>8} {'Median ms':>10} {'Peak KB':>9}  {'Result'}")
+    print("-" * 100)
+    for label, url, parse in parse_cases(symbol):
+        if url not in responses:
+            print(f"{label:<16} {'-':>8} {'-':>10} {'-':>9}  not recorded")
+            continue
+        try:
+            ms, peak_kb, result = _measure(parse, runs, responses[url])
+        except Exception as e:
+            failures.append(f"{label}: parser raised {type(e).__name__}: {str(e)[:60]}")
+            print(f"{label:<16} {len(responses[url].content) / 1024:>8.1f} {'-':>10} {'-':>9}  ERROR")
+            continue
+        try:
+            with open(fixtures_dir / EXPECTED_DIR / f"{label}.json", "r") as f:
+                expected = json.load(f)
+            diff = first_difference(expected, _normalize(result))
+            status = "match" if diff is None else f"DIFF {diff}"
+        except (OSError, ValueError):
+            diff, status = None, "no expected output"
+        if diff:
+            failures.append(f"{label}: {diff}")
+        print(f"{label:<16} {len(responses[url].content) / 1024:>8.1f} {ms:>10.2f} {peak_kb:>9.0f}  {status}")
+
+    print("=" * 100)
+    print("COMMAND REPLAY  (network replaced by the corpus)")
+    print("=" * 100)
+    print(f"{'Command':<16} {'Median ms':>10} {'Peak KB':>9}  {'Result'}")
+    print("-" * 100)
+
+    state_dir = Path(tempfile.mkdtemp(prefix="nepse-replay-"))
+    saved_paths = (nepse_history.HISTORY_DB, nepse_market.SNAPSHOT_FILE)
+    # Keep replayed pages out of the real history and snapshot files
+    nepse_history.HISTORY_DB = state_dir / "history.sqlite3"
+    nepse_market.SNAPSHOT_FILE = state_dir / "market_snapshot.json"
+
+    def run(command, args):
+        nepse_http.clear_memo()
+        if nepse_market.SNAPSHOT_FILE.exists():
+            nepse_market.SNAPSHOT_FILE.unlink()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            command(*args)
+        return output.getvalue()
+
+    nepse_http.set_replay(responses)
+    try:
+        for label, command, args in command_cases(symbol):
+            ms, peak_kb, output = _measure(run, runs, command, args)
+            errors = _error_lines(output)
+            if errors:
+                failures.append(f"{label}: {errors[0][:80]}")
+            print(f"{label:<16} {ms:>10.2f} {peak_kb:>9.0f}  {'ERROR ' + errors[0][:60] if errors else 'ok'}")
+    finally:
+        nepse_http.set_replay(None)
+        nepse_http.clear_memo()
+        nepse_history.HISTORY_DB, nepse_market.SNAPSHOT_FILE = saved_paths
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print("=" * 100)
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        return 1
+    print("✓ Every parser matches its recorded output and every command replays cleanly")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="nepse CLI benchmarks")
+    subparsers = parser.add_subparsers(dest="bench")
+
+    startup_parser = subparsers.add_parser("startup", help="Import-time regression check")
+    startup_parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    startup_parser.add_argument("--runs", type=int, default=5)
+
+    parse_parser = subparsers.add_parser("parse", help="Full vs targeted HTML parsing on saved pages")
+    parse_parser.add_argument("--fixtures", type=Path, default=None,
+                              help="Directory of saved pages (default: <data dir>/fixtures)")
+    parse_parser.add_argument("--fetch", action="store_true", help="Download fresh fixtures first")
+    parse_parser.add_argument("--runs", type=int, default=5)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay recorded pages through every parser and command")
+    replay_parser.add_argument("--fixtures", type=Path, default=None,
+                               help="Directory recorded by `nepse record` (default: <data dir>/fixtures)")
+    replay_parser.add_argument("--update", action="store_true",
+                               help="Accept the current parser outputs as the expected results")
+    replay_parser.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.bench == "startup":
+        sys.exit(bench_startup(args.budget_ms, args.runs))
+    if args.bench == "parse":
+        fixtures_dir = args.fixtures or default_fixtures_dir()
+        if args.fetch:
+            record_fixtures(fixtures_dir)
+        sys.exit(bench_parse(fixtures_dir, args.runs))
+    if args.bench == "replay":
+        sys.exit(bench_replay(args.fixtures or default_fixtures_dir(), args.runs, args.update))
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
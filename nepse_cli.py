@@ -4,22 +4,18 @@ Nepse CLI - Enhanced command line interface for Meroshare automation
 """
 import argparse
 import sys
-import requests
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
-import json
-from main import (
-    apply_ipo,
-    add_family_member,
-    list_family_members,
-    select_family_member,
-    get_portfolio_for_member,
-    test_login_for_member,
-    get_dp_list,
-    apply_ipo_for_all_members,
-    load_family_members,
-    main as interactive_menu
-)
+from pathlib import Path
+import nepse_http
+from nepse_config import DEFAULT_MAX_TABS
+from nepse_events import EventStream, event_output
+
+# Heavy modules are imported inside the commands that need them so pure
+# market-data commands start fast: `main` pulls in Playwright and creates the
+# data directory, and bs4 is only needed once a command parses a page.
+# All HTTP goes through the pooled session in nepse_http, and market pages
+# are served from its disk cache while fresh (disable with --no-cache).
 
 # ============================================
 # Market Data Functions
@@ -48,38 +44,96 @@ def format_rupees(amount):
     except (ValueError, AttributeError):
         return f"Rs. {amount}"
 
+MARKET_SUMMARY_URL = "https://www.sharesansar.com/market-summary"
+
+SUMMARY_CELLS = 12  # label/value pairs read by cmd_mktsum
+
+def parse_market_summary(response):
+    """Timestamp and all cell texts of the ShareSansar market summary page"""
+    from nepse_market import make_soup
+    
+    soup = make_soup(response.text, "lxml", "div", id="market_symmary_data")
+    as_of = None
+    summary_cont = soup.find("div", id="market_symmary_data")
+    if summary_cont is not None:
+        msdate = summary_cont.find("h5").find("span")
+        if msdate is not None:
+            as_of = msdate.text
+    cells = [td.text for td in soup.find_all("td")]
+    if len(cells) < SUMMARY_CELLS:
+        # Summary table moved out of the block: read every cell on the page
+        cells = [td.text for td in make_soup(response.text, "lxml", "td").find_all("td")]
+    return {"as_of": as_of, "cells": cells}
+
+def _summary_with_history(response):
+    import nepse_history
+    
+    summary = parse_market_summary(response)
+    nepse_history.record_summary(summary, response)
+    return summary
+
+def get_market_summary():
+    """Parsed market summary, fetched at most once per run (and kept in local history)"""
+    return nepse_http.fetch_parsed(MARKET_SUMMARY_URL, "summary", _summary_with_history)
+
 def get_ss_time():
     """Get timestamp from ShareSansar market summary"""
     try:
-        response = requests.get("https://www.sharesansar.com/market-summary", timeout=10)
-        soup = BeautifulSoup(response.text, "lxml")
-        summary_cont = soup.find("div", id="market_symmary_data")
-        if summary_cont is not None:
-            msdate = summary_cont.find("h5").find("span")
-            if msdate is not None:
-                return msdate.text
+        return get_market_summary()["as_of"] or "N/A"
     except:
-        pass
-    return "N/A"
+        return "N/A"
+
+IPO_TYPE_LABELS = {
+    'Ipo': '🆕 IPO',
+    'Right': '🔄 Right Share',
+    'MutualFund': '💼 Mutual Fund',
+    'BondOrDebenture': '💰 Bond/Debenture'
+}
+
+def _ipo_date(value):
+    return value.strftime('%d %b %Y') if value else 'N/A'
+
+def _print_offering(index, ipo):
+    """Print one Offering in the IPO card format"""
+    days_left = ipo.days_left()
+    if days_left is None:
+        urgency_text = "📅 Check dates"
+    elif days_left < 0:
+        urgency_text = ""
+    elif days_left <= 2:
+        urgency_text = f"⚠️  LAST {days_left} DAY{'S' if days_left != 1 else ''}!"
+    elif days_left <= 5:
+        urgency_text = f"⏰ {days_left} days left"
+    else:
+        urgency_text = f"📅 {days_left} days remaining"
+    
+    print(f"\n[{index}] {ipo.symbol} — {ipo.name}")
+    print("-" * 100)
+    print(f"  Type: {IPO_TYPE_LABELS.get(ipo.type, f'📊 {ipo.type}')}")
+    print(f"  Sector: {ipo.sector}")
+    print(f"  For: {ipo.offered_to}")
+    print(f"  Units: {ipo.units:,} @ {format_rupees(ipo.price)} = {format_rupees(ipo.total_amount)}")
+    print(f"  Opens: {_ipo_date(ipo.opening_date)} | Closes: {_ipo_date(ipo.closing_date)}")
+    if ipo.extended_closing_date:
+        print(f"  Extended: {_ipo_date(ipo.extended_closing_date)}")
+    print(f"  Status: {urgency_text}")
+    print(f"  Issue Manager: {ipo.issue_manager}")
 
 def cmd_ipo():
     """Display all open IPOs/public offerings"""
+    import requests
+    from nepse_ipo import fetch_offerings
+    
     try:
         print("\n📊 Fetching open IPOs...\n")
         
-        response = requests.get(
-            "https://sharehubnepal.com/data/api/v1/public-offering",
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        if not data.get('success'):
+        try:
+            offerings = fetch_offerings()
+        except ValueError:
             print("⚠️  Unable to fetch IPO data. API request failed.\n")
             return
         
-        all_ipos = data.get('data', {}).get('content', [])
-        open_ipos = [ipo for ipo in all_ipos if ipo.get('status') == 'Open']
+        open_ipos = [ipo for ipo in offerings if ipo.is_open]
         
         if not open_ipos:
             print("💤 No IPOs are currently open for subscription.\n")
@@ -90,71 +144,7 @@ def cmd_ipo():
         print("=" * 100)
         
         for index, ipo in enumerate(open_ipos, 1):
-            symbol = ipo.get('symbol', 'N/A')
-            name = ipo.get('name', 'N/A')
-            sector = ipo.get('sector', 'N/A')
-            units = ipo.get('units', 0)
-            price = ipo.get('price', 0)
-            total_amount = ipo.get('totalAmount', 0)
-            opening_date = ipo.get('openingDate', 'N/A')
-            closing_date = ipo.get('closingDate', 'N/A')
-            extended_closing = ipo.get('extendedClosingDate', None)
-            issue_manager = ipo.get('issueManager', 'N/A')
-            ipo_type = ipo.get('type', 'N/A')
-            ipo_for = ipo.get('for', 'N/A')
-            
-            try:
-                opening_date_obj = datetime.fromisoformat(opening_date.replace('T', ' '))
-                opening_date_str = opening_date_obj.strftime('%d %b %Y')
-            except:
-                opening_date_str = opening_date
-            
-            try:
-                closing_date_obj = datetime.fromisoformat(closing_date.replace('T', ' '))
-                closing_date_str = closing_date_obj.strftime('%d %b %Y')
-            except:
-                closing_date_str = closing_date
-            
-            days_left = None
-            urgency_text = ""
-            try:
-                target_date = extended_closing if extended_closing else closing_date
-                target_date_obj = datetime.fromisoformat(target_date.replace('T', ' '))
-                days_left = (target_date_obj - datetime.now()).days
-                
-                if days_left >= 0:
-                    if days_left <= 2:
-                        urgency_text = f"⚠️  LAST {days_left} DAY{'S' if days_left != 1 else ''}!"
-                    elif days_left <= 5:
-                        urgency_text = f"⏰ {days_left} days left"
-                    else:
-                        urgency_text = f"📅 {days_left} days remaining"
-            except:
-                urgency_text = "📅 Check dates"
-            
-            type_emojis = {
-                'Ipo': '🆕 IPO',
-                'Right': '🔄 Right Share',
-                'MutualFund': '💼 Mutual Fund',
-                'BondOrDebenture': '💰 Bond/Debenture'
-            }
-            type_display = type_emojis.get(ipo_type, f'📊 {ipo_type}')
-            
-            print(f"\n[{index}] {symbol} — {name}")
-            print("-" * 100)
-            print(f"  Type: {type_display}")
-            print(f"  Sector: {sector}")
-            print(f"  For: {ipo_for}")
-            print(f"  Units: {units:,} @ {format_rupees(price)} = {format_rupees(total_amount)}")
-            print(f"  Opens: {opening_date_str} | Closes: {closing_date_str}")
-            if extended_closing:
-                try:
-                    ext_date_obj = datetime.fromisoformat(extended_closing.replace('T', ' '))
-                    print(f"  Extended: {ext_date_obj.strftime('%d %b %Y')}")
-                except:
-                    pass
-            print(f"  Status: {urgency_text}")
-            print(f"  Issue Manager: {issue_manager}")
+            _print_offering(index, ipo)
         
         print("=" * 100)
         print(f"\n✓ Total open IPOs: {len(open_ipos)}")
@@ -165,49 +155,77 @@ def cmd_ipo():
     except Exception as e:
         print(f"⚠️  Error: {str(e)[:200]}\n")
 
+def cmd_ipo_changes(poll_interval=None, events=None):
+    """
+    Show only offerings that are new, changed or closing soon since the last poll
+    
+    With ``poll_interval`` keeps polling every that many seconds. With an
+    EventStream, each change is also emitted as an NDJSON ``offering`` event.
+    """
+    from nepse_ipo import poll_changes
+    
+    labels = {"new": "🆕 NEW", "changed": "✏️  CHANGED", "closing_soon": "⚠️  CLOSING SOON"}
+    if poll_interval:
+        # Revalidate the feed on every poll instead of serving the cached copy
+        nepse_http.set_max_market_ttl(poll_interval)
+    while True:
+        # Each poll gets its own budget; one-shot runs use the command's
+        with nepse_http.deadline(nepse_http.COMMAND_DEADLINE if poll_interval else None) as budget:
+            try:
+                changes = poll_changes()
+            except Exception as e:
+                print(f"⚠️  Error polling IPO feed: {str(e)[:200]}\n")
+                changes = None
+        
+        if changes is not None:
+            stamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+            if not changes:
+                print(f"[{stamp}] 💤 No IPO changes since the last poll")
+            for index, (kind, ipo, detail) in enumerate(changes, 1):
+                print(f"\n[{stamp}] {labels[kind]}")
+                _print_offering(index, ipo)
+                if detail:
+                    for field, (before, after) in detail.items():
+                        print(f"  ↳ {field}: {before} → {after}")
+                if events is not None:
+                    events.emit("offering", change=kind, key=ipo.key, symbol=ipo.symbol, name=ipo.name,
+                                type=ipo.type, status=ipo.status, fields=ipo.fingerprint(),
+                                days_left=ipo.days_left(),
+                                changed={f: list(v) for f, v in detail.items()} if detail else None)
+        
+        if not poll_interval:
+            return
+        print_budget_notes(budget)
+        time.sleep(poll_interval)
+
+def _fmt(value):
+    """Format a parsed number with thousands separators ('-' if missing)"""
+    return "-" if value is None else f"{value:,.2f}"
+
+def _print_index_table(title, records):
+    """Print index records as one table"""
+    print("=" * 120)
+    print(title)
+    print("=" * 120)
+    print(f"{'Index':<30} {'Close':<12} {'Change':<15} {'% Change':<12} {'Range':<25} {'Turnover':<15}")
+    print("-" * 120)
+    
+    for rec in records:
+        range_str = f"{_fmt(rec.low)} - {_fmt(rec.high)}"
+        change_str = f"{_fmt(rec.point_change)} ({_fmt(rec.pct_change)}%)"
+        print(f"{rec.name:<30} {_fmt(rec.close):<12} {change_str:<15} {rec.trend:<12} {range_str:<25} {format_number(rec.turnover):<15}")
+    
+    print("=" * 120)
+
 def cmd_nepse():
     """Display NEPSE indices data"""
+    from nepse_market import get_market_snapshot
+    
     try:
         print("\n📊 Fetching NEPSE indices...\n")
         
-        url = "https://www.sharesansar.com/market"
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, "lxml")
-        
-        all_tables = soup.find_all(
-            "table", class_="table table-bordered table-striped table-hover"
-        )
-        main_indices = all_tables[0]
-        main_indices_rows = main_indices.find_all("tr")[1:]
-        
-        print("=" * 120)
-        print("NEPSE INDEX DATA")
-        print("=" * 120)
-        print(f"{'Index':<30} {'Close':<12} {'Change':<15} {'% Change':<12} {'Range':<25} {'Turnover':<15}")
-        print("-" * 120)
-        
-        for tr in main_indices_rows:
-            tds = tr.find_all("td")
-            index_name = tds[0].text.strip()
-            close_val = tds[4].text.strip()
-            point_change = tds[5].text.strip()
-            pct_change = tds[6].text.strip()
-            low_val = tds[3].text.strip()
-            high_val = tds[2].text.strip()
-            turnover = tds[7].text.strip()
-            
-            try:
-                pct_float = float(pct_change.replace('%', '').replace('+', ''))
-                trend = "📈" if pct_float > 0 else "📉" if pct_float < 0 else "➡️"
-            except:
-                trend = "📊"
-            
-            range_str = f"{low_val} - {high_val}"
-            change_str = f"{point_change} ({pct_change})"
-            
-            print(f"{index_name:<30} {close_val:<12} {change_str:<15} {trend:<12} {range_str:<25} {format_number(turnover):<15}")
-        
-        print("=" * 120)
+        snapshot = get_market_snapshot()
+        _print_index_table("NEPSE INDEX DATA", snapshot.indices)
         timestamp = get_ss_time()
         print(f"\nAs of: {timestamp}\n")
         
@@ -216,113 +234,179 @@ def cmd_nepse():
 
 def cmd_subidx(subindex_name):
     """Display sub-index details"""
+    from nepse_market import SUB_INDEX_ALIASES, get_market_snapshot
+    
     try:
         subindex_name = subindex_name.upper()
+        print(f"\n📊 Fetching {subindex_name} sub-index data...\n")
         
-        sub_index_mapping = {
-            "BANKING": "Banking SubIndex",
-            "DEVBANK": "Development Bank Index",
-            "FINANCE": "Finance Index",
-            "HOTELS AND TOURISM": "Hotels And Tourism",
-            "HYDROPOWER": "HydroPower Index",
-            "INVESTMENT": "Investment",
-            "LIFE INSURANCE": "Life Insurance",
-            "MANUFACTURING AND PROCESSING": "Manufacturing And Processing",
-            "MICROFINANCE": "Microfinance Index",
-            "MUTUAL FUND": "Mutual Fund",
-            "NONLIFE INSURANCE": "Non Life Insurance",
-            "OTHERS": "Others Index",
-            "TRADING": "Trading Index",
-        }
+        rec = get_market_snapshot().sub_index(subindex_name)
+        if rec is None:
+            print(f"⚠️  Sub-index '{SUB_INDEX_ALIASES.get(subindex_name, subindex_name)}' not found.\n")
+            print("Available sub-indices:")
+            for key in SUB_INDEX_ALIASES.keys():
+                print(f"  - {key}")
+            print()
+            return
         
-        print(f"\n📊 Fetching {subindex_name} sub-index data...\n")
+        if rec.open is not None and rec.close is not None:
+            trend = "📈" if rec.close > rec.open else "📉" if rec.close < rec.open else "➡️"
+        else:
+            trend = "📊"
         
-        response = requests.get("https://www.sharesansar.com/market", timeout=10)
-        soup = BeautifulSoup(response.text, "lxml")
-        alltable = soup.find_all(
-            "table", class_="table table-bordered table-striped table-hover"
-        )
-        sub_indices = alltable[3]
-        sub_indices_rows = sub_indices.find_all("tr")
-        
-        subindex_name = sub_index_mapping.get(subindex_name, subindex_name)
-        
-        for tr in sub_indices_rows[1:]:
-            tds = tr.find_all("td")
-            if tds[0].text.upper() == subindex_name.upper():
-                sub_index_details = {
-                    "Sub Index": tds[0].text,
-                    "Open": tds[1].text,
-                    "High": tds[2].text,
-                    "Low": tds[3].text,
-                    "Close": tds[4].text,
-                    "Pt.Change": tds[5].text,
-                    "% change": tds[6].text,
-                    "Turnover": tds[7].text,
-                }
-                
-                try:
-                    o = round(float(sub_index_details["Open"].replace(",", "")), 2)
-                    c = round(float(sub_index_details["Close"].replace(",", "")), 2)
-                    trend = "📈" if c > o else "📉" if c < o else "➡️"
-                except:
-                    trend = "📊"
-                
-                print("=" * 80)
-                print(f"{trend} {sub_index_details['Sub Index']}")
-                print("=" * 80)
-                print(f"  Close: {sub_index_details['Close']}")
-                print(f"  Change: {sub_index_details['Pt.Change']} ({sub_index_details['% change']})")
-                print(f"  Range: {sub_index_details['Low']} - {sub_index_details['High']}")
-                print(f"  Open: {sub_index_details['Open']}")
-                print(f"  Turnover: {format_number(sub_index_details['Turnover'])}")
-                print("=" * 80)
-                timestamp = get_ss_time()
-                print(f"\nAs of: {timestamp}\n")
-                return
-        
-        print(f"⚠️  Sub-index '{subindex_name}' not found.\n")
-        print("Available sub-indices:")
-        for key in sub_index_mapping.keys():
-            print(f"  - {key}")
-        print()
+        print("=" * 80)
+        print(f"{trend} {rec.name}")
+        print("=" * 80)
+        print(f"  Close: {_fmt(rec.close)}")
+        print(f"  Change: {_fmt(rec.point_change)} ({_fmt(rec.pct_change)}%)")
+        print(f"  Range: {_fmt(rec.low)} - {_fmt(rec.high)}")
+        print(f"  Open: {_fmt(rec.open)}")
+        print(f"  Turnover: {format_number(rec.turnover)}")
+        print("=" * 80)
+        timestamp = get_ss_time()
+        print(f"\nAs of: {timestamp}\n")
+        
+    except Exception as e:
+        print(f"⚠️  Error fetching sub-index data: {str(e)}\n")
+
+def cmd_subidx_all():
+    """Display every sub-index in one table"""
+    from nepse_market import get_market_snapshot
+    
+    try:
+        print("\n📊 Fetching sub-indices...\n")
+        
+        snapshot = get_market_snapshot()
+        _print_index_table("NEPSE SUB-INDICES", snapshot.sub_indices)
+        timestamp = get_ss_time()
+        print(f"\nAs of: {timestamp}\n")
         
     except Exception as e:
         print(f"⚠️  Error fetching sub-index data: {str(e)}\n")
 
+def require_numpy(command):
+    """
+    Exit with an install hint unless NumPy is available
+
+    NumPy is an optional extra (``pip install numpy``) used only by the
+    array-based analytics commands (value, screen, sectors); nothing else
+    imports it, so the other commands start fast without it.
+    """
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print(f"\n✗ nepse {command} needs NumPy: pip install numpy\n")
+        sys.exit(1)
+
+def cmd_value(member_name=None, sectors=True):
+    """Revalue saved portfolios of every member against one live price fetch"""
+    from nepse_portfolio import load_saved_holdings, value_holdings
+    
+    require_numpy("value")
+    
+    snapshots = load_saved_holdings(member_name)
+    if not snapshots:
+        who = f"'{member_name}'" if member_name else "any member"
+        print(f"\n⚠️  No saved portfolio for {who}. Run 'nepse portfolio' first.\n")
+        return
+    
+    print("\n📊 Fetching live prices...\n")
+    prices = get_live_prices()
+    if not prices:
+        print("⚠️  Live prices unavailable; using Meroshare LTP from the saved portfolios.\n")
+    
+    symbols = sorted({h["scrip"].strip().upper() for s in snapshots for h in s.get("holdings", [])})
+    sector_map = load_sector_map(symbols) if sectors else None
+    result = value_holdings(snapshots, prices, sector_map)
+    
+    print("=" * 100)
+    print("💼 FAMILY PORTFOLIO VALUATION")
+    print("=" * 100)
+    print(f"{'Member':<25} {'Holdings':>9} {'Value':>20} {'Day Change':>18} {'%':>8}   {'Snapshot'}")
+    print("-" * 100)
+    for row in result["members"]:
+        trend = "📈" if row["day_change"] > 0 else "📉" if row["day_change"] < 0 else "➡️"
+        saved = datetime.fromtimestamp(row["fetched_at"]).strftime('%Y-%m-%d') if row["fetched_at"] else "-"
+        print(f"{row['member']:<25} {row['holdings']:>9} {format_rupees(row['value']):>20} "
+              f"{row['day_change']:>+18,.2f} {row['day_change_pct']:>+7.2f}% {trend} {saved}")
+    print("-" * 100)
+    print(f"{'TOTAL':<25} {'':>9} {format_rupees(result['total']):>20} "
+          f"{result['day_change']:>+18,.2f} {result['day_change_pct']:>+7.2f}%")
+    print("=" * 100)
+    
+    if result["sectors"]:
+        print("\n🏭 SECTOR WEIGHTS")
+        for row in result["sectors"]:
+            bar = "█" * int(round(row["weight"] / 2))
+            print(f"  {row['sector'][:30]:<30} {format_rupees(row['value']):>20} {row['weight']:>6.2f}%  {bar}")
+    
+    if result["stale_symbols"]:
+        print(f"\n⚠️  Not in the live feed (valued at Meroshare LTP): {', '.join(result['stale_symbols'])}")
+    as_of = next(iter(prices.values()))["as_of"] if prices else "N/A"
+    print(f"\nPrices as of: {as_of}\n")
+
+def cmd_history(name, days=30):
+    """Display the daily history of an index or sub-index from local data"""
+    import nepse_history
+    
+    started = time.perf_counter()
+    series, points = nepse_history.index_history(name, days)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    if series is None:
+        print(f"\n⚠️  No local history for '{name}'.")
+        print("History is recorded whenever you run nepse, subidx or watch.\n")
+        return
+    if not points:
+        print(f"\n⚠️  No history for {series} in the last {days} days.\n")
+        return
+    
+    print("\n" + "=" * 100)
+    print(f"📜 {series.upper()} — LAST {days} DAYS")
+    print("=" * 100)
+    print(f"{'Day':<12} {'Close':>12} {'Change':>10} {'% Chg':>8}   {'Range':<25} {'Turnover':>10}")
+    print("-" * 100)
+    for point in points:
+        range_str = f"{_fmt(point['low'])} - {_fmt(point['high'])}"
+        pct = "-" if point['pct_change'] is None else f"{point['pct_change']:+.2f}%"
+        change = "-" if point['point_change'] is None else f"{point['point_change']:+,.2f}"
+        print(f"{point['day']:<12} {_fmt(point['close']):>12} {change:>10} {pct:>8}   {range_str:<25} "
+              f"{format_number(point['turnover']):>10}")
+    print("=" * 100)
+    
+    closes = [p['close'] for p in points if p['close'] is not None]
+    if len(closes) > 1:
+        period_change = closes[-1] - closes[0]
+        trend = "📈" if period_change > 0 else "📉" if period_change < 0 else "➡️"
+        print(f"{trend} Period change: {period_change:+,.2f} ({period_change / closes[0] * 100:+.2f}%)"
+              f"   High close: {max(closes):,.2f}   Low close: {min(closes):,.2f}")
+    print(f"\n{len(points)} session(s) from local history in {elapsed_ms:.1f} ms\n")
+
 def cmd_mktsum():
     """Display market summary"""
     try:
         print("\n📊 Fetching market summary...\n")
         
-        response = requests.get("https://www.sharesansar.com/market-summary", timeout=10)
-        soup = BeautifulSoup(response.text, "lxml")
-        summary_cont = soup.find("div", id="market_symmary_data")
-        
-        last_mktsum = ""
-        if summary_cont is not None:
-            msdate = summary_cont.find("h5").find("span")
-            if msdate is not None:
-                last_mktsum = msdate.text
-        
-        data_sum = soup.find_all("td")
+        summary = get_market_summary()
+        last_mktsum = summary["as_of"] or ""
+        data_sum = summary["cells"]
         
         print("=" * 100)
         print("NEPSE MARKET SUMMARY")
         print("=" * 100)
         print(f"\n💰 TRADING ACTIVITY")
-        print(f"  Turnover: {format_number(data_sum[1].text)}")
-        print(f"  Traded Shares: {format_number(data_sum[3].text)}")
-        print(f"  Transactions: {data_sum[5].text}")
-        print(f"  Scrips Traded: {data_sum[7].text}")
+        print(f"  Turnover: {format_number(data_sum[1])}")
+        print(f"  Traded Shares: {format_number(data_sum[3])}")
+        print(f"  Transactions: {data_sum[5]}")
+        print(f"  Scrips Traded: {data_sum[7]}")
         
         print(f"\n💎 MARKET CAPITALIZATION")
-        print(f"  Total Market Cap: {format_number(data_sum[9].text)}")
-        print(f"  Floated Market Cap: {format_number(data_sum[11].text)}")
+        print(f"  Total Market Cap: {format_number(data_sum[9])}")
+        print(f"  Floated Market Cap: {format_number(data_sum[11])}")
         
         try:
-            mc_val = float(data_sum[9].text.replace(',', ''))
-            fc_val = float(data_sum[11].text.replace(',', ''))
+            mc_val = float(data_sum[9].replace(',', ''))
+            fc_val = float(data_sum[11].replace(',', ''))
             float_ratio = (fc_val / mc_val) * 100
             print(f"  Float Ratio: {float_ratio:.2f}%")
         except:
@@ -334,191 +418,556 @@ def cmd_mktsum():
     except Exception as e:
         print(f"⚠️  Error fetching market summary: {str(e)}\n")
 
-def cmd_topgl():
-    """Display top 10 gainers and losers"""
+TOPGL_URL = "https://merolagani.com/LatestMarket.aspx"
+
+def parse_topgl(response):
+    """Top gainers and losers as lists of cell texts from the MeroLagani latest-market page"""
+    from nepse_market import make_soup
+    
+    soup = make_soup(response.text, 'html.parser', 'div', class_="col-md-4 hidden-xs hidden-sm")
+    tgtl_col = soup.find('div', class_="col-md-4 hidden-xs hidden-sm")
+    tgtl_tables = tgtl_col.find_all('table')
+    
+    def rows(table):
+        cells = [[td.text for td in tr.find_all('td')] for tr in table.find_all('tr')[1:]]
+        return [tds for tds in cells if len(tds) >= 8]
+    
+    return rows(tgtl_tables[0]), rows(tgtl_tables[1])
+
+def _topgl_with_history(response):
+    import nepse_history
+    
+    gainers, losers = parse_topgl(response)
+    nepse_history.record_movers(gainers, losers, response)
+    return gainers, losers
+
+def get_topgl():
+    """(gainers, losers), fetched and parsed at most once per run (and kept in local history)"""
+    return nepse_http.fetch_parsed(TOPGL_URL, "topgl", _topgl_with_history)
+
+TOPGL_BOARDS = {
+    "gainers": "📈 TOP {n} GAINERS",
+    "losers": "📉 TOP {n} LOSERS",
+    "turnover": "💰 TOP {n} BY TURNOVER",
+    "volume": "📦 TOP {n} BY VOLUME",
+}
+
+MOVERS_RANKS = 10  # gainers/losers kept in history per snapshot, as on MeroLagani
+
+def _merolagani_row(tds):
+    """MeroLagani top-10 cells as a leaderboard row"""
+    from nepse_market import to_float
+    
+    return {"symbol": tds[0].strip(), "close": to_float(tds[1]) or 0, "pct_change": to_float(tds[2]) or 0,
+            "high": to_float(tds[3]) or 0, "low": to_float(tds[4]) or 0,
+            "volume": to_float(tds[6]) or 0, "turnover": to_float(tds[7]) or 0}
+
+def get_leaderboards(boards=("gainers", "losers"), n=10, sector=None):
+    """
+    Top-``n`` leaderboards from the live feed (one download for all boards)
+    
+    Falls back to MeroLagani's pre-rendered top-10 gainers/losers when the
+    live feed is unavailable; that source cannot rank turnover/volume or
+    filter by sector.
+    
+    Returns:
+        (board -> list of rows, as_of, source description)
+    """
+    from nepse_screen import leaderboard
+    
+    prices = None
     try:
-        print("\n📊 Fetching top gainers and losers...\n")
-        
-        response = requests.get("https://merolagani.com/LatestMarket.aspx", timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        tgtl_col = soup.find('div', class_="col-md-4 hidden-xs hidden-sm")
-        tgtl_tables = tgtl_col.find_all('table')
-        
-        gainers = tgtl_tables[0]
-        gainers_row = gainers.find_all('tr')
-        
-        losers = tgtl_tables[1]
-        losers_row = losers.find_all('tr')
-        
-        print("=" * 120)
-        print("📈 TOP 10 GAINERS")
-        print("=" * 120)
-        print(f"{'#':<5} {'Symbol':<12} {'LTP':<12} {'%Chg':<10} {'High':<12} {'Low':<12} {'Volume':<15} {'Turnover':<15}")
-        print("-" * 120)
+        prices = get_live_prices()
+    except Exception:
+        pass
+    if prices:
+        import nepse_history
         
-        for idx, tr in enumerate(gainers_row[1:], 1):
-            tds = tr.find_all('td')
-            if tds and len(tds) >= 8:
-                medal = ["🥇", "🥈", "🥉"] + [""] * 7
-                print(f"{medal[idx-1]:<5} {tds[0].text:<12} {tds[1].text:<12} {tds[2].text:<10} {tds[3].text:<12} {tds[4].text:<12} {format_number(tds[6].text):<15} {format_number(tds[7].text):<15}")
+        # Market-wide movers go to local history, whatever this call asked for
+        nepse_history.record_leaders(leaderboard(prices, "gainers", MOVERS_RANKS),
+                                     leaderboard(prices, "losers", MOVERS_RANKS))
+        sectors = load_sector_map(list(prices)) if sector else None
+        as_of = next(iter(prices.values()))["as_of"]
+        return ({board: leaderboard(prices, board, n, sectors, sector) for board in boards}, as_of,
+                f"{len(prices)} stocks in the live feed")
+    
+    gainers, losers = get_topgl()
+    fallback = {"gainers": [_merolagani_row(tds) for tds in gainers[:n]],
+                "losers": [_merolagani_row(tds) for tds in losers[:n]]}
+    source = "MeroLagani top 10 (live feed unavailable"
+    source += "; sector filter not applied)" if sector else ")"
+    return {board: fallback.get(board, []) for board in boards}, get_ss_time(), source
+
+def cmd_topgl(n=10, boards=("gainers", "losers"), sector=None):
+    """Display top-N gainers, losers, turnover or volume leaders"""
+    try:
+        print(f"\n📊 Fetching top {n} {' / '.join(boards)}{f' in {sector}' if sector else ''}...\n")
         
-        print("\n" + "=" * 120)
-        print("📉 TOP 10 LOSERS")
-        print("=" * 120)
-        print(f"{'#':<5} {'Symbol':<12} {'LTP':<12} {'%Chg':<10} {'High':<12} {'Low':<12} {'Volume':<15} {'Turnover':<15}")
-        print("-" * 120)
+        tables, as_of, source = get_leaderboards(boards, n, sector)
         
-        for idx, tr in enumerate(losers_row[1:], 1):
-            tds = tr.find_all('td')
-            if tds and len(tds) >= 8:
-                print(f"{idx:<5} {tds[0].text:<12} {tds[1].text:<12} {tds[2].text:<10} {tds[3].text:<12} {tds[4].text:<12} {format_number(tds[6].text):<15} {format_number(tds[7].text):<15}")
+        medal = ["🥇", "🥈", "🥉"]
+        for board in boards:
+            rows = tables[board]
+            print("=" * 120)
+            print(TOPGL_BOARDS[board].format(n=n) + (f" — {sector}" if sector else ""))
+            print("=" * 120)
+            print(f"{'#':<5} {'Symbol':<12} {'LTP':<12} {'%Chg':<10} {'High':<12} {'Low':<12} {'Volume':<15} {'Turnover':<15}")
+            print("-" * 120)
+            
+            for idx, row in enumerate(rows, 1):
+                rank = medal[idx-1] if board != "losers" and idx <= len(medal) else str(idx)
+                print(f"{rank:<5} {row['symbol']:<12} {row['close']:<12,.2f} {row['pct_change']:<+10.2f} {row['high']:<12,.2f} "
+                      f"{row['low']:<12,.2f} {format_number(row['volume']):<15} {format_number(row['turnover']):<15}")
+            if not rows:
+                print("  (none)" if "MeroLagani" not in source else "  (not available from the fallback source)")
+            print()
         
         print("=" * 120)
-        timestamp = get_ss_time()
-        print(f"\nAs of: {timestamp}\n")
+        print(f"Source: {source}")
+        print(f"\nAs of: {as_of}\n")
         
     except Exception as e:
         print(f"⚠️  Error fetching top gainers/losers: {str(e)}\n")
 
-def cmd_stonk(stock_name):
-    """Display stock details (information only - no charts/alerts)"""
+ALPHA_LIVE_URL = "https://nepsealpha.com/live/stocks"
+SS_LIVE_URL = "https://www.sharesansar.com/live-trading"
+
+# One budget for the whole stonk command; the fallback price source is only
+# asked (hedged) if NepseAlpha has not answered after STONK_HEDGE_AFTER.
+STONK_DEADLINE = 12  # seconds
+STONK_HEDGE_AFTER = 2  # seconds
+
+def _parse_alpha_index(response):
+    """Symbol -> quote dict for every stock in the NepseAlpha live feed"""
+    from nepse_market import to_float
+    
+    if response.status_code != 200:
+        return None
+    live = response.json().get('stock_live', {})
+    as_of = live.get('asOf', 'N/A')
+    index = {}
+    for item in live.get('prices', []):
+        symbol = str(item.get('symbol') or '').strip().upper()
+        if not symbol:
+            continue
+        # Missing or null numbers count as 0, so every quote compares and sorts
+        close_price = to_float(item.get("close")) or 0
+        percent_change = to_float(item.get("percent_change")) or 0
+        if percent_change != 0 and close_price != 0 and percent_change != -100:
+            prev_close = close_price / (1 + percent_change / 100)
+            pt_change = close_price - prev_close
+        else:
+            prev_close = close_price
+            pt_change = 0
+        
+        index[symbol] = {
+            "close": close_price,
+            "pt_change": pt_change,
+            "pct_change": percent_change,
+            "open": to_float(item.get('open')) or 0,
+            "high": to_float(item.get('high')) or 0,
+            "low": to_float(item.get('low')) or 0,
+            "volume": to_float(item.get('volume')) or 0,
+            "prev_close": prev_close,
+            "as_of": as_of,
+        }
+    return index
+
+def parse_live_trading(response, as_of="N/A"):
+    """Symbol -> quote dict for every row of the ShareSansar live-trading table"""
+    from nepse_market import make_soup, to_float
+    
+    if response.status_code != 200:
+        return None
+    soup = make_soup(response.text, "lxml", "tr")
+    index = {}
+    for row in soup.find_all("tr")[1:]:
+        row_data = [td.text.strip() for td in row.find_all("td")]
+        if len(row_data) > 9:
+            index[row_data[1].upper()] = {
+                "close": to_float(row_data[2]) or 0,
+                "pt_change": to_float(row_data[3]) or 0,
+                "pct_change": to_float(row_data[4]) or 0,
+                "open": to_float(row_data[5]) or 0,
+                "high": to_float(row_data[6]) or 0,
+                "low": to_float(row_data[7]) or 0,
+                "volume": to_float(row_data[8]) or 0,
+                "prev_close": to_float(row_data[9]) or 0,
+                "as_of": as_of,
+            }
+    return index
+
+def _alpha_index(timeout):
+    """NepseAlpha price index, downloaded and indexed once per run"""
+    return nepse_http.fetch_parsed(ALPHA_LIVE_URL, "price_index", _parse_alpha_index,
+                                   session=nepse_http.get_scraper(), timeout=timeout)
+
+def _sharesansar_index(timeout):
+    """ShareSansar live-trading price index, downloaded and indexed once per run"""
+    return nepse_http.fetch_parsed(SS_LIVE_URL, "price_index",
+                                   lambda response: parse_live_trading(response, get_ss_time()),
+                                   timeout=timeout)
+
+def get_live_prices(timeout=None):
+    """Symbol -> quote for the whole market (NepseAlpha, else ShareSansar live-trading)"""
+    timeout = timeout or nepse_http.DEFAULT_TIMEOUT
     try:
-        stock_name = stock_name.upper()
-        print(f"\n📊 Fetching details for {stock_name}...\n")
+        index = _alpha_index(timeout)
+        if index:
+            return index
+    except Exception:
+        pass
+    return _sharesansar_index(timeout) or {}
+
+COMPANY_TITLE_STYLE = "color: #333;font-size: 20px;font-weight: 600;"
+
+def parse_company_details(response, symbol):
+    """Sector, share registrar and full name from a ShareSansar company page"""
+    from nepse_market import make_soup
+    
+    company_details = {
+        "sector": "N/A",
+        "share_registrar": "N/A",
+        "company_fullform": symbol,
+    }
+    if response.status_code != 200:
+        return company_details
+    
+    soup2 = make_soup(response.text, "lxml", "div", class_="row")
+    all_rows = soup2.find_all("div", class_="row")
+    
+    if len(all_rows) >= 6:
+        info_row = all_rows[5]
+        second_row = info_row.find_all("div", class_="col-md-12")
+        if len(second_row) > 1:
+            shareinfo = second_row[1]
+            heading_list = shareinfo.find_all("h4")
+            
+            if len(heading_list) > 2:
+                company_details["sector"] = heading_list[1].find("span", class_="text-org").text
+                company_details["share_registrar"] = heading_list[2].find("span", class_="text-org").text
+    
+    company_full_form_tag = soup2.find("h1", style=COMPANY_TITLE_STYLE)
+    if company_full_form_tag is None:
+        # Title sits outside the layout rows: one more pass for just the <h1>
+        company_full_form_tag = make_soup(response.text, "lxml", "h1").find("h1", style=COMPANY_TITLE_STYLE)
+    if company_full_form_tag is not None:
+        company_details["company_fullform"] = company_full_form_tag.text
+    return company_details
+
+def _company_details(symbol, timeout):
+    """Fetch (cached for a day) and parse the ShareSansar company page"""
+    response = nepse_http.fetch(f"https://www.sharesansar.com/company/{symbol}",
+                                ttl=nepse_http.STATIC_TTL, timeout=timeout)
+    return parse_company_details(response, symbol)
+
+SECTOR_MAP_TTL = 7 * 24 * 3600  # one week
+
+def _sector_map_file():
+    from nepse_config import DATA_DIR
+    return DATA_DIR / "sector_map.json"
+
+def _read_sector_map():
+    """Cached symbol -> {"sector", "fetched_at"} entries ({} if none)"""
+    import json
+    
+    try:
+        with open(_sector_map_file(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def sectors_due(symbols, cached=None, refresh=False):
+    """Symbols whose sector is not cached or is older than SECTOR_MAP_TTL"""
+    cached = _read_sector_map() if cached is None else cached
+    now = time.time()
+    return [sym for sym in symbols
+            if refresh or sym not in cached or now - cached[sym].get("fetched_at", 0) > SECTOR_MAP_TTL]
+
+def load_sector_map(symbols, refresh=False, max_workers=8):
+    """
+    Symbol -> sector for ``symbols`` from a local cache
+
+    Symbols missing from the cache (or older than a week) are looked up on
+    their ShareSansar company pages concurrently, within the command's
+    deadline; whatever is not resolved in time is left out (shown as
+    Unknown) with a note. ``nepse prefetch`` builds the full map. Unknown
+    sectors are not cached so they are retried next time.
+    """
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    
+    cached = _read_sector_map()
+    missing = sectors_due(symbols, cached, refresh)
+    if missing:
+        if len(missing) > max_workers:
+            print(f"⏳ Looking up sectors for {len(missing)} stocks (cached for a week afterwards)...")
+        now = time.time()
         
-        import cloudscraper
-        scraper = cloudscraper.create_scraper()
+        def lookup(sym):
+            try:
+                return sym, _company_details(sym, nepse_http.DEFAULT_TIMEOUT)["sector"]
+            except Exception:
+                return sym, None
         
-        # Try NepseAlpha API first
-        stock_price_data = None
+        unknown = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for sym, sector in pool.map(nepse_http.bind_context(lookup), missing):
+                if sector and sector != "N/A":
+                    cached[sym] = {"sector": sector.strip(), "fetched_at": now}
+                elif sym not in cached:
+                    unknown += 1
+        if unknown:
+            nepse_http.note(f"Sector unknown for {unknown} symbol(s) (lookup failed or ran out of time; "
+                            f"`nepse prefetch --once` builds the full sector map)")
         try:
-            response = scraper.get('https://nepsealpha.com/live/stocks', timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                prices = data.get('stock_live', {}).get('prices', [])
-                
-                for item in prices:
-                    if item.get('symbol', '').upper() == stock_name:
-                        stock_price_data = item
-                        break
-        except:
+            path = _sector_map_file()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(cached, f)
+        except OSError:
             pass
-        
-        # Fetch company details from ShareSansar
-        company_details = {
-            "sector": "N/A",
-            "share_registrar": "N/A",
-            "company_fullform": stock_name,
-        }
-        
+    
+    return {sym: cached[sym]["sector"] for sym in symbols if sym in cached}
+
+def _merge_quotes(futures, symbols, quotes, deadline):
+    """Fill ``quotes`` from price indexes as they complete, until all symbols are found or ``deadline``"""
+    from concurrent.futures import FIRST_COMPLETED, wait
+    
+    pending = set(futures)
+    while pending and len(quotes) < len(symbols):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                index = future.result()
+            except Exception:
+                continue
+            for symbol in symbols:
+                if symbol not in quotes and index and symbol in index:
+                    quotes[symbol] = index[symbol]
+
+def fetch_stonk_quotes(symbols):
+    """
+    Quotes and company details for ``symbols`` within STONK_DEADLINE
+    (or the command's deadline, if that ends sooner)
+
+    Company pages and the NepseAlpha feed start together; the ShareSansar
+    live-trading table is hedged in if NepseAlpha is slow or misses a
+    symbol. Each request's timeout is the time left, so stragglers cannot
+    outlive the deadline.
+
+    Returns:
+        (quotes, details) dicts keyed by symbol; missing quotes are absent
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with nepse_http.deadline(STONK_DEADLINE) as budget:
+        deadline = budget.expires
+        remaining = lambda: max(0.5, deadline - time.monotonic())
+        submit = lambda func, *args: pool.submit(nepse_http.bind_context(func), *args)
+        pool = ThreadPoolExecutor(max_workers=min(8, len(symbols) + 2))
         try:
-            response2 = requests.get(
-                f"https://www.sharesansar.com/company/{stock_name}", timeout=10)
+            detail_futures = {sym: submit(_company_details, sym, remaining()) for sym in symbols}
+            price_futures = [submit(_alpha_index, remaining())]
+            quotes = {}
+            _merge_quotes(price_futures, symbols, quotes, min(deadline, time.monotonic() + STONK_HEDGE_AFTER))
+            if len(quotes) < len(symbols):
+                price_futures.append(submit(_sharesansar_index, remaining()))
+                _merge_quotes(price_futures, symbols, quotes, deadline)
             
-            if response2.status_code == 200:
-                soup2 = BeautifulSoup(response2.text, "lxml")
-                all_rows = soup2.find_all("div", class_="row")
-                
-                if len(all_rows) >= 6:
-                    info_row = all_rows[5]
-                    second_row = info_row.find_all("div", class_="col-md-12")
-                    if len(second_row) > 1:
-                        shareinfo = second_row[1]
-                        heading_list = shareinfo.find_all("h4")
-                        
-                        if len(heading_list) > 2:
-                            company_details["sector"] = heading_list[1].find("span", class_="text-org").text
-                            company_details["share_registrar"] = heading_list[2].find("span", class_="text-org").text
-                
-                company_full_form_tag = soup2.find(
-                    "h1", style="color: #333;font-size: 20px;font-weight: 600;"
-                )
-                if company_full_form_tag is not None:
-                    company_details["company_fullform"] = company_full_form_tag.text
-        except:
-            pass
+            details = {}
+            for sym, future in detail_futures.items():
+                try:
+                    details[sym] = future.result(timeout=max(0, deadline - time.monotonic()))
+                except Exception:
+                    details[sym] = {"sector": "N/A", "share_registrar": "N/A", "company_fullform": sym}
+        finally:
+            pool.shutdown(wait=False)
+    return quotes, details
+
+def _print_stonk_card(stock_name, quote, company_details):
+    """Detailed view of one stock"""
+    pt_change = quote["pt_change"]
+    trend = "📈" if pt_change > 0 else "📉" if pt_change < 0 else "➡️"
+    
+    print("=" * 100)
+    print(f"{trend} {stock_name} — {company_details['company_fullform']}")
+    print("=" * 100)
+    print(f"  Symbol: {stock_name}")
+    print(f"  Last Traded Price: Rs. {quote['close']:,.2f} {trend}")
+    print(f"  Point Change: {pt_change:+,.2f}")
+    print(f"  % Change: {quote['pct_change']:+.2f}%")
+    print(f"  Open: Rs. {quote['open']:,.2f}")
+    print(f"  High: Rs. {quote['high']:,.2f}")
+    print(f"  Low: Rs. {quote['low']:,.2f}")
+    print(f"  Volume: {int(quote['volume']):,}")
+    print(f"  Prev. Closing: Rs. {quote['prev_close']:,.2f}")
+    print(f"\n  Sector: {company_details['sector']}")
+    print(f"  Share Registrar: {company_details['share_registrar']}")
+    print("=" * 100)
+    print(f"\nAs of: {quote['as_of']}\n")
+
+def _print_stonk_table(symbols, quotes, details):
+    """One-row-per-symbol view of several stocks"""
+    print("=" * 130)
+    print(f"{'Symbol':<10} {'Company':<36} {'LTP':>10} {'Change':>10} {'% Chg':>8}   {'Range':<21} {'Volume':>12}  {'Sector':<20}")
+    print("-" * 130)
+    for sym in symbols:
+        quote = quotes[sym]
+        trend = "📈" if quote["pt_change"] > 0 else "📉" if quote["pt_change"] < 0 else "➡️"
+        range_str = f"{quote['low']:,.2f} - {quote['high']:,.2f}"
+        print(f"{sym:<10} {details[sym]['company_fullform'][:36]:<36} {quote['close']:>10,.2f} "
+              f"{quote['pt_change']:>+10,.2f} {quote['pct_change']:>+7.2f}% {trend} {range_str:<21} "
+              f"{int(quote['volume']):>12,}  {details[sym]['sector'][:20]:<20}")
+    print("=" * 130)
+    print(f"\nAs of: {quotes[symbols[0]]['as_of']}\n")
+
+def cmd_stonk(*stock_names):
+    """Display stock details (information only - no charts/alerts)"""
+    try:
+        # Keep order, drop duplicates
+        symbols = list(dict.fromkeys(name.upper() for name in stock_names))
+        print(f"\n📊 Fetching details for {', '.join(symbols)}...\n")
         
-        # Fallback to ShareSansar if NepseAlpha failed
-        if not stock_price_data:
-            try:
-                response_live = requests.get(
-                    "https://www.sharesansar.com/live-trading", timeout=10)
-                
-                if response_live.status_code == 200:
-                    soup = BeautifulSoup(response_live.text, "lxml")
-                    stock_rows = soup.find_all("tr")
-                    
-                    for row in stock_rows[1:]:
-                        row_data = row.find_all("td")
-                        
-                        if len(row_data) > 9 and row_data[1].text.strip() == stock_name:
-                            close_price = float(row_data[2].text.strip().replace(',', ''))
-                            pt_change = float(row_data[3].text.strip().replace(',', ''))
-                            pct_change = row_data[4].text.strip()
-                            
-                            trend = "📈" if pt_change > 0 else "📉" if pt_change < 0 else "➡️"
-                            
-                            print("=" * 100)
-                            print(f"{trend} {stock_name} — {company_details['company_fullform']}")
-                            print("=" * 100)
-                            print(f"  Symbol: {stock_name}")
-                            print(f"  Last Traded Price: Rs. {row_data[2].text.strip()} {trend}")
-                            print(f"  Point Change: {row_data[3].text.strip()}")
-                            print(f"  % Change: {pct_change}")
-                            print(f"  Open: {row_data[5].text.strip()}")
-                            print(f"  High: {row_data[6].text.strip()}")
-                            print(f"  Low: {row_data[7].text.strip()}")
-                            print(f"  Volume: {row_data[8].text.strip()}")
-                            print(f"  Prev. Closing: {row_data[9].text.strip()}")
-                            print(f"\n  Sector: {company_details['sector']}")
-                            print(f"  Share Registrar: {company_details['share_registrar']}")
-                            print("=" * 100)
-                            timestamp = get_ss_time()
-                            print(f"\nAs of: {timestamp}\n")
-                            return
-            except:
-                pass
-            
-            print(f"⚠️  Stock '{stock_name}' not found.\n")
-            return
+        quotes, details = fetch_stonk_quotes(symbols)
+        found = [sym for sym in symbols if sym in quotes]
         
-        # Use NepseAlpha data
-        close_price = stock_price_data.get("close", 0)
-        percent_change = stock_price_data.get("percent_change", 0)
+        if len(symbols) == 1 and found:
+            _print_stonk_card(found[0], quotes[found[0]], details[found[0]])
+        elif found:
+            _print_stonk_table(found, quotes, details)
         
-        try:
-            if percent_change != 0 and close_price != 0:
-                prev_close = close_price / (1 + percent_change / 100)
-                pt_change = close_price - prev_close
-            else:
-                prev_close = close_price
-                pt_change = 0
-        except:
-            prev_close = close_price
-            pt_change = 0
+        for sym in symbols:
+            if sym not in quotes:
+                print(f"⚠️  Stock '{sym}' not found.\n")
         
-        trend = "📈" if pt_change > 0 else "📉" if pt_change < 0 else "➡️"
+    except Exception as e:
+        print(f"⚠️  Error fetching stock data: {str(e)}\n")
+
+def cmd_screen(filters=(), sort="pct_change", ascending=False, limit=30, sectors=False):
+    """Screen every listed stock in the live feed with filter expressions"""
+    import nepse_screen
+    
+    require_numpy("screen")
+    
+    try:
+        print("\n📊 Fetching live prices...\n")
+        prices = get_live_prices()
+        if not prices:
+            print("⚠️  Live prices unavailable.\n")
+            return
         
-        print("=" * 100)
-        print(f"{trend} {stock_name} — {company_details['company_fullform']}")
-        print("=" * 100)
-        print(f"  Symbol: {stock_name}")
-        print(f"  Last Traded Price: Rs. {close_price:,.2f} {trend}")
-        print(f"  Point Change: {pt_change:+,.2f}")
-        print(f"  % Change: {percent_change:+.2f}%")
-        print(f"  Open: Rs. {stock_price_data.get('open', 0):,.2f}")
-        print(f"  High: Rs. {stock_price_data.get('high', 0):,.2f}")
-        print(f"  Low: Rs. {stock_price_data.get('low', 0):,.2f}")
-        print(f"  Volume: {int(stock_price_data.get('volume', 0)):,}")
-        print(f"  Prev. Closing: Rs. {prev_close:,.2f}")
-        print(f"\n  Sector: {company_details['sector']}")
-        print(f"  Share Registrar: {company_details['share_registrar']}")
-        print("=" * 100)
-        print(f"\nAs of: {data.get('stock_live', {}).get('asOf', 'N/A')}\n")
+        started = time.perf_counter()
+        table = nepse_screen.load_table(prices)
+        if sectors or nepse_screen.uses_sector(filters, sort):
+            table = table.with_sectors(load_sector_map(list(table.columns["symbol"])))
+            sectors = True
+        rows = table.screen(filters, sort, descending=not ascending, limit=limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    except ValueError as e:
+        print(f"✗ {e}\n")
+        sys.exit(2)
+    except Exception as e:
+        print(f"⚠️  Error screening stocks: {str(e)[:200]}\n")
+        return
+    
+    title = " AND ".join(filters) if filters else "all stocks"
+    print("=" * 120)
+    print(f"🔎 SCREEN: {title}  (sorted by {nepse_screen.column_name(sort)}{' ascending' if ascending else ''})")
+    print("=" * 120)
+    print(f"{'#':<5} {'Symbol':<10} {'LTP':>10} {'Change':>10} {'% Chg':>8}   {'Volume':>12} {'Turnover':>12} {'Range %':>8}  {'Sector' if sectors else ''}")
+    print("-" * 120)
+    for rank, row in enumerate(rows, 1):
+        trend = "📈" if row["change"] > 0 else "📉" if row["change"] < 0 else "➡️"
+        sector = row.get("sector", "")[:24] if sectors else ""
+        print(f"{rank:<5} {row['symbol']:<10} {row['ltp']:>10,.2f} {row['change']:>+10,.2f} {row['pct_change']:>+7.2f}% {trend} "
+              f"{int(row['volume']):>12,} {format_number(row['turnover']):>12} {row['range_pct']:>7.2f}%  {sector}")
+    print("=" * 120)
+    shown = f"top {len(rows)}" if limit and len(rows) == limit else f"{len(rows)}"
+    print(f"\n✓ {shown} match(es) from {len(table)} symbols, screened in {elapsed_ms:.1f} ms")
+    as_of = next(iter(prices.values()))["as_of"]
+    print(f"As of: {as_of}\n")
+
+def cmd_sectors(sort="turnover"):
+    """Sector turnover, volume and breadth aggregated from the live trading feed"""
+    import nepse_screen
+    
+    require_numpy("sectors")
+    
+    try:
+        print("\n📊 Fetching live prices...\n")
+        prices = get_live_prices()
+        if not prices:
+            print("⚠️  Live prices unavailable.\n")
+            return
         
+        table = nepse_screen.load_table(prices)
+        symbols = list(table.columns["symbol"])
+        sector_map = load_sector_map(symbols)
+        if len(sector_map) < len(symbols):
+            print(f"⚠️  No sector known for {len(symbols) - len(sector_map)} symbol(s); counted as 'Unknown'\n")
+        rows = nepse_screen.aggregate_sectors(table.with_sectors(sector_map), sort)
+    except ValueError as e:
+        print(f"✗ {e}\n")
+        sys.exit(2)
     except Exception as e:
-        print(f"⚠️  Error fetching stock data: {str(e)}\n")
+        print(f"⚠️  Error aggregating sectors: {str(e)[:200]}\n")
+        return
+    
+    print("=" * 120)
+    print("🏭 SECTOR ACTIVITY (from live trading)")
+    print("=" * 120)
+    print(f"{'Sector':<32} {'Stocks':>7} {'▲ Adv':>7} {'▼ Dec':>7} {'= Unch':>7} {'Avg % Chg':>10} {'Volume':>14} {'Turnover':>12} {'Share':>7}")
+    print("-" * 120)
+    for row in rows:
+        print(f"{row['sector'][:32]:<32} {row['symbols']:>7} {row['advancers']:>7} {row['decliners']:>7} {row['unchanged']:>7} "
+              f"{row['pct_change']:>+9.2f}% {int(row['volume']):>14,} {format_number(row['turnover']):>12} {row['turnover_share']:>6.1f}%")
+    print("-" * 120)
+    advancers = sum(r["advancers"] for r in rows)
+    decliners = sum(r["decliners"] for r in rows)
+    turnover = sum(r["turnover"] for r in rows)
+    print(f"{'MARKET':<32} {len(table):>7} {advancers:>7} {decliners:>7} {len(table) - advancers - decliners:>7} "
+          f"{'':>10} {int(sum(r['volume'] for r in rows)):>14,} {format_number(turnover):>12}")
+    print("=" * 120)
+    print("Turnover is estimated as LTP x volume.")
+    print(f"\nAs of: {next(iter(prices.values()))['as_of']}\n")
+
+DEADLINE_COMMANDS = ("ipo", "nepse", "subidx", "mktsum", "topgl", "stonk", "screen", "sectors", "value", "dp-list")
+
+def print_budget_notes(budget, stream=None):
+    """Tell the user which results are stale or partial"""
+    if budget is None or not budget.notes:
+        return
+    stream = stream or sys.stdout
+    print("⚠️  Partial or cached results:", file=stream)
+    for note in budget.notes:
+        print(f"   • {note}", file=stream)
+    print(file=stream)
+
+def resolve_member(name=None):
+    """
+    Family member by name (case-insensitive), or the interactive picker
+
+    Returns:
+        member dict, or None if the name is unknown or the picker was cancelled
+    """
+    from main import load_family_members, select_family_member
+
+    if not name:
+        return select_family_member()
+    members = load_family_members().get('members', [])
+    for m in members:
+        if m['name'].lower() == name.lower():
+            return m
+    print(f"\n✗ Member '{name}' not found.")
+    print("\nAvailable members:")
+    for m in members:
+        print(f"  - {m['name']}")
+    print()
+    return None
 
 def main():
     parser = argparse.ArgumentParser(
@@ -535,21 +984,53 @@ Examples:
   nepse portfolio          Get portfolio for a member (headless mode)
   nepse login              Test login for a member (headless mode)
   nepse dp-list            View available DP list
+  nepse dp-list --search nmb   Search DPs by name, code or ID
   
   # Market Data Commands
   nepse ipo                View all open IPOs/FPOs
+  nepse ipo --changes      Only new/changed/closing-soon offerings since the last check
   nepse nepse              View NEPSE indices
   nepse subidx BANKING     View sub-index details
+  nepse subidx --all       View all sub-indices in one table
   nepse mktsum             View market summary
   nepse topgl              View top gainers/losers
+  nepse topgl -n 20 --by turnover --by volume --sector "Hydro Power"   Other leaderboards
   nepse stonk NABIL        View stock details
+  nepse stonk NABIL NICA HIDCL   Compare several stocks in one table
+  nepse screen "pct_change>5" "volume>100000"   Screen every listed stock
+  nepse screen sector==Hydropower --sort turnover --limit 10
+  nepse sectors            Turnover, volume and advancers/decliners per sector
+  nepse watch              Live-refresh NEPSE indices (Ctrl+C to stop)
+  nepse history NEPSE --days 30   Index history recorded locally
+  nepse value              Revalue every saved family portfolio at live prices
+  nepse watch stonk NABIL NICA --interval 15   Live watchlist
+  nepse nepse --no-cache   Skip the local response cache (always hit the network)
+  nepse stonk NABIL --deadline 5   Give up waiting after 5 s (shows cached data instead)
+  nepse record             Save every market page as an offline fixture corpus
+  nepse serve              JSON API for scripts/dashboards on http://127.0.0.1:8765/
+  nepse prefetch           Keep market pages cached during trading hours (leave running)
   
   nepse apply --gui        Apply for IPO with browser window visible
   nepse apply-all --gui    Apply IPO for all members with browser visible
+  nepse apply-all --max-tabs 2   Keep at most 2 member tabs open (low-memory hosts)
+  nepse apply-all --job job.json Unattended run from a job file (cron friendly)
   nepse portfolio --gui    Get portfolio with browser window visible
         """
     )
     
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk HTTP cache for market data")
+    parser.add_argument("--deadline", type=float, default=nepse_http.COMMAND_DEADLINE, metavar="SECONDS",
+                        help=f"Time budget for all requests of a market command; when it runs out, cached data "
+                             f"is shown instead (default {nepse_http.COMMAND_DEADLINE}, 0 = no limit)")
+    # Also accepted after market subcommands (`nepse nepse --no-cache`);
+    # SUPPRESS keeps the subparser from resetting a flag given before it
+    cache_parent = argparse.ArgumentParser(add_help=False)
+    cache_parent.add_argument("--no-cache", action="store_true", default=argparse.SUPPRESS,
+                              help="Bypass the on-disk HTTP cache for market data")
+    cache_parent.add_argument("--deadline", type=float, default=argparse.SUPPRESS, metavar="SECONDS",
+                              help="Time budget for all requests of the command (0 = no limit)")
+    
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
     
     # Apply IPO
@@ -559,6 +1040,18 @@ Examples:
     # Apply IPO for all members
     apply_all_parser = subparsers.add_parser("apply-all", help="Apply IPO for ALL family members (multi-tab)")
     apply_all_parser.add_argument("--gui", action="store_true", help="Show browser window (default is headless)")
+    apply_all_parser.add_argument("--max-tabs", type=int, default=DEFAULT_MAX_TABS,
+                                  help=f"Maximum logged-in tabs open at once (default {DEFAULT_MAX_TABS})")
+    apply_all_parser.add_argument("--retries", type=int, default=None,
+                                  help="Attempts per login/listing/submit step (default 3)")
+    apply_all_parser.add_argument("--max-rps", type=float, default=None,
+                                  help="Max Meroshare requests per second, shared by all workers (default 2)")
+    apply_all_parser.add_argument("--max-login-rate", type=float, default=None,
+                                  help="Max new logins per second, shared by all workers (default 0.33)")
+    apply_all_parser.add_argument("--job", metavar="JOB_FILE",
+                                  help="Run unattended from a JSON job file (members, issue matcher, kitta, failure policy)")
+    apply_all_parser.add_argument("--output", choices=["text", "ndjson"], default="text",
+                                  help="ndjson: stream one JSON event per member step to stdout (logs go to stderr)")
     
     # Add member
     subparsers.add_parser("add", help="Add or update a family member")
@@ -570,28 +1063,101 @@ Examples:
     portfolio_parser = subparsers.add_parser("portfolio", help="Get portfolio for a member")
     portfolio_parser.add_argument("name", nargs='?', help="Family member name (optional, will prompt if not provided)")
     portfolio_parser.add_argument("--gui", action="store_true", help="Show browser window (default is headless)")
+    portfolio_parser.add_argument("--output", choices=["text", "ndjson"], default="text",
+                                  help="ndjson: stream JSON events to stdout (logs go to stderr)")
     
     # Test login
     login_parser = subparsers.add_parser("login", help="Test login for a member")
+    login_parser.add_argument("name", nargs='?', help="Family member name (optional, will prompt if not provided)")
     login_parser.add_argument("--gui", action="store_true", help="Show browser window (default is headless)")
+    login_parser.add_argument("--output", choices=["text", "ndjson"], default="text",
+                              help="ndjson: stream JSON events to stdout (logs go to stderr)")
     
     # DP list
-    subparsers.add_parser("dp-list", help="View available DP (Depository Participant) list")
+    dp_parser = subparsers.add_parser("dp-list", help="View available DP (Depository Participant) list")
+    dp_parser.add_argument("--search", help="Fuzzy search by DP name, code or ID (e.g., nmb)")
+    dp_parser.add_argument("--refresh", action="store_true", help="Re-download the DP list instead of using the cache")
     
     # Market data commands
-    subparsers.add_parser("ipo", help="View all open IPOs/public offerings")
-    subparsers.add_parser("nepse", help="View NEPSE indices data")
-    subidx_parser = subparsers.add_parser("subidx", help="View sub-index details")
-    subidx_parser.add_argument("subindex", help="Sub-index name (e.g., BANKING, HYDROPOWER)")
-    subparsers.add_parser("mktsum", help="View market summary")
-    subparsers.add_parser("topgl", help="View top 10 gainers and losers")
-    stonk_parser = subparsers.add_parser("stonk", help="View stock details")
-    stonk_parser.add_argument("stock", help="Stock symbol (e.g., NABIL, NICA)")
+    ipo_parser = subparsers.add_parser("ipo", help="View all open IPOs/public offerings", parents=[cache_parent])
+    ipo_parser.add_argument("--changes", action="store_true",
+                            help="Only offerings that are new, changed or closing soon since the last check")
+    ipo_parser.add_argument("--poll", type=float, metavar="SECONDS",
+                            help="With --changes: keep checking every SECONDS")
+    ipo_parser.add_argument("--output", choices=["text", "ndjson"], default="text",
+                            help="With --changes: ndjson streams one JSON event per change to stdout")
+    subparsers.add_parser("nepse", help="View NEPSE indices data", parents=[cache_parent])
+    subidx_parser = subparsers.add_parser("subidx", help="View sub-index details", parents=[cache_parent])
+    subidx_parser.add_argument("subindex", nargs='?', help="Sub-index name (e.g., BANKING, HYDROPOWER)")
+    subidx_parser.add_argument("--all", action="store_true", help="Show every sub-index in one table")
+    subparsers.add_parser("mktsum", help="View market summary", parents=[cache_parent])
+    topgl_parser = subparsers.add_parser("topgl", help="View top gainers/losers and turnover/volume leaders",
+                                         parents=[cache_parent])
+    topgl_parser.add_argument("-n", type=int, default=10, help="Rows per leaderboard (default 10)")
+    topgl_parser.add_argument("--by", action="append", choices=["gainers", "losers", "turnover", "volume"],
+                              help="Leaderboard(s) to show; repeat for several (default: gainers and losers)")
+    topgl_parser.add_argument("--sector", help="Only stocks in this sector (e.g. \"Hydro Power\")")
+    stonk_parser = subparsers.add_parser("stonk", help="View stock details", parents=[cache_parent])
+    stonk_parser.add_argument("stock", nargs="+", help="Stock symbol(s) (e.g., NABIL NICA HIDCL)")
+    screen_parser = subparsers.add_parser("screen", help="Filter and rank every listed stock from the live feed",
+                                          parents=[cache_parent])
+    screen_parser.add_argument("filters", nargs="*", metavar="FILTER",
+                               help="Conditions ANDed together, e.g. pct_change>5 volume>100000 sector==Hydropower "
+                                    "(quote them in the shell)")
+    screen_parser.add_argument("--sort", default="pct_change",
+                               help="Column to rank by (default pct_change): ltp, change, pct_change, open, high, low, "
+                                    "volume, prev_close, turnover, range_pct, symbol, sector")
+    screen_parser.add_argument("--asc", action="store_true", help="Sort ascending (default: largest first)")
+    screen_parser.add_argument("--limit", type=int, default=30, help="Rows to show (default 30, 0 for all)")
+    screen_parser.add_argument("--sectors", action="store_true",
+                               help="Show sectors (looked up once per symbol, then cached for a week)")
+    sectors_parser = subparsers.add_parser("sectors", help="Per-sector turnover, volume and breadth from live trading",
+                                           parents=[cache_parent])
+    sectors_parser.add_argument("--sort", default="turnover", choices=["turnover", "volume", "advancers", "decliners",
+                                                                       "pct_change", "symbols", "sector"],
+                                help="Order of the sectors (default turnover)")
+    value_parser = subparsers.add_parser("value", help="Revalue saved family portfolios at live prices",
+                                         parents=[cache_parent])
+    value_parser.add_argument("--member", help="Only this member (default: everyone with a saved portfolio)")
+    value_parser.add_argument("--no-sectors", action="store_true",
+                              help="Skip sector weights (no company-page lookups)")
+    history_parser = subparsers.add_parser("history", help="Daily index history from local data")
+    history_parser.add_argument("index", help="Index or sub-index (e.g., NEPSE, SENSITIVE, BANKING)")
+    history_parser.add_argument("--days", type=int, default=30, help="How many days back (default 30)")
+    record_parser = subparsers.add_parser("record", help="Save market pages as fixtures for offline parser checks")
+    record_parser.add_argument("--symbol", default="NABIL", help="Stock whose pages are recorded (default NABIL)")
+    record_parser.add_argument("--dir", type=Path, default=None,
+                               help="Fixture directory (default: <data dir>/fixtures)")
+    serve_parser = subparsers.add_parser("serve", help="Serve market data and saved portfolios as a local JSON API",
+                                         parents=[cache_parent])
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765)")
+    prefetch_parser = subparsers.add_parser("prefetch", help="Keep market pages cached on a trading-session schedule")
+    prefetch_parser.add_argument("--once", action="store_true", help="Refresh once and exit (for cron/Task Scheduler)")
+    prefetch_parser.add_argument("--quiet", action="store_true", help="Only report pages that failed")
+    watch_parser = subparsers.add_parser("watch", help="Live-refresh indices, top gainers/losers or stocks",
+                                         parents=[cache_parent])
+    watch_parser.add_argument("view", nargs='?', default="indices", choices=["indices", "topgl", "stonk"],
+                              help="What to watch (default: indices)")
+    watch_parser.add_argument("symbols", nargs="*", help="Stock symbols for the stonk view")
+    watch_parser.add_argument("--interval", type=float, default=30,
+                              help="Seconds between refreshes while the market is open (default 30, min 5)")
     
     args = parser.parse_args()
     
+    if args.no_cache:
+        nepse_http.set_cache_enabled(False)
+    
+    # One time budget shared by every request of a one-shot market command
+    # (long-running commands set their own per cycle/request)
+    budget = None
+    one_shot = args.command in DEADLINE_COMMANDS and not (args.command == "ipo" and args.poll)
+    if one_shot and args.deadline > 0:
+        budget = nepse_http.start_deadline(args.deadline)
+    
     # If no command provided, run interactive menu
     if not args.command:
+        from main import main as interactive_menu
         try:
             interactive_menu()
         except KeyboardInterrupt:
@@ -602,65 +1168,127 @@ Examples:
     # Execute commands
     try:
         if args.command == "apply":
+            from main import apply_ipo
             # Default to headless, only show GUI if --gui flag is passed
             apply_ipo(auto_load=True, headless=not args.gui)
         elif args.command == "apply-all":
             # Apply IPO for all members - default to headless, show GUI if --gui flag is passed
-            apply_ipo_for_all_members(headless=not args.gui)
+            from main import apply_ipo_for_all_members, load_apply_job, JobSpecError, EXIT_BAD_JOB
+            with event_output(args.output) as events:
+                job = None
+                if args.job:
+                    try:
+                        job = load_apply_job(args.job)
+                    except JobSpecError as e:
+                        print(f"\n✗ {e}")
+                        events.emit("error", ok=False, error=str(e), exit_code=EXIT_BAD_JOB)
+                        sys.exit(EXIT_BAD_JOB)
+                exit_code = apply_ipo_for_all_members(
+                    headless=not args.gui,
+                    max_tabs=args.max_tabs,
+                    retries=args.retries,
+                    requests_per_sec=args.max_rps,
+                    logins_per_sec=args.max_login_rate,
+                    job=job,
+                    events=events,
+                )
+            sys.exit(exit_code)
         elif args.command == "add":
+            from main import add_family_member
             add_family_member()
         elif args.command == "list":
+            from main import list_family_members
             list_family_members()
             input("\nPress Enter to continue...")
         elif args.command == "portfolio":
-            if args.name:
-                # Find member by name
-                config = load_family_members()
-                members = config.get('members', [])
-                member = None
-                for m in members:
-                    if m['name'].lower() == args.name.lower():
-                        member = m
-                        break
-                if not member:
-                    print(f"\n✗ Member '{args.name}' not found.")
-                    print("\nAvailable members:")
-                    for m in members:
-                        print(f"  - {m['name']}")
-                    print()
-                    sys.exit(1)
-            else:
-                # Prompt for member selection
-                member = select_family_member()
-            
-            if member:
+            from main import get_portfolio_for_member
+            # Menus and errors go to stderr too in ndjson mode; stdout stays events only
+            with event_output(args.output) as events:
+                member = resolve_member(args.name)
+                if member is None:
+                    sys.exit(1 if args.name else 0)
                 # Default to headless, only show GUI if --gui flag is passed
-                get_portfolio_for_member(member, headless=not args.gui)
+                holdings = get_portfolio_for_member(member, headless=not args.gui, events=events)
+            if holdings is None:
+                sys.exit(1)
         elif args.command == "login":
-            member = select_family_member()
-            if member:
-                # Default to headless, only show GUI if --gui flag is passed
-                test_login_for_member(member, headless=not args.gui)
+            from main import test_login_for_member
+            with event_output(args.output) as events:
+                member = resolve_member(args.name)
+                if member is None:
+                    sys.exit(1 if args.name else 0)
+                success = test_login_for_member(member, headless=not args.gui, events=events)
+            if not success:
+                sys.exit(1)
         elif args.command == "dp-list":
-            get_dp_list()
+            from main import get_dp_list
+            get_dp_list(search=args.search, refresh=args.refresh)
         elif args.command == "ipo":
-            cmd_ipo()
+            if args.changes:
+                with event_output(args.output) as events:
+                    cmd_ipo_changes(args.poll, events if args.output == "ndjson" else None)
+            else:
+                cmd_ipo()
         elif args.command == "nepse":
             cmd_nepse()
         elif args.command == "subidx":
-            cmd_subidx(args.subindex)
+            if args.all:
+                cmd_subidx_all()
+            elif args.subindex:
+                cmd_subidx(args.subindex)
+            else:
+                subidx_parser.error("give a sub-index name or --all")
         elif args.command == "mktsum":
             cmd_mktsum()
         elif args.command == "topgl":
-            cmd_topgl()
+            if args.n < 1:
+                topgl_parser.error("-n must be at least 1")
+            cmd_topgl(args.n, tuple(dict.fromkeys(args.by or ["gainers", "losers"])), args.sector)
         elif args.command == "stonk":
-            cmd_stonk(args.stock)
+            cmd_stonk(*args.stock)
+        elif args.command == "screen":
+            cmd_screen(args.filters, args.sort, args.asc, args.limit, args.sectors)
+        elif args.command == "sectors":
+            cmd_sectors(args.sort)
+        elif args.command == "value":
+            cmd_value(args.member, sectors=not args.no_sectors)
+        elif args.command == "history":
+            cmd_history(args.index, args.days)
+        elif args.command == "serve":
+            from nepse_server import serve
+            serve(args.host, args.port)
+        elif args.command == "prefetch":
+            if args.no_cache:
+                prefetch_parser.error("prefetch fills the response cache; drop --no-cache")
+            from nepse_prefetch import run
+            if not args.quiet:
+                print("\n🔄 Prefetching market pages into the local cache (Ctrl+C to stop)\n")
+            sys.exit(run(once=args.once, quiet=args.quiet))
+        elif args.command == "record":
+            from nepse_bench import default_fixtures_dir, record_fixtures
+            fixtures_dir = args.dir or default_fixtures_dir()
+            print(f"\n📼 Recording market pages to {fixtures_dir}...\n")
+            if not record_fixtures(fixtures_dir, args.symbol):
+                sys.exit(1)
+            print("💡 Check parsers offline with: python nepse_bench.py replay\n")
+        elif args.command == "watch":
+            from nepse_watch import watch
+            if args.view == "stonk" and not args.symbols:
+                watch_parser.error("the stonk view needs at least one symbol")
+            watch(args.view, args.symbols, interval=args.interval)
     except KeyboardInterrupt:
         print("\n\n✗ Cancelled by user")
         sys.exit(0)
     except Exception as e:
-        print(f"\n✗ Error: {e}")
+        if getattr(args, "output", "text") == "ndjson":
+            print(f"\n✗ Error: {e}", file=sys.stderr)
+            EventStream(sys.stdout).emit("error", ok=False, error=str(e), exit_code=1)
+        else:
+            print(f"\n✗ Error: {e}")
         sys.exit(1)
+    finally:
+        # Keep an NDJSON stdout machine-readable
+        print_budget_notes(budget, sys.stderr if getattr(args, "output", "text") == "ndjson" else None)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,15 @@
+"""
+Shared configuration for the nepse CLI
+
+Kept free of heavy imports so every module (including the fast market-data
+commands) can locate the data directory cheaply.
+"""
+import os
+from pathlib import Path
+
+# Fixed data directory for all credentials, caches and local history.
+# Set NEPSE_DATA_DIR to use a different location (e.g. on Linux servers).
+DATA_DIR = Path(os.environ.get("NEPSE_DATA_DIR") or r"C:\Users\MenaceXnadin\Documents\merosharedata")
+
+# Maximum number of logged-in Meroshare tabs kept open at once by apply-all
+DEFAULT_MAX_TABS = 4
@@ -0,0 +1,152 @@
+"""
+Cached, indexed directory of Meroshare Depository Participants (DPs)
+
+The DP list from ``/api/meroShare/capital/`` rarely changes, so it is kept
+as a local snapshot with a TTL. Lookups by ID or code and fuzzy name
+searches run against an in-memory index, and the last snapshot keeps
+working offline.
+"""
+import bisect
+import difflib
+import json
+import re
+import time
+
+from nepse_config import DATA_DIR
+
+DP_API_URL = "https://webbackend.cdsc.com.np/api/meroShare/capital/"
+DP_CACHE_FILE = DATA_DIR / "dp_directory.json"
+DP_CACHE_TTL = 7 * 24 * 3600  # one week
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+class DPDirectory:
+    """
+    In-memory DP index by ID, code and name tokens
+
+    Args:
+        entries: List of DP dicts with 'id', 'code' and 'name'
+        fetched_at: Unix time the snapshot was downloaded
+        stale: True when serving an expired snapshot because the API failed
+    """
+
+    def __init__(self, entries, fetched_at=None, stale=False):
+        self.entries = sorted(entries, key=lambda dp: dp['name'])
+        self.fetched_at = fetched_at
+        self.stale = stale
+        self.by_id = {str(dp['id']): dp for dp in self.entries}
+        self.by_code = {str(dp['code']): dp for dp in self.entries}
+
+        # Sorted token list for prefix search via bisect
+        token_map = {}
+        for pos, dp in enumerate(self.entries):
+            for token in set(_tokens(dp['name']) + _tokens(dp['code']) + _tokens(dp['id'])):
+                token_map.setdefault(token, set()).add(pos)
+        self._token_map = token_map
+        self._token_keys = sorted(token_map)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, value):
+        """Exact lookup by DP ID or code; returns the DP dict or None"""
+        value = str(value).strip()
+        return self.by_id.get(value) or self.by_code.get(value)
+
+    def _prefix_matches(self, token):
+        start = bisect.bisect_left(self._token_keys, token)
+        matches = set()
+        for key in self._token_keys[start:]:
+            if not key.startswith(token):
+                break
+            matches |= self._token_map[key]
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Fuzzy search by name, code or ID
+
+        Every query token must prefix-match a token of the DP. If nothing
+        matches, falls back to close spelling matches per token.
+        """
+        exact = self.get(query)
+        if exact:
+            return [exact]
+
+        query_tokens = _tokens(query)
+        if not query_tokens:
+            return []
+
+        candidates = self._match_all(query_tokens, self._prefix_matches)
+        if not candidates:
+            candidates = self._match_all(query_tokens, self._close_matches)
+
+        results = [self.entries[pos] for pos in candidates]
+        results.sort(key=lambda dp: (not dp['name'].lower().startswith(query.lower()), dp['name']))
+        return results[:limit]
+
+    def _close_matches(self, token):
+        matches = set()
+        for key in difflib.get_close_matches(token, self._token_keys, n=5, cutoff=0.75):
+            matches |= self._token_map[key]
+        return matches
+
+    @staticmethod
+    def _match_all(tokens, matcher):
+        """Positions matched by every token (intersection)"""
+        candidates = None
+        for token in tokens:
+            matches = matcher(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return set()
+        return candidates
+
+
+def _read_snapshot():
+    try:
+        with open(DP_CACHE_FILE, 'r') as f:
+            snapshot = json.load(f)
+        return snapshot['entries'], snapshot.get('fetched_at', 0)
+    except (OSError, ValueError, KeyError):
+        return None, 0
+
+
+def _write_snapshot(entries):
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(DP_CACHE_FILE, 'w') as f:
+        json.dump({"fetched_at": time.time(), "entries": entries}, f)
+
+
+def fetch_dp_entries(timeout=10):
+    """Download the DP list from the Meroshare API"""
+    import nepse_http
+
+    response = nepse_http.get(DP_API_URL, timeout=timeout)
+    response.raise_for_status()
+    return [{"id": dp['id'], "code": dp['code'], "name": dp['name']} for dp in response.json()]
+
+
+def load_dp_directory(refresh=False, ttl=DP_CACHE_TTL, timeout=10):
+    """
+    Return the DP directory, downloading it only when the snapshot expired
+
+    Falls back to the last snapshot (marked ``stale``) if the download
+    fails; raises the download error only when no snapshot exists.
+    """
+    entries, fetched_at = _read_snapshot()
+    if entries and not refresh and time.time() - fetched_at < ttl:
+        return DPDirectory(entries, fetched_at)
+
+    try:
+        fresh = fetch_dp_entries(timeout=timeout)
+    except Exception:
+        if entries:
+            return DPDirectory(entries, fetched_at, stale=True)
+        raise
+
+    _write_snapshot(fresh)
+    return DPDirectory(fresh, time.time())
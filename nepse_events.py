@@ -0,0 +1,64 @@
+"""
+Machine-readable NDJSON event stream for automation runs
+
+With ``--output ndjson`` every member step (login, apply, portfolio, final
+result) is written to stdout as one JSON object per line the moment it
+completes, while the usual human-readable progress output moves to stderr.
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timezone
+
+
+class EventStream:
+    """
+    Thread-safe NDJSON writer
+
+    Args:
+        stream: File object to write to (defaults to sys.stdout)
+        enabled: When False every emit is a no-op
+    """
+
+    def __init__(self, stream=None, enabled=True):
+        self.stream = stream if stream is not None else sys.stdout
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        """Write one event line and flush it immediately"""
+        if not self.enabled:
+            return
+        record = {"event": event, "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds")}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+# Shared disabled stream so callers never need to check for None
+NULL_EVENTS = EventStream(enabled=False)
+
+
+def elapsed_ms(started):
+    """Milliseconds since a time.monotonic() timestamp"""
+    return int((time.monotonic() - started) * 1000)
+
+
+@contextmanager
+def event_output(output="text"):
+    """
+    Select the output mode for an automation command
+
+    Yields an EventStream. In ``ndjson`` mode events go to the real stdout
+    and all print() output is redirected to stderr for the duration.
+    """
+    if output != "ndjson":
+        yield NULL_EVENTS
+        return
+    events = EventStream(sys.stdout)
+    with redirect_stdout(sys.stderr):
+        yield events
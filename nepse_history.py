@@ -0,0 +1,206 @@
+"""
+Local time-series store for market snapshots
+
+Every market page the CLI parses (indices and sub-indices, market summary,
+top gainers/losers, from MeroLagani or ranked from the live feed) is
+appended to a SQLite database in the data directory. Rows are clustered by
+(series, trading day) so ``nepse history NEPSE --days 30`` is an index
+range scan. A page whose content was already recorded (e.g. served again
+from the HTTP cache) is skipped.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from nepse_config import DATA_DIR
+
+HISTORY_DB = DATA_DIR / "history.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    source TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (source, source_hash)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS series (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS index_points (
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    point_change REAL, pct_change REAL, turnover REAL,
+    PRIMARY KEY (name, day, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS market_summary (
+    day TEXT NOT NULL,
+    ts REAL NOT NULL,
+    turnover REAL, traded_shares REAL, transactions REAL, scrips_traded REAL,
+    market_cap REAL, floated_market_cap REAL,
+    PRIMARY KEY (day, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS movers (
+    day TEXT NOT NULL,
+    ts REAL NOT NULL,
+    side TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    ltp REAL, pct_change REAL, high REAL, low REAL, volume REAL, turnover REAL,
+    PRIMARY KEY (day, ts, side, rank)
+) WITHOUT ROWID;
+"""
+
+_lock = threading.Lock()
+
+
+def connect(path=None):
+    """Open the history database, creating the schema on first use"""
+    path = path or HISTORY_DB
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=5)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _page_is_new(conn, source, content, fetched_at):
+    """Register a page body; False if that exact content was already recorded"""
+    source_hash = hashlib.sha1(content).hexdigest()
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO pages (source, source_hash, fetched_at) VALUES (?, ?, ?)",
+        (source, source_hash, fetched_at),
+    )
+    return cursor.rowcount == 1
+
+
+def _day(ts):
+    import nepse_http
+
+    return nepse_http.session_day(datetime.fromtimestamp(ts, nepse_http.NPT)).isoformat()
+
+
+def _record(source, content, fetched_at, write):
+    """Run ``write(conn, day, ts)`` once per new page body; never raises"""
+    try:
+        with _lock:
+            conn = connect()
+            try:
+                with conn:
+                    ts = fetched_at or time.time()
+                    if _page_is_new(conn, source, content, ts):
+                        write(conn, _day(ts), ts)
+            finally:
+                conn.close()
+    except (sqlite3.Error, OSError):
+        pass  # history is best-effort; never break a market command
+
+
+def record_indices(snapshot, response):
+    """Append a MarketSnapshot's main and sub-index rows"""
+    def write(conn, day, ts):
+        rows = []
+        for kind, records in (("index", snapshot.indices), ("sub_index", snapshot.sub_indices)):
+            for rec in records:
+                rows.append((rec.name, day, ts, kind, rec.open, rec.high, rec.low, rec.close,
+                             rec.point_change, rec.pct_change, rec.turnover))
+        conn.executemany("INSERT OR REPLACE INTO index_points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT OR IGNORE INTO series VALUES (?, ?)", [(row[0], row[3]) for row in rows])
+
+    _record("market", response.content, response.fetched_at, write)
+
+
+def record_summary(summary, response):
+    """Append the market summary figures (cells as read by cmd_mktsum)"""
+    from nepse_market import to_float
+
+    cells = summary["cells"]
+    if len(cells) < 12:
+        return
+    values = [to_float(cells[i]) for i in (1, 3, 5, 7, 9, 11)]
+
+    def write(conn, day, ts):
+        conn.execute("INSERT OR REPLACE INTO market_summary VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     [day, ts] + values)
+
+    _record("market-summary", response.content, response.fetched_at, write)
+
+
+def record_movers(gainers, losers, response):
+    """Append top gainers/losers rows (cell texts as read by cmd_topgl)"""
+    from nepse_market import to_float
+
+    def write(conn, day, ts):
+        rows = []
+        for side, table in (("gainer", gainers), ("loser", losers)):
+            for rank, tds in enumerate(table, 1):
+                rows.append((day, ts, side, rank, tds[0].strip(), to_float(tds[1]), to_float(tds[2]),
+                             to_float(tds[3]), to_float(tds[4]), to_float(tds[6]), to_float(tds[7])))
+        conn.executemany("INSERT OR REPLACE INTO movers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    _record("topgl", response.content, response.fetched_at, write)
+
+
+def record_leaders(gainers, losers, fetched_at=None):
+    """Append top gainers/losers ranked from the live feed (nepse_screen.leaderboard rows)"""
+    rows = [(side, rank, q) for side, table in (("gainer", gainers), ("loser", losers))
+            for rank, q in enumerate(table, 1)]
+    content = json.dumps([(side, q["symbol"], q["close"], q["pct_change"], q["volume"]) for side, _, q in rows])
+
+    def write(conn, day, ts):
+        conn.executemany("INSERT OR REPLACE INTO movers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         [(day, ts, side, rank, q["symbol"], q["close"], q["pct_change"], q["high"], q["low"],
+                           q["volume"], q["turnover"]) for side, rank, q in rows])
+
+    _record("live-movers", content.encode("utf-8"), fetched_at, write)
+
+
+def resolve_name(conn, name):
+    """Stored series name for ``name`` (exact, sub-index alias, or prefix match), or None"""
+    from nepse_market import SUB_INDEX_ALIASES
+
+    name = SUB_INDEX_ALIASES.get(name.upper(), name)
+    names = [row[0] for row in conn.execute("SELECT name FROM series")]
+    for candidate in names:
+        if candidate.upper() == name.upper():
+            return candidate
+    matches = sorted(n for n in names if n.upper().startswith(name.upper()))
+    return matches[0] if matches else None
+
+
+def index_history(name, days=30, conn=None):
+    """
+    Daily history of one index from local data
+
+    Returns:
+        (series name or None, list of dicts per trading day, oldest first)
+        using the last snapshot recorded on each day
+    """
+    import nepse_http
+
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        series = resolve_name(conn, name)
+        if series is None:
+            return None, []
+        since = (datetime.now(nepse_http.NPT).date() - timedelta(days=days)).isoformat()
+        cursor = conn.execute(
+            "SELECT day, MAX(ts), open, high, low, close, point_change, pct_change, turnover "
+            "FROM index_points WHERE name = ? AND day >= ? GROUP BY day ORDER BY day",
+            (series, since),
+        )
+        columns = ["day", "ts", "open", "high", "low", "close", "point_change", "pct_change", "turnover"]
+        return series, [dict(zip(columns, row)) for row in cursor]
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,525 @@
+"""
+Shared HTTP client for market-data commands
+
+All market commands go through one module-level ``requests.Session`` so
+repeated calls to the same host (e.g. several sharesansar.com pages in one
+command) reuse keep-alive connections instead of paying a fresh TCP and TLS
+handshake each time. ``requests`` itself is imported on first use to keep
+CLI startup fast.
+
+``fetch`` adds an on-disk response cache under the data directory. Entries
+expire quickly while NEPSE is trading (11:00-15:00 NPT, Sunday-Thursday)
+and slowly otherwise, and expired entries are revalidated with
+ETag/Last-Modified so unchanged pages cost a 304 instead of a download.
+
+A command can run under one ``deadline``: every request it makes (in any
+thread started through ``bind_context``) gets at most the time left as its
+timeout, and once the budget is spent, or a site fails, ``fetch`` serves
+the last cached copy (marked stale) instead of failing.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from nepse_config import DATA_DIR
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36 nepse-cli/1.0"
+)
+DEFAULT_TIMEOUT = 10  # seconds
+COMMAND_DEADLINE = 20  # seconds for every request of one market command together
+
+# Connection pools: one per host, several keep-alive connections per pool
+POOL_HOSTS = 10
+POOL_SIZE_PER_HOST = 10
+
+_session = None
+_scraper = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """Return the shared pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE_PER_HOST)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # requests already advertises gzip/deflate (plus br/zstd when
+                # the optional decoders are installed) and decodes transparently
+                session.headers.update({
+                    "User-Agent": USER_AGENT,
+                    "Accept": "text/html,application/json;q=0.9,*/*;q=0.8",
+                    "Connection": "keep-alive",
+                })
+                _session = session
+    return _session
+
+
+def get(url, timeout=None, **kwargs):
+    """GET ``url`` on the shared session with the default timeout (capped by the command deadline)"""
+    return get_session().get(url, timeout=budget_timeout(timeout), **kwargs)
+
+
+def get_scraper():
+    """Return a shared cloudscraper session (for Cloudflare-protected sites)"""
+    global _scraper
+    if _scraper is None:
+        with _lock:
+            if _scraper is None:
+                import cloudscraper
+
+                _scraper = cloudscraper.create_scraper()
+    return _scraper
+
+
+# ============================================
+# Command deadline
+# ============================================
+
+class DeadlineExceeded(TimeoutError):
+    """The command's time budget ran out before a request could be made"""
+
+
+class Budget:
+    """
+    Time budget shared by every request of one command
+
+    Args:
+        expires: time.monotonic() value when the budget runs out
+    """
+
+    def __init__(self, expires):
+        self.expires = expires
+        self.notes = []  # what was served stale or left out, for the user
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def note(self, message):
+        with self._lock:
+            if message not in self.notes:
+                self.notes.append(message)
+
+
+_budget = contextvars.ContextVar("nepse_budget", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Run a block under a time budget of ``seconds`` (None: no budget)
+
+    Nested deadlines never extend an outer one; they share its notes.
+    Yields the active Budget (or None).
+    """
+    outer = _budget.get()
+    if seconds is None:
+        yield outer
+        return
+    expires = time.monotonic() + seconds
+    if outer is not None and outer.expires <= expires:
+        yield outer
+        return
+    budget = Budget(expires)
+    if outer is not None:
+        budget.notes = outer.notes  # report inner stale/partial results with the outer command
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def start_deadline(seconds):
+    """
+    Put the rest of the current context under a budget of ``seconds``
+
+    For one-shot CLI commands, where a ``with deadline(...)`` block would
+    have to wrap the whole dispatch. Returns the Budget.
+    """
+    budget = Budget(time.monotonic() + seconds)
+    _budget.set(budget)
+    return budget
+
+
+def current_budget():
+    """The Budget of the running command, or None"""
+    return _budget.get()
+
+
+def remaining(default=None):
+    """Seconds left in the command's budget (``default`` when there is none)"""
+    budget = _budget.get()
+    return default if budget is None else max(0.0, budget.remaining())
+
+
+def budget_timeout(timeout=None):
+    """Request timeout: ``timeout`` (or DEFAULT_TIMEOUT) capped by the time left"""
+    timeout = timeout or DEFAULT_TIMEOUT
+    budget = _budget.get()
+    if budget is None:
+        return timeout
+    left = budget.remaining()
+    if left <= 0:
+        raise DeadlineExceeded("command deadline reached")
+    return min(timeout, max(0.1, left))
+
+
+def note(message):
+    """Record that a result is stale or partial (shown after the command)"""
+    budget = _budget.get()
+    if budget is not None:
+        budget.note(message)
+
+
+def bind_context(func):
+    """
+    Wrap ``func`` to run in a copy of the caller's context
+
+    Thread pools do not inherit context variables; submitting
+    ``bind_context(func)`` keeps the command deadline in worker threads.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+# ============================================
+# Market session
+# ============================================
+
+NPT = timezone(timedelta(hours=5, minutes=45))
+TRADING_WEEKDAYS = (6, 0, 1, 2, 3)  # Sunday-Thursday (datetime.weekday())
+SESSION_OPEN_HOUR = 11
+SESSION_CLOSE_HOUR = 15
+
+
+def market_is_open(now=None):
+    """True during the NEPSE trading session (Nepal time)"""
+    now = (now or datetime.now(NPT)).astimezone(NPT)
+    return now.weekday() in TRADING_WEEKDAYS and SESSION_OPEN_HOUR <= now.hour < SESSION_CLOSE_HOUR
+
+
+def session_day(now=None):
+    """Date of the latest trading session that has started (the day market data belongs to)"""
+    now = (now or datetime.now(NPT)).astimezone(NPT)
+    day = now.date()
+    if now.hour < SESSION_OPEN_HOUR:
+        day -= timedelta(days=1)
+    while day.weekday() not in TRADING_WEEKDAYS:
+        day -= timedelta(days=1)
+    return day
+
+
+def seconds_until_open(now=None):
+    """Seconds until the next session opens (0 while it is open); ignores holidays"""
+    now = (now or datetime.now(NPT)).astimezone(NPT)
+    if market_is_open(now):
+        return 0
+    for offset in range(8):
+        candidate = (now + timedelta(days=offset)).replace(
+            hour=SESSION_OPEN_HOUR, minute=0, second=0, microsecond=0)
+        if candidate > now and candidate.weekday() in TRADING_WEEKDAYS:
+            return (candidate - now).total_seconds()
+    return 0
+
+
+# ============================================
+# On-disk response cache
+# ============================================
+
+CACHE_DIR = DATA_DIR / "http_cache"
+LIVE_TTL = 30          # seconds, while the market is open
+CLOSED_TTL = 30 * 60   # seconds, outside trading hours
+STATIC_TTL = 24 * 3600 # seconds, pages that rarely change (company profiles)
+
+_cache_enabled = True
+_max_market_ttl = None
+_replay = None     # url -> CachedResponse served instead of the network
+_recorder = None   # called with every response that came from the network
+
+
+def set_cache_enabled(enabled):
+    """Globally enable/disable the disk cache (``--no-cache``); returns the previous setting"""
+    global _cache_enabled
+    previous, _cache_enabled = _cache_enabled, enabled
+    return previous
+
+
+def set_max_market_ttl(seconds):
+    """Cap the market-page TTL, e.g. to a watch interval shorter than LIVE_TTL"""
+    global _max_market_ttl
+    _max_market_ttl = seconds
+
+
+def set_replay(responses):
+    """
+    Serve ``fetch`` from recorded responses instead of the network
+
+    Args:
+        responses: URL -> CachedResponse (see nepse_bench.load_corpus),
+            or None to go back to the network. Unrecorded URLs raise
+            ConnectionError as if the site were unreachable.
+    """
+    global _replay
+    _replay = responses
+
+
+def set_recorder(callback):
+    """Call ``callback(response)`` for every response downloaded by ``fetch`` (None to stop)"""
+    global _recorder
+    _recorder = callback
+
+
+def market_ttl(now=None):
+    """Cache TTL in seconds for market pages at the given time"""
+    ttl = LIVE_TTL if market_is_open(now) else CLOSED_TTL
+    if _max_market_ttl is not None:
+        ttl = min(ttl, _max_market_ttl)
+    return ttl
+
+
+class CachedResponse:
+    """Minimal response object shared by network and cache hits"""
+
+    def __init__(self, url, status_code, content, headers, from_cache=False, fetched_at=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+        self.fetched_at = fetched_at or time.time()
+        self.stale = False  # served from an expired cache entry after a failure or deadline
+
+    @property
+    def text(self):
+        return self.content.decode(self.headers.get("encoding") or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def _cache_paths(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{key}.json", CACHE_DIR / f"{key}.body"
+
+
+def _read_cache(url):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+def _write_cache(url, meta, body=None):
+    """Atomically write an entry's metadata (and body, when given)"""
+    meta_path, body_path = _cache_paths(url)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        if body is not None:
+            tmp = str(body_path) + f".{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, body_path)
+        tmp = str(meta_path) + f".{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+    except OSError:
+        pass  # caching is best-effort
+
+
+def _from_cache(url, meta, body):
+    return CachedResponse(url, meta["status"], body, meta["headers"], from_cache=True,
+                          fetched_at=meta["fetched_at"])
+
+
+def _stale(url, meta, body, reason):
+    """Expired cache entry served in place of a failed or out-of-time request"""
+    response = _from_cache(url, meta, body)
+    response.stale = True
+    saved = datetime.fromtimestamp(meta["fetched_at"]).strftime("%Y-%m-%d %H:%M")
+    note(f"{reason}: showing data saved {saved} for {url}")
+    return response
+
+
+def fetch(url, ttl=None, timeout=None, session=None):
+    """
+    GET ``url`` through the disk cache
+
+    Args:
+        url: URL to fetch
+        ttl: Freshness in seconds (default: market_ttl())
+        timeout: Request timeout (default DEFAULT_TIMEOUT)
+        session: Session to use instead of the shared one (e.g. get_scraper())
+
+    Returns:
+        CachedResponse (``from_cache`` tells whether the network was skipped)
+    """
+    if _replay is not None:
+        if url not in _replay:
+            import requests
+            raise requests.ConnectionError(f"No recorded response for {url}")
+        return _replay[url]
+
+    if not _cache_enabled:
+        session = session or get_session()
+        response = session.get(url, timeout=budget_timeout(timeout))
+        result = CachedResponse(url, response.status_code, response.content,
+                                {"encoding": response.encoding})
+        if _recorder is not None:
+            _recorder(result)
+        return result
+
+    ttl = market_ttl() if ttl is None else ttl
+    meta, body = _read_cache(url)
+    if meta and time.time() - meta["fetched_at"] < ttl:
+        return _from_cache(url, meta, body)
+
+    try:
+        timeout = budget_timeout(timeout)
+    except DeadlineExceeded:
+        if meta:
+            return _stale(url, meta, body, "Deadline reached")
+        raise
+    session = session or get_session()
+
+    # Revalidate stale entries instead of downloading them again
+    headers = {}
+    if meta:
+        if meta["headers"].get("etag"):
+            headers["If-None-Match"] = meta["headers"]["etag"]
+        if meta["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+
+    try:
+        response = session.get(url, timeout=timeout, headers=headers)
+    except Exception as e:
+        if meta:
+            return _stale(url, meta, body, f"Site unreachable ({type(e).__name__})")
+        raise
+    if response.status_code >= 500 and meta:
+        return _stale(url, meta, body, f"HTTP {response.status_code}")
+
+    if response.status_code == 304 and meta:
+        meta["fetched_at"] = time.time()
+        _write_cache(url, meta)
+        return _from_cache(url, meta, body)
+
+    cached_headers = {
+        "encoding": response.encoding,
+        "etag": response.headers.get("ETag"),
+        "last-modified": response.headers.get("Last-Modified"),
+    }
+    result = CachedResponse(url, response.status_code, response.content, cached_headers)
+    if _recorder is not None:
+        _recorder(result)
+    if response.status_code == 200:
+        _write_cache(url, {"status": 200, "headers": cached_headers, "fetched_at": result.fetched_at},
+                     response.content)
+    return result
+
+
+# ============================================
+# Per-process fetch/parse memo
+# ============================================
+
+_responses = {}
+_parsed = {}
+_memo_times = {}  # memo key -> time.time() when it was filled
+_key_locks = {}
+
+
+def _key_lock(key):
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _memoizable(response):
+    """Only fresh successful responses are reused; failures and stale fallbacks are retried"""
+    return response.status_code == 200 and not getattr(response, "stale", False)
+
+
+def fetch_once(url, **fetch_kwargs):
+    """``fetch`` each URL at most once per process; concurrent callers wait"""
+    with _key_lock(("fetch", url)):
+        if url in _responses:
+            return _responses[url]
+        response = fetch(url, **fetch_kwargs)
+        if _memoizable(response):
+            _responses[url] = response
+            _memo_times[url] = time.time()
+        return response
+
+
+def fetch_parsed(url, target, parse, **fetch_kwargs):
+    """
+    Fetch ``url`` and run ``parse(response)`` at most once per process
+
+    Args:
+        url: URL to fetch (shared with every other target on the same page)
+        target: Name of what ``parse`` extracts, e.g. "summary"
+        parse: Callable taking the response and returning the parsed value
+        **fetch_kwargs: Passed to ``fetch`` on the first call
+
+    Only fresh, successfully parsed results are memoized: failures, None
+    results and stale fallback pages are fetched and parsed again next time.
+    """
+    key = (url, target)
+    with _key_lock(("parse",) + key):
+        if key in _parsed:
+            return _parsed[key]
+        response = fetch_once(url, **fetch_kwargs)
+        value = parse(response)
+        if value is not None and _memoizable(response):
+            _parsed[key] = value
+            _memo_times[key] = time.time()
+        return value
+
+
+def clear_memo(older_than=None):
+    """
+    Forget memoized responses (long-running commands call this per cycle)
+
+    Args:
+        older_than: Only forget entries memoized more than this many
+            seconds ago (default: forget everything)
+    """
+    with _lock:
+        if older_than is None:
+            _responses.clear()
+            _parsed.clear()
+            _memo_times.clear()
+            return
+        cutoff = time.time() - older_than
+        for key in [key for key, filled in _memo_times.items() if filled < cutoff]:
+            _responses.pop(key, None)
+            _parsed.pop(key, None)
+            del _memo_times[key]
@@ -0,0 +1,222 @@
+"""
+Public-offering feed: typed records, pagination and change detection
+
+The ShareHub public-offering API is paged. ``fetch_offerings`` reads the
+first page, fetches the remaining pages concurrently through the HTTP cache
+and parses every row once into an ``Offering``. ``poll_changes`` compares
+the result with the previous poll (saved in the data directory) and returns
+only offerings that are new, changed, or just entered the closing-soon
+window.
+"""
+import json
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+from nepse_config import DATA_DIR
+
+IPO_API_URL = "https://sharehubnepal.com/data/api/v1/public-offering"
+IPO_STATE_FILE = DATA_DIR / "ipo_state.json"
+CLOSING_SOON_DAYS = 2
+MAX_PAGE_WORKERS = 4
+
+# Fields compared between polls (everything that matters to an applicant)
+TRACKED_FIELDS = ("status", "units", "price", "opening_date", "closing_date", "extended_closing_date",
+                  "issue_manager")
+
+
+def _parse_date(text):
+    try:
+        return datetime.fromisoformat(str(text).replace('T', ' '))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class Offering:
+    """One public offering (IPO, FPO, right share, mutual fund, debenture)"""
+    symbol: str
+    name: str
+    sector: str
+    type: str
+    offered_to: str
+    units: int
+    price: float
+    total_amount: float
+    opening_date: Optional[datetime]
+    closing_date: Optional[datetime]
+    extended_closing_date: Optional[datetime]
+    issue_manager: str
+    status: str
+
+    @classmethod
+    def from_api(cls, row):
+        return cls(
+            symbol=row.get('symbol') or 'N/A',
+            name=row.get('name') or 'N/A',
+            sector=row.get('sector') or 'N/A',
+            type=row.get('type') or 'N/A',
+            offered_to=row.get('for') or 'N/A',
+            units=row.get('units') or 0,
+            price=row.get('price') or 0,
+            total_amount=row.get('totalAmount') or 0,
+            opening_date=_parse_date(row.get('openingDate')),
+            closing_date=_parse_date(row.get('closingDate')),
+            extended_closing_date=_parse_date(row.get('extendedClosingDate')),
+            issue_manager=row.get('issueManager') or 'N/A',
+            status=row.get('status') or 'N/A',
+        )
+
+    @property
+    def key(self):
+        """Identity across polls (a company can have an IPO and a right share open)"""
+        return f"{self.symbol}/{self.type}/{self.offered_to}"
+
+    @property
+    def is_open(self):
+        return self.status == 'Open'
+
+    @property
+    def final_closing_date(self):
+        return self.extended_closing_date or self.closing_date
+
+    def days_left(self, now=None):
+        """Whole days until the (extended) closing date, or None if unknown"""
+        if self.final_closing_date is None:
+            return None
+        closing = self.final_closing_date
+        return (closing - (now or datetime.now(closing.tzinfo))).days
+
+    def closing_soon(self, now=None):
+        days = self.days_left(now)
+        return self.is_open and days is not None and 0 <= days <= CLOSING_SOON_DAYS
+
+    def fingerprint(self):
+        """JSON-safe dict of the tracked fields"""
+        data = asdict(self)
+        return {field: data[field].isoformat() if isinstance(data[field], datetime) else data[field]
+                for field in TRACKED_FIELDS}
+
+
+def _page_url(page):
+    return f"{IPO_API_URL}?page={page}"
+
+
+def parse_page(response):
+    """The ``data`` object of one public-offering API response (rows under 'content')"""
+    response.raise_for_status()
+    data = response.json()
+    if not data.get('success'):
+        raise ValueError("public-offering API request failed")
+    return data.get('data', {})
+
+
+def _read_page(url):
+    import nepse_http
+
+    return parse_page(nepse_http.fetch(url))
+
+
+def _fetch_all():
+    """(offerings, complete) where complete is False if some page was left out"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import nepse_http
+
+    first = _read_page(IPO_API_URL)
+    pages = [first]
+    missing = 0
+    total_pages = first.get('totalPages') or 1
+    if total_pages > 1:
+        # Works for 0- and 1-based paging: continue after the page we got
+        start = (first.get('number') or 0) + 1
+        urls = [_page_url(page) for page in range(start, start + total_pages - 1)]
+        with ThreadPoolExecutor(max_workers=MAX_PAGE_WORKERS) as pool:
+            futures = [pool.submit(nepse_http.bind_context(_read_page), url) for url in urls]
+        for future in futures:
+            try:
+                pages.append(future.result())
+            except Exception:
+                missing += 1  # keep what arrived instead of failing the whole feed
+        if missing:
+            nepse_http.note(f"IPO feed incomplete: {missing} of {total_pages} pages failed or ran out of time")
+
+    offerings = {}
+    for page in pages:
+        for row in page.get('content', []):
+            offering = Offering.from_api(row)
+            offerings.setdefault(offering.key, offering)
+    return list(offerings.values()), missing == 0
+
+
+def fetch_offerings():
+    """
+    Every offering on every page of the feed
+
+    The first page reports the page count (``totalPages``); the rest are
+    fetched concurrently. A later page that fails is left out (and noted on
+    the command deadline) rather than failing the whole feed. Offerings are
+    keyed by Offering.key, so a row that shifts pages between requests is
+    not counted twice.
+    """
+    return _fetch_all()[0]
+
+
+def _load_state():
+    try:
+        with open(IPO_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    try:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        with open(IPO_STATE_FILE, 'w') as f:
+            json.dump(state, f, indent=2)
+    except OSError:
+        pass
+
+
+def diff_offerings(offerings, previous, now=None):
+    """
+    Compare offerings with the previous poll's state
+
+    Returns:
+        (changes, state): changes is a list of (kind, offering, detail)
+        with kind "new", "changed" or "closing_soon"; state is what to save
+    """
+    changes = []
+    state = {}
+    for offering in offerings:
+        fingerprint = offering.fingerprint()
+        closing_soon = offering.closing_soon(now)
+        state[offering.key] = {"fields": fingerprint, "closing_soon": closing_soon}
+
+        before = previous.get(offering.key)
+        if before is None:
+            # Closed offerings are history, not news
+            if offering.status != 'Closed':
+                changes.append(("new", offering, None))
+            continue
+        changed = {field: (before["fields"].get(field), value)
+                   for field, value in fingerprint.items() if before["fields"].get(field) != value}
+        if changed:
+            changes.append(("changed", offering, changed))
+        elif closing_soon and not before.get("closing_soon"):
+            changes.append(("closing_soon", offering, None))
+    return changes, state
+
+
+def poll_changes():
+    """Fetch the feed, diff it with the last poll, save the new state and return the changes"""
+    offerings, complete = _fetch_all()
+    previous = _load_state().get("offerings", {})
+    changes, state = diff_offerings(offerings, previous)
+    if not complete:
+        # Offerings on missing pages were not seen, not removed: keep their state
+        state = dict(previous, **state)
+    _save_state({"polled_at": time.time(), "offerings": state})
+    return changes
@@ -0,0 +1,209 @@
+"""
+Parsed snapshot of the ShareSansar market page
+
+The ``/market`` page carries the main indices and every sector sub-index.
+It is parsed once into typed ``IndexRecord`` rows that ``nepse nepse``,
+``nepse subidx`` and later analytics share. The parsed snapshot is saved
+next to the HTTP cache so an unchanged page is never parsed twice.
+"""
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+from nepse_config import DATA_DIR
+
+MARKET_URL = "https://www.sharesansar.com/market"
+SNAPSHOT_FILE = DATA_DIR / "market_snapshot.json"
+
+INDEX_TABLE_CLASS = "table table-bordered table-striped table-hover"
+MAIN_INDEX_TABLE = 0
+SUB_INDEX_TABLE = 3
+
+# Build soups only from the subtrees a command reads (bs4 SoupStrainer).
+# nepse_bench turns this off to compare against full-document parsing.
+TARGETED_PARSING = True
+
+# CLI names -> sub-index names as shown on the market page
+SUB_INDEX_ALIASES = {
+    "BANKING": "Banking SubIndex",
+    "DEVBANK": "Development Bank Index",
+    "FINANCE": "Finance Index",
+    "HOTELS AND TOURISM": "Hotels And Tourism",
+    "HYDROPOWER": "HydroPower Index",
+    "INVESTMENT": "Investment",
+    "LIFE INSURANCE": "Life Insurance",
+    "MANUFACTURING AND PROCESSING": "Manufacturing And Processing",
+    "MICROFINANCE": "Microfinance Index",
+    "MUTUAL FUND": "Mutual Fund",
+    "NONLIFE INSURANCE": "Non Life Insurance",
+    "OTHERS": "Others Index",
+    "TRADING": "Trading Index",
+}
+
+
+def make_soup(markup, features="lxml", name=None, **attrs):
+    """
+    BeautifulSoup of ``markup`` keeping only tags that match ``name``/``attrs``
+
+    Matching tags keep their whole subtree, in document order, so
+    ``find_all`` over the result sees what it would on the full page.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    if not TARGETED_PARSING or (name is None and not attrs):
+        return BeautifulSoup(markup, features)
+    if isinstance(attrs.get("class_"), str):
+        attrs["class_"] = _class_matcher(attrs["class_"])
+    return BeautifulSoup(markup, features, parse_only=SoupStrainer(name, **attrs))
+
+
+def _class_matcher(wanted):
+    """
+    Match a class attribute the way ``find_all(class_=...)`` does
+
+    At parse time the strainer sees the raw attribute string, so a plain
+    ``class_="row"`` would miss ``class="row mb-2"``; like ``find_all``,
+    match either the whole string or any single class in it.
+    """
+    def match(value):
+        if value is None:
+            return False
+        if not isinstance(value, str):
+            value = " ".join(value)
+        return value == wanted or wanted in value.split()
+    return match
+
+
+def to_float(text):
+    """Parse a scraped number such as '2,345.6', '+1.2%' or '-'; None if blank"""
+    try:
+        return float(str(text).strip().replace(',', '').replace('%', '').replace('+', ''))
+    except ValueError:
+        return None
+
+
+@dataclass
+class IndexRecord:
+    """One row of an index table"""
+    name: str
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    point_change: Optional[float]
+    pct_change: Optional[float]
+    turnover: Optional[float]
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Build from the cell texts: name, open, high, low, close, change, %, turnover"""
+        name = cells[0].strip()
+        return cls(name, *(to_float(cell) for cell in cells[1:8]))
+
+    @property
+    def trend(self):
+        if self.pct_change is None:
+            return "📊"
+        return "📈" if self.pct_change > 0 else "📉" if self.pct_change < 0 else "➡️"
+
+
+@dataclass
+class MarketSnapshot:
+    """
+    Main indices and sub-indices parsed from one market page
+
+    Args:
+        indices: IndexRecord rows of the main index table
+        sub_indices: IndexRecord rows of the sector sub-index table
+        fetched_at: Unix time the page was downloaded
+        source_hash: SHA-1 of the page body the snapshot was parsed from
+    """
+    indices: List[IndexRecord] = field(default_factory=list)
+    sub_indices: List[IndexRecord] = field(default_factory=list)
+    fetched_at: Optional[float] = None
+    source_hash: Optional[str] = None
+
+    def index(self, name):
+        """Main index by (case-insensitive) name, or None"""
+        return _find(self.indices, name)
+
+    def sub_index(self, name):
+        """Sub-index by CLI alias (e.g. BANKING) or page name, or None"""
+        name = SUB_INDEX_ALIASES.get(name.upper(), name)
+        return _find(self.sub_indices, name)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            indices=[IndexRecord(**row) for row in data.get("indices", [])],
+            sub_indices=[IndexRecord(**row) for row in data.get("sub_indices", [])],
+            fetched_at=data.get("fetched_at"),
+            source_hash=data.get("source_hash"),
+        )
+
+
+def _find(records, name):
+    name = name.strip().upper()
+    for record in records:
+        if record.name.upper() == name:
+            return record
+    return None
+
+
+def parse_market_html(html, fetched_at=None, source_hash=None):
+    """Parse the ShareSansar /market page into a MarketSnapshot"""
+    soup = make_soup(html, "lxml", "table", class_=INDEX_TABLE_CLASS)
+    tables = soup.find_all("table", class_=INDEX_TABLE_CLASS)
+
+    def rows(table_index):
+        if len(tables) <= table_index:
+            return []
+        records = []
+        for tr in tables[table_index].find_all("tr")[1:]:
+            cells = [td.text for td in tr.find_all("td")]
+            if len(cells) >= 8:
+                records.append(IndexRecord.from_cells(cells))
+        return records
+
+    return MarketSnapshot(rows(MAIN_INDEX_TABLE), rows(SUB_INDEX_TABLE), fetched_at, source_hash)
+
+
+def _read_snapshot():
+    try:
+        with open(SNAPSHOT_FILE, 'r') as f:
+            return MarketSnapshot.from_dict(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _write_snapshot(snapshot):
+    try:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        with open(SNAPSHOT_FILE, 'w') as f:
+            json.dump(snapshot.to_dict(), f)
+    except OSError:
+        pass
+
+
+def snapshot_from_response(response):
+    """Parse a /market response, reusing the saved snapshot if the page is unchanged"""
+    source_hash = hashlib.sha1(response.content).hexdigest()
+    saved = _read_snapshot()
+    if saved is not None and saved.source_hash == source_hash:
+        return saved
+    snapshot = parse_market_html(response.text, response.fetched_at, source_hash)
+    _write_snapshot(snapshot)
+    import nepse_history
+    nepse_history.record_indices(snapshot, response)
+    return snapshot
+
+
+def get_market_snapshot():
+    """Current MarketSnapshot, fetched and parsed at most once per run"""
+    import nepse_http
+
+    return nepse_http.fetch_parsed(MARKET_URL, "snapshot", snapshot_from_response)
@@ -0,0 +1,138 @@
+"""
+Saved portfolio snapshots and family-wide valuation
+
+``nepse portfolio`` saves each member's holdings after a successful fetch.
+``nepse value`` joins every saved snapshot against one live price feed and
+computes member values, day change and sector weights with NumPy array
+operations, so revaluing the whole family costs one HTTP request instead of
+one browser session per member.
+"""
+import json
+import re
+import time
+
+from nepse_config import DATA_DIR
+
+PORTFOLIO_DIR = DATA_DIR / "portfolios"
+
+
+def _snapshot_path(member_name):
+    slug = re.sub(r"[^a-z0-9_-]+", "_", member_name.lower()).strip("_") or "member"
+    return PORTFOLIO_DIR / f"{slug}.json"
+
+
+def save_holdings(member_name, holdings):
+    """Save a member's holdings (as returned by get_portfolio_for_member)"""
+    try:
+        PORTFOLIO_DIR.mkdir(parents=True, exist_ok=True)
+        with open(_snapshot_path(member_name), 'w') as f:
+            json.dump({"member": member_name, "fetched_at": time.time(), "holdings": holdings}, f, indent=2)
+    except OSError:
+        pass
+
+
+def load_saved_holdings(member_name=None):
+    """All saved snapshots (or just ``member_name``'s), sorted by member"""
+    snapshots = []
+    if not PORTFOLIO_DIR.exists():
+        return snapshots
+    for path in sorted(PORTFOLIO_DIR.glob("*.json")):
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if member_name is None or snapshot.get("member", "").lower() == member_name.lower():
+            snapshots.append(snapshot)
+    return sorted(snapshots, key=lambda s: s.get("member", "").lower())
+
+
+def _number(text):
+    from nepse_market import to_float
+
+    value = to_float(text)
+    return 0.0 if value is None else value
+
+
+def value_holdings(snapshots, prices, sectors=None):
+    """
+    Value saved holdings against a live price index
+
+    Args:
+        snapshots: Saved portfolio snapshots (see load_saved_holdings)
+        prices: Symbol -> quote dict with 'close' and 'prev_close'
+        sectors: Optional symbol -> sector name
+
+    Returns:
+        dict with per-member rows, family totals, sector weights and the
+        symbols that fell back to Meroshare's (possibly stale) LTP
+    """
+    import numpy as np
+
+    member_idx, symbols, quantities, meroshare_ltp = [], [], [], []
+    for m, snapshot in enumerate(snapshots):
+        for holding in snapshot.get("holdings", []):
+            member_idx.append(m)
+            symbols.append(holding["scrip"].strip().upper())
+            quantities.append(_number(holding.get("current_balance")))
+            meroshare_ltp.append(_number(holding.get("last_transaction_price")))
+
+    n_members = len(snapshots)
+    if not symbols:
+        return {
+            "members": [{"member": s.get("member"), "fetched_at": s.get("fetched_at"), "holdings": 0,
+                         "value": 0.0, "day_change": 0.0, "day_change_pct": 0.0} for s in snapshots],
+            "total": 0.0, "day_change": 0.0, "day_change_pct": 0.0, "sectors": [], "stale_symbols": [],
+        }
+
+    member_idx = np.asarray(member_idx, dtype=np.intp)
+    qty = np.asarray(quantities, dtype=float)
+    fallback = np.asarray(meroshare_ltp, dtype=float)
+
+    # Join: one dict lookup per distinct symbol, then broadcast to every holding
+    unique_symbols, inverse = np.unique(np.asarray(symbols, dtype=str), return_inverse=True)
+    ltp = np.array([prices[s]["close"] if s in prices else np.nan for s in unique_symbols], dtype=float)
+    prev = np.array([prices[s]["prev_close"] if s in prices else np.nan for s in unique_symbols], dtype=float)
+
+    # Symbols missing from the feed keep Meroshare's LTP and no day change
+    live = ~np.isnan(ltp[inverse])
+    row_ltp = np.where(live, ltp[inverse], fallback)
+    row_prev = np.where(live, prev[inverse], fallback)
+    value = qty * row_ltp
+    change = qty * (row_ltp - row_prev)
+
+    member_value = np.bincount(member_idx, weights=value, minlength=n_members)
+    member_change = np.bincount(member_idx, weights=change, minlength=n_members)
+    member_count = np.bincount(member_idx, minlength=n_members)
+    base = member_value - member_change
+    member_pct = np.divide(member_change, base, out=np.zeros(n_members), where=base != 0) * 100
+
+    total = float(value.sum())
+    total_change = float(change.sum())
+    total_base = total - total_change
+
+    sector_rows = []
+    if sectors is not None:
+        sector_of = np.array([sectors.get(s) or "Unknown" for s in unique_symbols], dtype=str)
+        sector_names, sector_inverse = np.unique(sector_of, return_inverse=True)
+        sector_value = np.bincount(sector_inverse[inverse], weights=value, minlength=len(sector_names))
+        order = np.argsort(-sector_value)
+        sector_rows = [
+            {"sector": str(sector_names[i]), "value": float(sector_value[i]),
+             "weight": float(sector_value[i] / total * 100) if total else 0.0}
+            for i in order
+        ]
+
+    return {
+        "members": [
+            {"member": snapshots[m].get("member"), "fetched_at": snapshots[m].get("fetched_at"),
+             "holdings": int(member_count[m]), "value": float(member_value[m]),
+             "day_change": float(member_change[m]), "day_change_pct": float(member_pct[m])}
+            for m in range(n_members)
+        ],
+        "total": total,
+        "day_change": total_change,
+        "day_change_pct": total_change / total_base * 100 if total_base else 0.0,
+        "sectors": sector_rows,
+        "stale_symbols": sorted({symbols[i] for i in np.flatnonzero(~live)}),
+    }
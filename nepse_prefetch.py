@@ -0,0 +1,158 @@
+"""
+Background prefetcher for market pages
+
+``nepse prefetch`` keeps the on-disk HTTP cache warm so interactive
+commands are served from it instead of waiting on the network. While NEPSE
+is trading (and for a short settle window after the close, when final
+figures are published) every page is revalidated a little more often than
+the live cache TTL; outside the session it refreshes just inside the
+closed-market TTL and wakes up exactly when the next session opens.
+Refreshes are conditional requests, so unchanged pages cost a 304. The
+symbol -> sector map used by screens is filled in here too, so no command
+has to spend its deadline looking up hundreds of company pages.
+"""
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import nepse_http
+
+# Refresh before cached entries expire, so a reader never finds them stale
+LIVE_INTERVAL = nepse_http.LIVE_TTL * 2 // 3       # seconds
+CLOSED_INTERVAL = nepse_http.CLOSED_TTL * 5 // 6   # seconds
+SETTLE_AFTER_CLOSE = 15 * 60  # seconds of live-rate refreshes after 15:00
+MAX_WORKERS = 6
+
+
+def prefetch_pages():
+    """(label, url, uses the Cloudflare scraper) for every page the market commands read"""
+    import nepse_cli
+    import nepse_ipo
+    import nepse_market
+
+    return [
+        ("indices", nepse_market.MARKET_URL, False),
+        ("summary", nepse_cli.MARKET_SUMMARY_URL, False),
+        ("topgl", nepse_cli.TOPGL_URL, False),
+        ("live-trading", nepse_cli.SS_LIVE_URL, False),
+        ("alpha-live", nepse_cli.ALPHA_LIVE_URL, True),
+        ("ipo", nepse_ipo.IPO_API_URL, False),
+    ]
+
+
+def in_live_window(now=None):
+    """True while trading, and for SETTLE_AFTER_CLOSE after a session closes"""
+    now = (now or datetime.now(nepse_http.NPT)).astimezone(nepse_http.NPT)
+    if nepse_http.market_is_open(now):
+        return True
+    close = now.replace(hour=nepse_http.SESSION_CLOSE_HOUR, minute=0, second=0, microsecond=0)
+    return (now.weekday() in nepse_http.TRADING_WEEKDAYS
+            and close <= now < close + timedelta(seconds=SETTLE_AFTER_CLOSE))
+
+
+def next_delay(elapsed=0.0, now=None):
+    """Seconds to sleep after a refresh that took ``elapsed`` seconds"""
+    if in_live_window(now):
+        return max(1.0, LIVE_INTERVAL - elapsed)
+    until_open = nepse_http.seconds_until_open(now)
+    return max(1.0, min(CLOSED_INTERVAL - elapsed, until_open))
+
+
+def refresh(pages=None):
+    """
+    Revalidate every page into the disk cache concurrently
+
+    Returns:
+        list of (label, "fresh" | "unchanged" | error text, seconds)
+    """
+    pages = pages if pages is not None else prefetch_pages()
+
+    def one(page):
+        label, url, scraper = page
+        started = time.monotonic()
+        try:
+            session = nepse_http.get_scraper() if scraper else None
+            # ttl=0 forces a conditional request; a 304 comes back as a cache hit
+            response = nepse_http.fetch(url, ttl=0, session=session)
+            if response.status_code != 200:
+                status = f"HTTP {response.status_code}"
+            else:
+                status = "unchanged" if response.from_cache else "fresh"
+        except Exception as e:
+            status = f"{type(e).__name__}: {str(e)[:60]}"
+        return label, status, time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pages))) as pool:
+        return list(pool.map(one, pages))
+
+
+def refresh_sectors():
+    """
+    Look up the sector of every listed stock missing from the sector map
+
+    Screens, ``nepse sectors`` and ``topgl --sector`` then never have to
+    build the map themselves. Only new listings and week-old entries are
+    fetched, so after the first run this is a file read.
+
+    Returns:
+        (label, "fresh" | "unchanged" | error text, seconds)
+    """
+    import nepse_cli
+
+    started = time.monotonic()
+    try:
+        symbols = list(nepse_cli.get_live_prices())
+        if not symbols:
+            status = "no live feed"
+        elif not nepse_cli.sectors_due(symbols):
+            status = "unchanged"
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                nepse_cli.load_sector_map(symbols)
+            unknown = len(nepse_cli.sectors_due(symbols))
+            status = "fresh" if not unknown else f"{unknown} sector(s) still unknown"
+    except Exception as e:
+        status = f"{type(e).__name__}: {str(e)[:60]}"
+    return "sectors", status, time.monotonic() - started
+
+
+def run(once=False, quiet=False):
+    """
+    Refresh on the session-aligned schedule until interrupted (Ctrl+C)
+
+    Args:
+        once: Refresh a single time and return (for cron / Task Scheduler)
+        quiet: Only print failed pages
+    """
+    pages = prefetch_pages()
+    try:
+        while True:
+            started = time.monotonic()
+            results = refresh(pages)
+            nepse_http.clear_memo()  # list symbols from the feed just refreshed
+            results.append(refresh_sectors())
+            elapsed = time.monotonic() - started
+            failures = sum(1 for _, status, _ in results if status not in ("fresh", "unchanged"))
+
+            stamp = datetime.now().strftime('%H:%M:%S')
+            if not quiet:
+                summary = ", ".join(f"{label} {status} ({seconds:.1f}s)" for label, status, seconds in results)
+                print(f"[{stamp}] {summary}")
+            elif failures:
+                for label, status, _ in results:
+                    if status not in ("fresh", "unchanged"):
+                        print(f"[{stamp}] ⚠️  {label}: {status}")
+            if once:
+                return 1 if failures == len(results) else 0
+
+            delay = next_delay(elapsed)
+            if not quiet:
+                window = "market open" if nepse_http.market_is_open() else \
+                    "settling after close" if in_live_window() else "market closed"
+                print(f"          {window} · next refresh in {int(delay)}s")
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        print("\n👋 Prefetcher stopped")
+    return 0
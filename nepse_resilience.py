@@ -0,0 +1,376 @@
+"""
+Retry, circuit-breaker and rate-limiting helpers for Meroshare automation
+
+Meroshare slows down and starts erroring on popular IPO days. Steps that
+talk to it (login, issue listing, submit) are wrapped in ``retry_call`` so
+transient failures are retried with jittered exponential backoff, while a
+shared ``CircuitBreaker`` stops every worker from hammering the server once
+it is clearly failing. A ``RateGovernor`` caps requests and new logins per
+second across threads, asyncio tasks and separate worker processes.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PermanentError(Exception):
+    """Failure that retrying cannot fix (e.g. rejected credentials)"""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open"""
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff settings
+
+    Args:
+        max_attempts: Total attempts including the first one
+        base_delay: Delay in seconds before the second attempt
+        max_delay: Upper bound for any single delay
+        jitter: Fraction (0-1) of each delay that is randomised
+    """
+
+    def __init__(self, max_attempts=3, base_delay=2.0, max_delay=30.0, jitter=0.5):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = min(max(jitter, 0.0), 1.0)
+
+    def delay(self, attempt):
+        """Seconds to wait after the given failed attempt (1-indexed)"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return cap * (1 - self.jitter) + random.uniform(0, cap * self.jitter)
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by all workers hitting one server
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds. Then a single probe is
+    let through (half-open); its success closes the circuit again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Return True if a call may proceed right now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: only one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def retry_after(self):
+        """Seconds until the circuit will let a probe through"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a permission from allow() without recording an outcome"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+# Breakers already checked by a retry_call further up the current thread's stack
+_guarded = threading.local()
+
+
+def _guarding(breaker):
+    return breaker in getattr(_guarded, "breakers", ())
+
+
+def retry_call(func, policy=None, breaker=None, retry_on=(Exception,), on_retry=None):
+    """
+    Call ``func(attempt)`` until it succeeds or the policy is exhausted
+
+    ``func`` receives the 1-based attempt number so steps can run an
+    idempotency check before repeating side effects. ``PermanentError`` is
+    never retried and does not count against the circuit breaker, and
+    neither does a ``CircuitOpenError`` (a refusal is not a server failure).
+
+    A breaker is only checked by the outermost ``retry_call`` using it on
+    the current thread: nested calls (a step that retries a sub-step on the
+    same breaker) run unchecked and their final failure counts once, so a
+    half-open probe is never refused by its own sub-step.
+
+    Args:
+        func: Callable taking the attempt number
+        policy: RetryPolicy (defaults to RetryPolicy())
+        breaker: Optional shared CircuitBreaker
+        retry_on: Exception types considered transient
+        on_retry: Optional callback(attempt, error, delay) before sleeping
+
+    Returns:
+        Whatever ``func`` returns on its successful attempt
+    """
+    policy = policy or RetryPolicy()
+    if breaker is not None and _guarding(breaker):
+        breaker = None  # the enclosing retry_call gates and accounts for it
+
+    def back_off(attempt, error, delay):
+        if on_retry:
+            on_retry(attempt, error, delay)
+        time.sleep(delay)
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if breaker is not None and not breaker.allow():
+            error = CircuitOpenError(f"{breaker.name} circuit open - server is failing, backing off")
+            if attempt == policy.max_attempts:
+                raise error
+            back_off(attempt, error, max(policy.delay(attempt), breaker.retry_after()))
+            continue
+
+        if breaker is not None:
+            _guarded.breakers = getattr(_guarded, "breakers", ()) + (breaker,)
+        try:
+            result = func(attempt)
+        except PermanentError:
+            if breaker is not None:
+                breaker.record_success()
+            raise
+        except CircuitOpenError as e:
+            # Refused by another breaker: not evidence that this server failed
+            if breaker is not None:
+                breaker.release()
+            if attempt == policy.max_attempts:
+                raise
+            back_off(attempt, e, policy.delay(attempt))
+        except retry_on as e:
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == policy.max_attempts:
+                raise
+            back_off(attempt, e, policy.delay(attempt))
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        finally:
+            if breaker is not None:
+                _guarded.breakers = _guarded.breakers[:-1]
+
+
+# ============================================
+# Rate limiting
+# ============================================
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive inter-process lock on ``path`` (created if missing)"""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of busy-waiting
+
+    Each ``acquire`` takes a token immediately, letting the balance go
+    negative, and sleeps for exactly as long as it takes the bucket to pay
+    that debt back. With ``state_file`` set, the balance lives on disk under
+    a file lock so every process using the same file shares one budget.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Burst size (defaults to max(1, rate))
+        state_file: Optional path for cross-process shared state
+        clock: Wall-clock function (defaults to time.time)
+    """
+
+    def __init__(self, rate, capacity=None, state_file=None, clock=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.state_file = str(state_file) if state_file else None
+        self.clock = clock or time.time
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = self.clock()
+        self.acquired = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            return float(state["tokens"]), float(state["updated"])
+        except (OSError, ValueError, KeyError):
+            return self.capacity, self.clock()
+
+    def _save(self, tokens, updated):
+        with open(self.state_file, "w") as f:
+            json.dump({"tokens": tokens, "updated": updated}, f)
+
+    def _reserve(self, tokens):
+        """Take ``tokens`` and return how long the caller must wait"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            if self.state_file:
+                with _file_lock(self.state_file + ".lock"):
+                    balance, updated = self._load()
+                    balance, updated, wait = self._take(balance, updated, tokens)
+                    self._save(balance, updated)
+            else:
+                self._tokens, self._updated, wait = self._take(self._tokens, self._updated, tokens)
+
+            self.acquired += 1
+            if wait > 0:
+                self.queued += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def _take(self, balance, updated, tokens):
+        now = self.clock()
+        balance = min(self.capacity, balance + max(0.0, now - updated) * self.rate)
+        balance -= tokens
+        wait = -balance / self.rate if balance < 0 else 0.0
+        return balance, now, wait
+
+    def acquire(self, tokens=1):
+        """Block the calling thread until ``tokens`` are available"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """Await until ``tokens`` are available without blocking the loop"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "acquired": self.acquired,
+                "queued": self.queued,
+                "total_wait": round(self.total_wait, 3),
+                "max_wait": round(self.max_wait, 3),
+            }
+
+
+class RateGovernor:
+    """
+    Central request and login limiter for one host
+
+    Share a single instance between threads and asyncio tasks; give it a
+    ``state_dir`` to also share the budget with other worker processes.
+
+    Args:
+        host: Host name the limits apply to (used for state file names)
+        requests_per_sec: Cap on page navigations/submits per second
+        logins_per_sec: Cap on new logins per second
+        state_dir: Optional directory for cross-process bucket state
+    """
+
+    def __init__(self, host, requests_per_sec=2.0, logins_per_sec=0.33, state_dir=None):
+        self.host = host
+        self.state_dir = state_dir
+        self.configure(requests_per_sec, logins_per_sec)
+
+    def _state_file(self, kind):
+        if not self.state_dir:
+            return None
+        os.makedirs(str(self.state_dir), exist_ok=True)
+        return os.path.join(str(self.state_dir), f"{self.host}.{kind}.json")
+
+    def configure(self, requests_per_sec=None, logins_per_sec=None):
+        """Replace the request and/or login rate (None keeps the current one)"""
+        if requests_per_sec is not None:
+            self.requests = TokenBucket(requests_per_sec, state_file=self._state_file("requests"))
+        if logins_per_sec is not None:
+            self.logins = TokenBucket(logins_per_sec, capacity=1, state_file=self._state_file("logins"))
+
+    def request(self):
+        """Wait for permission to send one request"""
+        return self.requests.acquire()
+
+    def login(self):
+        """Wait for permission to start one login (also counts as a request)"""
+        return self.logins.acquire() + self.requests.acquire()
+
+    async def request_async(self):
+        return await self.requests.acquire_async()
+
+    async def login_async(self):
+        return await self.logins.acquire_async() + await self.requests.acquire_async()
+
+    def stats(self):
+        return {"host": self.host, "requests": self.requests.stats(), "logins": self.logins.stats()}
+
+    def report(self):
+        """One-line summary of how much queueing the governor added"""
+        req = self.requests.stats()
+        log = self.logins.stats()
+        waited = req["total_wait"] + log["total_wait"]
+        return (f"Rate governor ({self.host}): {req['acquired']} requests, {log['acquired']} logins, "
+                f"queued {req['queued'] + log['queued']}x for {waited:.1f}s total "
+                f"(max {max(req['max_wait'], log['max_wait']):.1f}s)")
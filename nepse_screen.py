@@ -0,0 +1,255 @@
+"""
+Whole-market stock screener
+
+``nepse screen`` loads the full live price feed (every listed symbol) once
+into a columnar table of NumPy arrays, then answers filter expressions such
+as ``pct_change>5``, ``volume>100000`` or ``sector==Hydropower`` with
+boolean masks and sorts with argsort, so a screen over the whole market is
+a handful of array operations. The table is built once per price feed and
+reused by every later screen in the same process (``nepse serve``,
+``nepse watch``); the feed itself comes from the HTTP cache.
+``nepse sectors`` groups the same table by sector, and ``nepse topgl``
+ranks the feed with heap selection.
+"""
+import re
+
+# Column name -> quote field (see nepse_cli.get_live_prices)
+QUOTE_COLUMNS = {
+    "ltp": "close",
+    "change": "pt_change",
+    "pct_change": "pct_change",
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "volume": "volume",
+    "prev_close": "prev_close",
+}
+# Derived columns (approximate turnover; day range as % of previous close)
+DERIVED_COLUMNS = ("turnover", "range_pct")
+TEXT_COLUMNS = ("symbol", "sector")
+COLUMN_ALIASES = {"close": "ltp", "pct": "pct_change", "chg": "change", "vol": "volume", "pt_change": "change"}
+
+FILTER_RE = re.compile(r"^\s*([A-Za-z_]+)\s*(>=|<=|==|!=|>|<|=)\s*(.+?)\s*$")
+
+_tables = {}  # id(price index) -> (price index, PriceTable)
+
+
+def column_name(name):
+    """Canonical column name for ``name`` (aliases allowed); ValueError if unknown"""
+    name = name.strip().lower()
+    name = COLUMN_ALIASES.get(name, name)
+    if name not in QUOTE_COLUMNS and name not in DERIVED_COLUMNS and name not in TEXT_COLUMNS:
+        known = ", ".join(list(TEXT_COLUMNS) + list(QUOTE_COLUMNS) + list(DERIVED_COLUMNS))
+        raise ValueError(f"unknown column '{name}' (columns: {known})")
+    return name
+
+
+def _key(text):
+    """Case- and spacing-insensitive form of a text cell ('Hydro Power' == 'hydropower')"""
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+
+class PriceTable:
+    """
+    Live quotes for the whole market as parallel NumPy arrays
+
+    Args:
+        columns: Column name -> array, every array the same length
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_quotes(cls, index):
+        """Build from a symbol -> quote dict (nepse_cli.get_live_prices)"""
+        import numpy as np
+
+        symbols = sorted(index)
+        columns = {"symbol": np.array(symbols, dtype=object)}
+        for column, field in QUOTE_COLUMNS.items():
+            columns[column] = np.array([index[s].get(field) or 0 for s in symbols], dtype=float)
+        columns["turnover"] = columns["ltp"] * columns["volume"]
+        prev = columns["prev_close"]
+        columns["range_pct"] = np.divide(columns["high"] - columns["low"], prev,
+                                         out=np.zeros(len(symbols)), where=prev != 0) * 100
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns["symbol"])
+
+    def with_sectors(self, sectors):
+        """Copy with a 'sector' column from a symbol -> sector dict ('Unknown' if missing)"""
+        import numpy as np
+
+        columns = dict(self.columns)
+        columns["sector"] = np.array([sectors.get(s) or "Unknown" for s in columns["symbol"]], dtype=object)
+        return PriceTable(columns)
+
+    def mask(self, expression):
+        """Boolean array of the rows matching one filter such as 'pct_change>5'"""
+        import numpy as np
+
+        match = FILTER_RE.match(expression)
+        if not match:
+            raise ValueError(f"bad filter '{expression}' (expected e.g. pct_change>5 or sector==Hydropower)")
+        name, op, raw = match.groups()
+        name = column_name(name)
+        op = "==" if op == "=" else op
+        if name not in self.columns:
+            raise ValueError(f"column '{name}' is not loaded")
+        values = self.columns[name]
+
+        if name in TEXT_COLUMNS:
+            if op not in ("==", "!="):
+                raise ValueError(f"'{name}' only supports == and !=")
+            wanted = _key(raw.strip("'\""))
+            equal = np.array([_key(v) == wanted for v in values], dtype=bool)
+            return equal if op == "==" else ~equal
+
+        try:
+            number = float(raw.replace(",", "").replace("%", ""))
+        except ValueError:
+            raise ValueError(f"'{raw}' is not a number (in '{expression}')")
+        compare = {">": np.greater, "<": np.less, ">=": np.greater_equal, "<=": np.less_equal,
+                   "==": np.equal, "!=": np.not_equal}[op]
+        return compare(values, number)
+
+    def screen(self, filters=(), sort="pct_change", descending=True, limit=None):
+        """
+        Rows matching every filter, sorted by ``sort``
+
+        Returns:
+            list of dicts (one per row, every column), best first
+        """
+        import numpy as np
+
+        keep = np.ones(len(self), dtype=bool)
+        for expression in filters:
+            keep &= self.mask(expression)
+        rows = np.flatnonzero(keep)
+
+        sort = column_name(sort)
+        if sort not in self.columns:
+            raise ValueError(f"column '{sort}' is not loaded")
+        values = self.columns[sort][rows]
+        if sort in TEXT_COLUMNS:
+            order = np.argsort(np.array([str(v).lower() for v in values]), kind="stable")
+        else:
+            order = np.argsort(values, kind="stable")
+        if descending:
+            order = order[::-1]
+        rows = rows[order[:limit] if limit else order]
+        return [{name: (col[i].item() if hasattr(col[i], "item") else col[i]) for name, col in self.columns.items()}
+                for i in rows]
+
+
+SECTOR_SORTS = ("turnover", "volume", "advancers", "decliners", "pct_change", "symbols", "sector")
+
+
+def aggregate_sectors(table, sort="turnover"):
+    """
+    Per-sector totals in one grouped pass over a PriceTable with sectors
+
+    Returns:
+        list of dicts (sector, symbols, advancers, decliners, unchanged,
+        volume, turnover, turnover_share, pct_change = mean % change),
+        largest ``sort`` first (alphabetical for 'sector')
+    """
+    import numpy as np
+
+    if sort not in SECTOR_SORTS:
+        raise ValueError(f"cannot sort sectors by '{sort}' (choose from {', '.join(SECTOR_SORTS)})")
+    names, group = np.unique(np.array([str(s) for s in table.columns["sector"]]), return_inverse=True)
+    n = len(names)
+    change = table.columns["change"]
+
+    def total(weights=None):
+        return np.bincount(group, weights=weights, minlength=n)
+
+    symbols = total()
+    turnover = total(table.columns["turnover"])
+    market_turnover = turnover.sum()
+    totals = {
+        "symbols": symbols,
+        "advancers": total((change > 0).astype(float)),
+        "decliners": total((change < 0).astype(float)),
+        "volume": total(table.columns["volume"]),
+        "turnover": turnover,
+        "pct_change": total(table.columns["pct_change"]) / np.maximum(symbols, 1),
+    }
+    if sort == "sector":
+        order = np.arange(n)
+    else:
+        order = np.argsort(-totals[sort], kind="stable")
+
+    return [
+        {"sector": str(names[i]), "symbols": int(symbols[i]), "advancers": int(totals["advancers"][i]),
+         "decliners": int(totals["decliners"][i]),
+         "unchanged": int(symbols[i] - totals["advancers"][i] - totals["decliners"][i]),
+         "volume": float(totals["volume"][i]), "turnover": float(turnover[i]),
+         "turnover_share": float(turnover[i] / market_turnover * 100) if market_turnover else 0.0,
+         "pct_change": float(totals["pct_change"][i])}
+        for i in order
+    ]
+
+
+# Leaderboard -> (quote value, largest first?, rows eligible for the board)
+LEADERBOARDS = {
+    "gainers": (lambda q: q["pct_change"], True, lambda q: q["pct_change"] > 0),
+    "losers": (lambda q: q["pct_change"], False, lambda q: q["pct_change"] < 0),
+    "turnover": (lambda q: q["close"] * q["volume"], True, lambda q: q["volume"] > 0),
+    "volume": (lambda q: q["volume"], True, lambda q: q["volume"] > 0),
+}
+
+
+def _ranked(quote):
+    """True if every field a leaderboard compares is a number (feeds can carry nulls)"""
+    return all(isinstance(quote.get(field), (int, float)) for field in ("close", "pct_change", "volume"))
+
+
+def leaderboard(index, board, n=10, sectors=None, sector=None):
+    """
+    Top ``n`` stocks of one leaderboard from a live price index
+
+    Uses heap selection (heapq.nlargest/nsmallest), so ranking the whole
+    market costs O(N log n) instead of a full sort. NumPy is not needed.
+    Quotes with a missing close, % change or volume are skipped.
+
+    Args:
+        index: Symbol -> quote dict (nepse_cli.get_live_prices)
+        board: One of LEADERBOARDS
+        n: Number of rows
+        sectors: Symbol -> sector, required when ``sector`` is given
+        sector: Only stocks in this sector (case/spacing-insensitive)
+
+    Returns:
+        list of quote dicts with 'symbol' and 'turnover' added, best first
+    """
+    import heapq
+
+    value, largest, eligible = LEADERBOARDS[board]
+    items = ((sym, q) for sym, q in index.items() if _ranked(q) and eligible(q))
+    if sector is not None:
+        wanted = _key(sector)
+        items = ((sym, q) for sym, q in items if _key(sectors.get(sym, "")) == wanted)
+    select = heapq.nlargest if largest else heapq.nsmallest
+    top = select(n, items, key=lambda item: value(item[1]))
+    return [dict(q, symbol=sym, turnover=q["close"] * q["volume"]) for sym, q in top]
+
+
+def load_table(index):
+    """PriceTable for a live price index, built once per index object"""
+    cached = _tables.get(id(index))
+    if cached is not None and cached[0] is index:
+        return cached[1]
+    table = PriceTable.from_quotes(index)
+    _tables.clear()  # only the current feed is worth keeping
+    _tables[id(index)] = (index, table)
+    return table
+
+
+def uses_sector(filters, sort):
+    """True if screening needs the (slower, cached) symbol -> sector map"""
+    names = [FILTER_RE.match(f).group(1) for f in filters if FILTER_RE.match(f)] + [sort]
+    return any(COLUMN_ALIASES.get(n.lower(), n.lower()) == "sector" for n in names)
@@ -0,0 +1,235 @@
+"""
+Local JSON API over the market-data commands
+
+``nepse serve`` keeps one warm process that answers HTTP requests with the
+same data the ``nepse`` market commands print. Every client shares the
+pooled connections, the on-disk response cache and the per-process parse
+memo in nepse_http, so a query costs a dictionary lookup while the data is
+fresh instead of an interpreter start plus a download.
+
+Endpoints (GET only):
+    /health                     Liveness and market session
+    /indices                    Main indices
+    /subindices[/NAME]          All sector sub-indices, or one (e.g. BANKING)
+    /summary                    Market summary figures
+    /topgl[?n=&by=&sector=]     Leaderboards as ``nepse topgl`` (by: gainers, losers,
+                                turnover, volume; comma-separated or repeated)
+    /stocks/SYM[,SYM...]        Live quotes with sector and company name
+    /ipos[?status=open]         Public offerings
+    /portfolios[/MEMBER]        Saved portfolio snapshots (read-only)
+"""
+import json
+import sys
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import nepse_http
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_SYMBOLS = 50
+MAX_LEADERS = 100
+
+
+class NotFound(Exception):
+    """Requested resource does not exist (HTTP 404)"""
+
+
+class BadRequest(Exception):
+    """Malformed request (HTTP 400)"""
+
+
+# ============================================
+# Endpoint handlers: (path parts, query) -> JSON-able data
+# ============================================
+
+def _health(parts, query):
+    return {"status": "ok", "market_open": nepse_http.market_is_open(), "time": time.time()}
+
+
+def _indices(parts, query):
+    from nepse_market import get_market_snapshot
+
+    snapshot = get_market_snapshot()
+    return {"fetched_at": snapshot.fetched_at, "indices": [asdict(rec) for rec in snapshot.indices]}
+
+
+def _subindices(parts, query):
+    from nepse_market import get_market_snapshot
+
+    snapshot = get_market_snapshot()
+    if parts:
+        rec = snapshot.sub_index(parts[0])
+        if rec is None:
+            raise NotFound(f"sub-index '{parts[0]}' not found")
+        return {"fetched_at": snapshot.fetched_at, "sub_index": asdict(rec)}
+    return {"fetched_at": snapshot.fetched_at, "sub_indices": [asdict(rec) for rec in snapshot.sub_indices]}
+
+
+def _summary(parts, query):
+    from nepse_cli import SUMMARY_CELLS, get_market_summary
+    from nepse_market import to_float
+
+    summary = get_market_summary()
+    cells = summary["cells"]
+    if len(cells) < SUMMARY_CELLS:
+        raise ValueError("market summary table not found")
+    # Same label/value cells nepse mktsum prints
+    fields = ("turnover", "traded_shares", "transactions", "scrips_traded", "market_cap", "floated_market_cap")
+    data = {name: to_float(cells[i]) for name, i in zip(fields, (1, 3, 5, 7, 9, 11))}
+    data["as_of"] = summary["as_of"]
+    return data
+
+
+def _topgl(parts, query):
+    from nepse_cli import get_leaderboards
+    from nepse_screen import LEADERBOARDS
+
+    try:
+        n = int((query.get("n") or [10])[0])
+    except ValueError:
+        raise BadRequest("n must be a whole number")
+    if not 1 <= n <= MAX_LEADERS:
+        raise BadRequest(f"n must be between 1 and {MAX_LEADERS}")
+    boards = [b.strip().lower() for value in query.get("by", []) for b in value.split(",") if b.strip()]
+    boards = list(dict.fromkeys(boards)) or ["gainers", "losers"]
+    unknown = [b for b in boards if b not in LEADERBOARDS]
+    if unknown:
+        raise BadRequest(f"unknown leaderboard '{unknown[0]}' (choose from {', '.join(LEADERBOARDS)})")
+    sector = (query.get("sector") or [None])[0]
+
+    def row(q):
+        return {"symbol": q["symbol"], "ltp": q["close"], "pct_change": q["pct_change"], "high": q["high"],
+                "low": q["low"], "open": q.get("open"), "volume": q["volume"], "turnover": q["turnover"]}
+
+    tables, as_of, source = get_leaderboards(boards, n, sector)
+    data = {"as_of": as_of, "source": source, "sector": sector}
+    data.update((board, [row(q) for q in tables[board]]) for board in boards)
+    return data
+
+
+def _stocks(parts, query):
+    from nepse_cli import fetch_stonk_quotes
+
+    raw = parts[0] if parts else ",".join(query.get("symbols", []))
+    symbols = list(dict.fromkeys(s.strip().upper() for s in raw.split(",") if s.strip()))
+    if not symbols:
+        raise BadRequest("give symbols as /stocks/NABIL,NICA or /stocks?symbols=NABIL,NICA")
+    if len(symbols) > MAX_SYMBOLS:
+        raise BadRequest(f"at most {MAX_SYMBOLS} symbols per request")
+
+    quotes, details = fetch_stonk_quotes(symbols)
+    stocks = []
+    for sym in symbols:
+        info = details[sym]
+        stocks.append({"symbol": sym, "found": sym in quotes, "quote": quotes.get(sym),
+                       "name": info["company_fullform"], "sector": info["sector"],
+                       "share_registrar": info["share_registrar"]})
+    return {"stocks": stocks}
+
+
+def _ipos(parts, query):
+    from nepse_ipo import fetch_offerings
+
+    offerings = fetch_offerings()
+    status = (query.get("status") or [None])[0]
+    if status:
+        offerings = [o for o in offerings if o.status.lower() == status.lower()]
+    return {"offerings": [dict(asdict(o), key=o.key, days_left=o.days_left()) for o in offerings]}
+
+
+def _portfolios(parts, query):
+    from nepse_portfolio import load_saved_holdings
+
+    snapshots = load_saved_holdings(parts[0] if parts else None)
+    if parts and not snapshots:
+        raise NotFound(f"no saved portfolio for '{parts[0]}'")
+    if parts:
+        return snapshots[0]
+    return {"portfolios": [{"member": s.get("member"), "fetched_at": s.get("fetched_at"),
+                            "holdings": len(s.get("holdings", []))} for s in snapshots]}
+
+
+ROUTES = {
+    "health": _health,
+    "indices": _indices,
+    "subindices": _subindices,
+    "summary": _summary,
+    "topgl": _topgl,
+    "stocks": _stocks,
+    "ipos": _ipos,
+    "portfolios": _portfolios,
+}
+
+
+# ============================================
+# HTTP server
+# ============================================
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Routes GET requests to ROUTES and writes JSON responses"""
+
+    server_version = "nepse-cli"
+    protocol_version = "HTTP/1.1"  # keep-alive for clients polling several endpoints
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        if not parts:
+            self._send(200, {"endpoints": sorted(f"/{name}" for name in ROUTES)})
+            return
+        handler = ROUTES.get(parts[0].lower())
+        if handler is None:
+            self._send(404, {"error": f"unknown endpoint /{parts[0]}"})
+            return
+
+        # Memoized pages are reused until the cache would consider them stale
+        nepse_http.clear_memo(older_than=nepse_http.market_ttl())
+        try:
+            with nepse_http.deadline(nepse_http.COMMAND_DEADLINE) as budget:
+                data = handler(parts[1:], parse_qs(url.query))
+            if budget.notes and isinstance(data, dict):
+                data["notes"] = budget.notes  # stale or partial sources
+            self._send(200, data)
+        except NotFound as e:
+            self._send(404, {"error": str(e)})
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(502, {"error": f"{type(e).__name__}: {str(e)[:200]}"})
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}\n")
+
+
+class APIServer(ThreadingHTTPServer):
+    """One thread per connection; a deeper accept queue for bursts of dashboard requests"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve the API until interrupted (Ctrl+C)"""
+    server = APIServer((host, port), APIHandler)
+    print(f"\n🌐 Serving market data on http://{host}:{server.server_port}/  (Ctrl+C to stop)")
+    print(f"   Endpoints: {', '.join('/' + name for name in ROUTES)}\n")
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        print("⚠️  Listening beyond this machine: saved portfolios are readable by anyone who can reach it\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        server.server_close()
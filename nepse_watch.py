@@ -0,0 +1,223 @@
+"""
+Live watch mode for market data
+
+``nepse watch [indices|topgl|stonk SYMBOLS]`` polls one view on an interval
+and redraws only the table cells whose text changed. Polls go through the
+HTTP cache, so an unchanged page costs a conditional request (304) at most.
+Outside trading hours the poll interval backs off exponentially up to
+CLOSED_BACKOFF_MAX, never sleeping past the next session open.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import nepse_http
+
+DEFAULT_INTERVAL = 30  # seconds
+MIN_INTERVAL = 5  # seconds
+CLOSED_BACKOFF_MAX = 15 * 60  # seconds
+
+VIEWS = ("indices", "topgl", "stonk")
+
+
+# ============================================
+# Views: (title, [(column, width), ...], rows)
+# ============================================
+
+def _num(value, signed=False):
+    if value is None:
+        return "-"
+    return f"{value:+,.2f}" if signed else f"{value:,.2f}"
+
+
+def _indices_view(symbols):
+    from nepse_cli import format_number
+    from nepse_market import get_market_snapshot
+
+    snapshot = get_market_snapshot()
+    columns = [("Index", 30), ("Close", 12), ("Change", 10), ("% Chg", 8), ("Range", 23), ("Turnover", 10)]
+    rows = []
+    for rec in snapshot.indices + snapshot.sub_indices:
+        rows.append([
+            rec.name, _num(rec.close), _num(rec.point_change, True), _num(rec.pct_change, True) + "%",
+            f"{_num(rec.low)} - {_num(rec.high)}", format_number(rec.turnover),
+        ])
+    return "NEPSE INDICES", columns, rows
+
+
+def _topgl_view(symbols):
+    from nepse_cli import format_number, get_leaderboards
+
+    tables, _, _ = get_leaderboards(("gainers", "losers"))
+    columns = [("", 2), ("Symbol", 10), ("LTP", 10), ("%Chg", 8), ("High", 10), ("Low", 10),
+               ("Volume", 10), ("Turnover", 10)]
+    rows = []
+    for marker, board in (("▲", "gainers"), ("▼", "losers")):
+        for row in tables[board]:
+            rows.append([marker, row["symbol"], _num(row["close"]), _num(row["pct_change"], True), _num(row["high"]),
+                         _num(row["low"]), format_number(row["volume"]), format_number(row["turnover"])])
+    return "TOP GAINERS / LOSERS", columns, rows
+
+
+def _stonk_view(symbols):
+    from nepse_cli import fetch_stonk_quotes
+
+    quotes, details = fetch_stonk_quotes(symbols)
+    columns = [("Symbol", 10), ("LTP", 10), ("Change", 10), ("% Chg", 8), ("Range", 21), ("Volume", 12),
+               ("Sector", 24)]
+    rows = []
+    for sym in symbols:
+        quote = quotes.get(sym)
+        if quote is None:
+            rows.append([sym, "-", "-", "-", "-", "-", details[sym]['sector']])
+            continue
+        rows.append([
+            sym, _num(quote['close']), _num(quote['pt_change'], True), _num(quote['pct_change'], True) + "%",
+            f"{_num(quote['low'])} - {_num(quote['high'])}", f"{int(quote['volume']):,}", details[sym]['sector'],
+        ])
+    return "WATCHLIST", columns, rows
+
+
+_VIEW_FUNCS = {"indices": _indices_view, "topgl": _topgl_view, "stonk": _stonk_view}
+
+
+# ============================================
+# Incremental terminal renderer
+# ============================================
+
+class Screen:
+    """
+    Draws a table once, then rewrites only the cells that changed
+
+    Without a terminal (output piped to a file) every changed frame is
+    printed in full instead.
+    """
+
+    HEADER_LINES = 4  # title, rule, column names, rule
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.ansi = self.stream.isatty()
+        self.layout = None
+        self.rows = None
+        if self.ansi and os.name == "nt":
+            os.system("")  # enables ANSI escape handling in the Windows console
+
+    def _write(self, text):
+        self.stream.write(text)
+
+    def _line(self, cells, columns):
+        return " ".join(str(cell)[:width].ljust(width) for cell, (_, width) in zip(cells, columns))
+
+    def _full_redraw(self, title, columns, rows):
+        width = sum(w for _, w in columns) + len(columns) - 1
+        self._write("\x1b[?25l\x1b[2J\x1b[H" if self.ansi else "\n")
+        self._write(f"{title}\n{'=' * width}\n{self._line([c for c, _ in columns], columns)}\n{'-' * width}\n")
+        for cells in rows:
+            self._write(self._line(cells, columns) + "\n")
+
+    def draw(self, title, columns, rows, status):
+        """Render a frame, touching only the cells that differ from the last one"""
+        if not self.ansi:
+            if rows != self.rows:
+                self._full_redraw(title, columns, rows)
+                self._write(status + "\n")
+                self.stream.flush()
+            self.rows = rows
+            return
+
+        layout = (title, tuple(columns))
+        if self.layout != layout:
+            self._full_redraw(title, columns, rows)
+            self.layout, self.rows = layout, rows
+            self._status(status)
+            self.stream.flush()
+            return
+
+        for r, cells in enumerate(rows):
+            previous = self.rows[r] if r < len(self.rows) else None
+            line_no = self.HEADER_LINES + r + 1
+            col = 1
+            for c, (cell, (_, width)) in enumerate(zip(cells, columns)):
+                if previous is None or c >= len(previous) or previous[c] != cell:
+                    self._write(f"\x1b[{line_no};{col}H" + str(cell)[:width].ljust(width))
+                col += width + 1
+        for r in range(len(rows), len(self.rows)):
+            self._write(f"\x1b[{self.HEADER_LINES + r + 1};1H\x1b[K")
+        self.rows = rows
+        self._status(status)
+        self.stream.flush()
+
+    def _status(self, status):
+        line_no = self.HEADER_LINES + len(self.rows) + 2
+        self._write(f"\x1b[{line_no};1H\x1b[K{status}\x1b[J")
+
+    def close(self):
+        if self.ansi:
+            self._write("\x1b[?25h\n")
+            self.stream.flush()
+
+
+# ============================================
+# Poll loop
+# ============================================
+
+def next_delay(interval, closed_polls, now=None):
+    """Seconds to sleep before the next poll"""
+    if nepse_http.market_is_open(now):
+        return interval
+    backoff = min(interval * 2 ** min(closed_polls, 10), CLOSED_BACKOFF_MAX)
+    return max(interval, min(backoff, nepse_http.seconds_until_open(now)))
+
+
+def watch(view="indices", symbols=None, interval=DEFAULT_INTERVAL, stream=None):
+    """
+    Poll ``view`` until interrupted (Ctrl+C)
+
+    Args:
+        view: One of VIEWS
+        symbols: Stock symbols for the ``stonk`` view
+        interval: Seconds between polls while the market is open
+        stream: Output stream (defaults to sys.stdout)
+    """
+    view_func = _VIEW_FUNCS[view]
+    symbols = list(dict.fromkeys(s.upper() for s in (symbols or [])))
+    interval = max(MIN_INTERVAL, interval)
+    # Pages older than one interval are revalidated instead of served from cache
+    nepse_http.set_max_market_ttl(interval)
+
+    screen = Screen(stream)
+    frame = None
+    closed_polls = 0
+    try:
+        while True:
+            nepse_http.clear_memo()
+            error = None
+            with nepse_http.deadline(nepse_http.COMMAND_DEADLINE) as budget:
+                try:
+                    frame = view_func(symbols)
+                except Exception as e:
+                    error = str(e)[:80]
+
+            if nepse_http.market_is_open():
+                closed_polls = 0
+                session = "market open"
+            else:
+                closed_polls += 1
+                session = "market closed"
+            delay = next_delay(interval, closed_polls)
+
+            status = f"Updated {datetime.now().strftime('%H:%M:%S')} · {session} · next in {int(delay)}s · Ctrl+C to stop"
+            if error:
+                status = f"⚠️  {error} · retry in {int(delay)}s"
+            elif budget.notes:
+                status = f"⚠️  {len(budget.notes)} source(s) slow or down, showing cached data · " + status
+            if frame is not None:
+                screen.draw(*frame, status)
+            else:
+                screen.stream.write(status + "\n")
+                screen.stream.flush()
+            time.sleep(delay)
+    finally:
+        screen.close()
@@ -5,10 +5,13 @@ setup(
     version="1.0.0",
     description="Meroshare IPO automation CLI for family members",
     author="MenaceXnadin",
-    py_modules=["main", "nepse_cli"],
+    py_modules=["main", "nepse_cli", "nepse_resilience", "nepse_events", "nepse_config", "nepse_dp", "nepse_bench", "nepse_http", "nepse_market", "nepse_watch", "nepse_history", "nepse_portfolio", "nepse_ipo", "nepse_server", "nepse_prefetch", "nepse_screen"],
     install_requires=[
         "playwright>=1.40.0",
     ],
+    extras_require={
+        "analytics": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             "nepse=nepse_cli:main",
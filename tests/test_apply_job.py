@@ -0,0 +1,97 @@
+"""Tests for the declarative apply-all job file (main.load_apply_job and helpers)"""
+import json
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from main import JobSpecError, _match_job_issue, _select_job_members, load_apply_job  # noqa: E402
+
+MEMBERS = [
+    {"name": "Dad", "applied_kitta": 10},
+    {"name": "Mom", "applied_kitta": 10},
+    {"name": "Ram", "applied_kitta": 10},
+]
+IPOS = [
+    {"company_name": "Sanima Hydro Limited", "row_text": "SANIMA HYDRO LIMITED (SHL) IPO ORDINARY SHARES"},
+    {"company_name": "Some Hydropower Limited", "row_text": "SOME HYDROPOWER LIMITED (SHPL) IPO ORDINARY SHARES"},
+]
+
+
+@pytest.fixture
+def write_job(tmp_path):
+    def write(data):
+        path = tmp_path / "job.json"
+        path.write_text(data if isinstance(data, str) else json.dumps(data))
+        return str(path)
+    return write
+
+
+def test_minimal_job_gets_defaults(write_job):
+    job = load_apply_job(write_job({"issue": {"symbol": " shl "}}))
+    assert job == {"members": "all", "issue": {"company": "", "symbol": "SHL"}, "kitta": {},
+                   "on_login_failure": "continue", "on_apply_failure": "continue"}
+
+
+def test_full_job_is_normalised(write_job):
+    job = load_apply_job(write_job({
+        "members": ["Dad", " Mom "], "issue": {"company": "Sanima"}, "kitta": {"Dad": "20", "default": 10},
+        "on_login_failure": "abort", "on_apply_failure": "continue",
+    }))
+    assert job["members"] == ["Dad", "Mom"]
+    assert job["kitta"] == {"dad": 20, "default": 10}
+    assert job["on_login_failure"] == "abort"
+
+
+@pytest.mark.parametrize("data, message", [
+    ("{not json", "not valid JSON"),
+    ([], "JSON object"),
+    ({"issue": "SHL"}, "'issue' must be an object"),
+    ({"issue": {"symbol": ["SHL"]}}, "'issue.symbol' must be text"),
+    ({"issue": {}}, "'company' and/or 'symbol'"),
+    ({}, "'company' and/or 'symbol'"),
+    ({"issue": {"symbol": "SHL"}, "members": "Dad"}, "'members' must be"),
+    ({"issue": {"symbol": "SHL"}, "members": []}, "'members' must be"),
+    ({"issue": {"symbol": "SHL"}, "members": ["Dad", 3]}, "'members' entries"),
+    ({"issue": {"symbol": "SHL"}, "members": [{"name": "Dad"}]}, "'members' entries"),
+    ({"issue": {"symbol": "SHL"}, "members": [""]}, "'members' entries"),
+    ({"issue": {"symbol": "SHL"}, "kitta": [10]}, "'kitta' must map"),
+    ({"issue": {"symbol": "SHL"}, "kitta": {"Dad": "ten"}}, "whole numbers"),
+    ({"issue": {"symbol": "SHL"}, "on_apply_failure": "retry"}, "'on_apply_failure' must be one of"),
+])
+def test_invalid_jobs_raise_job_spec_error(write_job, data, message):
+    with pytest.raises(JobSpecError, match=message):
+        load_apply_job(write_job(data))
+
+
+def test_missing_job_file(tmp_path):
+    with pytest.raises(JobSpecError, match="Cannot read"):
+        load_apply_job(str(tmp_path / "missing.json"))
+
+
+def test_select_all_members_with_kitta_overrides():
+    job = {"members": "all", "kitta": {"mom": 50, "default": 20}}
+    selected = _select_job_members(MEMBERS, job)
+    assert [(m["name"], m["applied_kitta"]) for m in selected] == [("Dad", 20), ("Mom", 50), ("Ram", 20)]
+    assert MEMBERS[1]["applied_kitta"] == 10  # family config is not modified
+
+
+def test_select_named_members_in_job_order():
+    selected = _select_job_members(MEMBERS, {"members": ["ram", "DAD"], "kitta": {}})
+    assert [(m["name"], m["applied_kitta"]) for m in selected] == [("Ram", 10), ("Dad", 10)]
+
+
+def test_select_unknown_member_raises():
+    with pytest.raises(JobSpecError, match="Unknown member.*Sita"):
+        _select_job_members(MEMBERS, {"members": ["Dad", "Sita"], "kitta": {}})
+
+
+def test_match_issue_by_symbol_as_whole_word():
+    assert _match_job_issue(IPOS, {"company": "", "symbol": "SHPL"}) is IPOS[1]
+    assert _match_job_issue(IPOS, {"company": "", "symbol": "SH"}) is None
+
+
+def test_match_issue_by_company_substring_and_symbol():
+    assert _match_job_issue(IPOS, {"company": "hydro", "symbol": ""}) is IPOS[0]
+    assert _match_job_issue(IPOS, {"company": "hydro", "symbol": "SHPL"}) is IPOS[1]
+    assert _match_job_issue(IPOS, {"company": "sanima", "symbol": "SHPL"}) is None
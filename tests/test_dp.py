@@ -0,0 +1,88 @@
+"""Tests for the cached DP directory (nepse_dp)"""
+import time
+
+import pytest
+
+import nepse_dp
+from nepse_dp import DPDirectory, load_dp_directory
+
+ENTRIES = [
+    {"id": 128, "code": "13700", "name": "NMB CAPITAL LIMITED"},
+    {"id": 129, "code": "10600", "name": "NABIL INVESTMENT BANKING LTD."},
+    {"id": 130, "code": "11000", "name": "GLOBAL IME CAPITAL LIMITED"},
+    {"id": 131, "code": "12300", "name": "NIC ASIA CAPITAL LIMITED"},
+]
+
+
+@pytest.fixture
+def directory():
+    return DPDirectory(ENTRIES)
+
+
+def names(results):
+    return [dp["name"] for dp in results]
+
+
+def test_exact_lookup_by_id_or_code(directory):
+    assert directory.get(" 129 ")["code"] == "10600"
+    assert directory.get("13700")["id"] == 128
+    assert directory.get("999") is None
+    assert directory.search("11000") == [directory.get("130")]
+
+
+def test_search_prefix_matches_every_token(directory):
+    assert names(directory.search("nmb")) == ["NMB CAPITAL LIMITED"]
+    assert names(directory.search("cap lim")) == ["GLOBAL IME CAPITAL LIMITED", "NIC ASIA CAPITAL LIMITED",
+                                                  "NMB CAPITAL LIMITED"]
+    assert names(directory.search("nic cap")) == ["NIC ASIA CAPITAL LIMITED"]
+
+
+def test_search_ranks_name_prefix_first_and_limits(directory):
+    assert names(directory.search("n", limit=2)) == ["NABIL INVESTMENT BANKING LTD.", "NIC ASIA CAPITAL LIMITED"]
+    assert names(directory.search("global ime"))[0] == "GLOBAL IME CAPITAL LIMITED"
+
+
+def test_search_falls_back_to_close_spellings(directory):
+    assert names(directory.search("nabill")) == ["NABIL INVESTMENT BANKING LTD."]
+    assert directory.search("zzzz") == []
+    assert directory.search("  ") == []
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, monkeypatch):
+    path = tmp_path / "dp_directory.json"
+    monkeypatch.setattr(nepse_dp, "DP_CACHE_FILE", path)
+    monkeypatch.setattr(nepse_dp, "DATA_DIR", tmp_path)
+    return path
+
+
+def test_load_downloads_once_then_uses_snapshot(snapshot_file, monkeypatch):
+    calls = []
+    monkeypatch.setattr(nepse_dp, "fetch_dp_entries", lambda timeout=10: calls.append(1) or ENTRIES)
+    assert len(load_dp_directory()) == 4
+    assert len(load_dp_directory()) == 4
+    assert len(calls) == 1
+    load_dp_directory(refresh=True)
+    assert len(calls) == 2
+
+
+def test_load_serves_stale_snapshot_when_download_fails(snapshot_file, monkeypatch):
+    monkeypatch.setattr(nepse_dp, "fetch_dp_entries", lambda timeout=10: ENTRIES)
+    load_dp_directory()
+
+    def offline(timeout=10):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(nepse_dp, "fetch_dp_entries", offline)
+    directory = load_dp_directory(ttl=0)
+    assert directory.stale and len(directory) == 4
+    assert directory.fetched_at <= time.time()
+
+
+def test_load_raises_without_any_snapshot(snapshot_file, monkeypatch):
+    def offline(timeout=10):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(nepse_dp, "fetch_dp_entries", offline)
+    with pytest.raises(ConnectionError):
+        load_dp_directory()
@@ -0,0 +1,145 @@
+"""Tests for the nepse_http disk cache, revalidation and deadline fallback"""
+import time
+
+import pytest
+
+import nepse_http
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+
+
+class FakeSession:
+    """Replays queued responses (or raises queued exceptions) and records requests"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests.append({"url": url, "timeout": timeout, "headers": headers or {}})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+URL = "https://example.test/page"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(nepse_http, "CACHE_DIR", tmp_path)
+    nepse_http.set_cache_enabled(True)
+    nepse_http.clear_memo()
+    yield tmp_path
+    nepse_http.clear_memo()
+
+
+def expire(url=URL):
+    meta, body = nepse_http._read_cache(url)
+    meta["fetched_at"] -= 3600
+    nepse_http._write_cache(url, meta)
+
+
+def test_fresh_entry_is_served_without_a_request():
+    session = FakeSession(FakeResponse(200, b"v1"))
+    first = nepse_http.fetch(URL, ttl=60, session=session)
+    second = nepse_http.fetch(URL, ttl=60, session=session)
+    assert (first.from_cache, second.from_cache) == (False, True)
+    assert second.content == b"v1"
+    assert len(session.requests) == 1
+
+
+def test_expired_entry_is_revalidated_and_304_keeps_the_body():
+    session = FakeSession(FakeResponse(200, b"v1", {"ETag": '"abc"', "Last-Modified": "Sun, 18 Oct 2026"}),
+                          FakeResponse(304))
+    nepse_http.fetch(URL, ttl=60, session=session)
+    expire()
+    before = time.time()
+    response = nepse_http.fetch(URL, ttl=60, session=session)
+    assert session.requests[1]["headers"] == {"If-None-Match": '"abc"', "If-Modified-Since": "Sun, 18 Oct 2026"}
+    assert response.from_cache and response.content == b"v1" and not response.stale
+    assert response.fetched_at >= before  # revalidated entry is fresh again
+    assert nepse_http.fetch(URL, ttl=60, session=session).from_cache
+
+
+def test_changed_page_replaces_the_cached_body():
+    session = FakeSession(FakeResponse(200, b"v1"), FakeResponse(200, b"v2"))
+    nepse_http.fetch(URL, ttl=60, session=session)
+    expire()
+    assert nepse_http.fetch(URL, ttl=60, session=session).content == b"v2"
+    assert nepse_http._read_cache(URL)[1] == b"v2"
+
+
+def test_errors_are_not_cached():
+    session = FakeSession(FakeResponse(404, b"missing"), FakeResponse(200, b"v1"))
+    assert nepse_http.fetch(URL, ttl=60, session=session).status_code == 404
+    assert nepse_http.fetch(URL, ttl=60, session=session).content == b"v1"
+
+
+@pytest.mark.parametrize("failure, reason", [
+    (ConnectionError("down"), "Site unreachable"),
+    (FakeResponse(503, b"busy"), "HTTP 503"),
+])
+def test_failure_serves_stale_copy_with_a_note(failure, reason):
+    session = FakeSession(FakeResponse(200, b"v1"), failure)
+    nepse_http.fetch(URL, ttl=60, session=session)
+    expire()
+    with nepse_http.deadline(5) as budget:
+        response = nepse_http.fetch(URL, ttl=60, session=session)
+    assert response.stale and response.content == b"v1"
+    assert len(budget.notes) == 1 and budget.notes[0].startswith(reason)
+
+
+def test_failure_without_cache_raises():
+    with pytest.raises(ConnectionError):
+        nepse_http.fetch(URL, ttl=60, session=FakeSession(ConnectionError("down")))
+
+
+def test_spent_deadline_serves_stale_copy_without_a_request():
+    session = FakeSession(FakeResponse(200, b"v1"))
+    nepse_http.fetch(URL, ttl=60, session=session)
+    expire()
+    with nepse_http.deadline(0) as budget:
+        response = nepse_http.fetch(URL, ttl=60, session=session)
+    assert response.stale and response.content == b"v1"
+    assert len(session.requests) == 1
+    assert budget.notes[0].startswith("Deadline reached")
+
+
+def test_spent_deadline_without_cache_raises():
+    session = FakeSession(FakeResponse(200, b"v1"))
+    with nepse_http.deadline(0), pytest.raises(nepse_http.DeadlineExceeded):
+        nepse_http.fetch(URL, ttl=60, session=session)
+    assert session.requests == []
+
+
+def test_request_timeout_is_capped_by_the_deadline():
+    session = FakeSession(FakeResponse(200, b"v1"))
+    with nepse_http.deadline(2):
+        nepse_http.fetch(URL, ttl=60, timeout=10, session=session)
+    assert session.requests[0]["timeout"] <= 2
+
+
+def test_nested_deadline_never_extends_the_outer_one():
+    with nepse_http.deadline(1) as outer:
+        with nepse_http.deadline(30) as inner:
+            assert inner is outer
+            assert nepse_http.remaining() <= 1
+
+
+def test_stale_fallback_is_not_memoized():
+    session = FakeSession(FakeResponse(200, b"v1"), ConnectionError("down"), FakeResponse(200, b"v2"))
+    nepse_http.fetch(URL, ttl=60, session=session)
+    expire()
+    parse = lambda response: response.content  # noqa: E731
+    assert nepse_http.fetch_parsed(URL, "body", parse, ttl=60, session=session) == b"v1"
+    assert nepse_http.fetch_parsed(URL, "body", parse, ttl=60, session=session) == b"v2"
+    assert nepse_http.fetch_parsed(URL, "body", parse, ttl=60, session=session) == b"v2"
+    assert len(session.requests) == 3
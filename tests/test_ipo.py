@@ -0,0 +1,126 @@
+"""Tests for the public-offering feed and change detection (nepse_ipo)"""
+import json
+from datetime import datetime
+
+import pytest
+
+import nepse_http
+import nepse_ipo
+from nepse_ipo import Offering, diff_offerings
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def row(symbol="SHL", status="Open", closing="2026-10-20T17:00:00", **fields):
+    data = {"symbol": symbol, "name": f"{symbol} Limited", "sector": "Hydro Power", "type": "IPO",
+            "for": "General Public", "units": 100000, "price": 100, "totalAmount": 10000000,
+            "openingDate": "2026-10-16T10:00:00", "closingDate": closing, "extendedClosingDate": None,
+            "issueManager": "Sample Capital", "status": status}
+    data.update(fields)
+    return data
+
+
+def offering(**fields):
+    return Offering.from_api(row(**fields))
+
+
+def kinds(changes):
+    return [(kind, o.symbol) for kind, o, _ in changes]
+
+
+def test_from_api_defaults_and_dates():
+    o = Offering.from_api({"symbol": "ABC", "closingDate": "2026-10-20T17:00:00", "openingDate": "soon"})
+    assert (o.name, o.units, o.price, o.status) == ("N/A", 0, 0, "N/A")
+    assert o.closing_date == datetime(2026, 10, 20, 17, 0)
+    assert o.opening_date is None
+    assert o.key == "ABC/N/A/N/A"
+
+
+def test_extended_closing_date_and_days_left():
+    o = offering(closing="2026-10-20T17:00:00", extendedClosingDate="2026-10-25T17:00:00")
+    assert o.final_closing_date == datetime(2026, 10, 25, 17, 0)
+    assert o.days_left(NOW) == 6
+    assert offering(closing=None).days_left(NOW) is None
+
+
+def test_closing_soon_only_while_open():
+    assert offering().closing_soon(NOW)
+    assert not offering(status="Closed").closing_soon(NOW)
+    assert not offering(closing="2026-10-30T17:00:00").closing_soon(NOW)
+    assert not offering(closing="2026-10-18T17:00:00").closing_soon(NOW)
+
+
+def test_first_poll_reports_new_offerings_but_not_closed_ones():
+    changes, state = diff_offerings([offering(), offering(symbol="OLD", status="Closed")], {}, NOW)
+    assert kinds(changes) == [("new", "SHL")]
+    assert set(state) == {"SHL/IPO/General Public", "OLD/IPO/General Public"}
+
+
+def test_unchanged_offerings_are_quiet():
+    _, state = diff_offerings([offering(closing="2026-10-30T17:00:00")], {}, NOW)
+    changes, _ = diff_offerings([offering(closing="2026-10-30T17:00:00")], state, NOW)
+    assert changes == []
+
+
+def test_changed_fields_are_reported_with_old_and_new_values():
+    _, state = diff_offerings([offering()], {}, NOW)
+    changes, _ = diff_offerings([offering(status="Closed", units=120000)], state, NOW)
+    assert kinds(changes) == [("changed", "SHL")]
+    assert changes[0][2] == {"status": ("Open", "Closed"), "units": (100000, 120000)}
+
+
+def test_closing_soon_is_reported_once():
+    _, state = diff_offerings([offering()], {}, datetime(2026, 10, 10))
+    changes, state = diff_offerings([offering()], state, NOW)
+    assert kinds(changes) == [("closing_soon", "SHL")]
+    changes, _ = diff_offerings([offering()], state, NOW)
+    assert changes == []
+
+
+def test_state_survives_json():
+    _, state = diff_offerings([offering()], {}, NOW)
+    changes, _ = diff_offerings([offering()], json.loads(json.dumps(state)), NOW)
+    assert changes == []
+
+
+def page_response(url, rows, number, total_pages):
+    body = {"success": True, "data": {"content": rows, "number": number, "totalPages": total_pages}}
+    return nepse_http.CachedResponse(url, 200, json.dumps(body).encode(), {}, from_cache=True)
+
+
+@pytest.fixture
+def replay():
+    def use(responses):
+        nepse_http.set_replay({r.url: r for r in responses})
+    yield use
+    nepse_http.set_replay(None)
+    nepse_http.clear_memo()
+
+
+def test_fetch_reads_every_page_and_drops_duplicates(replay):
+    replay([page_response(nepse_ipo.IPO_API_URL, [row("A"), row("B")], 1, 3),
+            page_response(nepse_ipo._page_url(2), [row("B"), row("C")], 2, 3),
+            page_response(nepse_ipo._page_url(3), [row("D")], 3, 3)])
+    offerings, complete = nepse_ipo._fetch_all()
+    assert [o.symbol for o in offerings] == ["A", "B", "C", "D"]
+    assert complete
+
+
+def test_failed_page_is_left_out_and_noted(replay):
+    replay([page_response(nepse_ipo.IPO_API_URL, [row("A")], 0, 2)])  # page 1 not recorded
+    with nepse_http.deadline(5) as budget:
+        offerings, complete = nepse_ipo._fetch_all()
+    assert [o.symbol for o in offerings] == ["A"] and not complete
+    assert budget.notes == ["IPO feed incomplete: 1 of 2 pages failed or ran out of time"]
+
+
+def test_poll_keeps_state_of_offerings_on_missing_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(nepse_ipo, "IPO_STATE_FILE", tmp_path / "ipo_state.json")
+    monkeypatch.setattr(nepse_ipo, "_fetch_all", lambda: ([offering(symbol="A"), offering(symbol="B")], True))
+    assert kinds(nepse_ipo.poll_changes()) == [("new", "A"), ("new", "B")]
+
+    monkeypatch.setattr(nepse_ipo, "_fetch_all", lambda: ([offering(symbol="A")], False))
+    assert nepse_ipo.poll_changes() == []
+
+    monkeypatch.setattr(nepse_ipo, "_fetch_all", lambda: ([offering(symbol="A"), offering(symbol="B")], True))
+    assert nepse_ipo.poll_changes() == []  # B was not seen, not removed: it is not new again
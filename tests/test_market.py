@@ -0,0 +1,84 @@
+"""Tests for market page parsing and MarketSnapshot (nepse_market)"""
+import json
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+import nepse_market  # noqa: E402
+from nepse_market import IndexRecord, MarketSnapshot, parse_market_html, to_float  # noqa: E402
+
+HEADER = "<tr><th>Index</th><th>Open</th><th>High</th><th>Low</th><th>Close</th><th>Point</th>" \
+         "<th>%</th><th>Turnover</th></tr>"
+
+
+def table(rows):
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f'<table class="{nepse_market.INDEX_TABLE_CLASS}">{HEADER}{body}</table>'
+
+
+MAIN = [("NEPSE Index", "2,700.10", "2,731.55", "2,690.00", "2,720.45", "20.35", "0.75%", "5,123,456,789.00"),
+        ("Sensitive Index", "480.1", "485.2", "478.0", "484.9", "-", "-", "-")]
+SUB = [("Banking SubIndex", "1,500.00", "1,520.00", "1,495.00", "1,510.00", "-10.00", "-0.66%", "900,000.00"),
+       ("Hydropower Index", "3,000", "3,100", "2,950", "3,050", "+50", "+1.67%", "1,000")]
+PAGE = "<html><body>" + "".join([
+    table(MAIN),
+    table([("Float", "1", "1", "1", "1", "0", "0", "0")]),
+    '<table class="table">' + HEADER + "</table>",  # other markup between the index tables
+    table([("Sensitive Float", "1", "1", "1", "1", "0", "0", "0")]),
+    table(SUB),
+]) + "</body></html>"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2,345.6", 2345.6), ("+1.2%", 1.2), ("-0.66%", -0.66), (" 12 ", 12.0), ("-", None), ("", None), (None, None),
+])
+def test_to_float(text, expected):
+    assert to_float(text) == expected
+
+
+@pytest.mark.parametrize("targeted", [True, False])
+def test_parse_market_html(monkeypatch, targeted):
+    monkeypatch.setattr(nepse_market, "TARGETED_PARSING", targeted)
+    snapshot = parse_market_html(PAGE, fetched_at=123.0, source_hash="abc")
+    assert [rec.name for rec in snapshot.indices] == ["NEPSE Index", "Sensitive Index"]
+    nepse = snapshot.index("nepse index")
+    assert (nepse.close, nepse.point_change, nepse.pct_change, nepse.turnover) == \
+        (2720.45, 20.35, 0.75, 5123456789.0)
+    assert snapshot.index("Sensitive Index").pct_change is None
+    assert snapshot.sub_index("BANKING").pct_change == -0.66
+    assert snapshot.sub_index("hydropower index").close == 3050.0
+    assert (snapshot.fetched_at, snapshot.source_hash) == (123.0, "abc")
+
+
+def test_parse_page_without_tables_is_empty():
+    snapshot = parse_market_html("<html><body><p>maintenance</p></body></html>")
+    assert snapshot.indices == [] and snapshot.sub_indices == []
+    assert snapshot.index("NEPSE Index") is None
+
+
+def test_snapshot_round_trips_through_json():
+    snapshot = parse_market_html(PAGE, fetched_at=123.0, source_hash="abc")
+    restored = MarketSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+    assert restored == snapshot
+    assert isinstance(restored.indices[0], IndexRecord)
+
+
+def test_trend():
+    assert IndexRecord("A", *[None] * 5, 1.0, None).trend == "📈"
+    assert IndexRecord("A", *[None] * 5, -1.0, None).trend == "📉"
+    assert IndexRecord("A", *[None] * 5, 0.0, None).trend == "➡️"
+    assert IndexRecord("A", *[None] * 7).trend == "📊"
+
+
+def test_unchanged_page_reuses_the_saved_snapshot(tmp_path, monkeypatch):
+    import nepse_history
+    import nepse_http
+
+    monkeypatch.setattr(nepse_market, "SNAPSHOT_FILE", tmp_path / "snapshot.json")
+    monkeypatch.setattr(nepse_history, "HISTORY_DB", tmp_path / "history.sqlite3")
+    response = nepse_http.CachedResponse(nepse_market.MARKET_URL, 200, PAGE.encode(), {}, fetched_at=123.0)
+    first = nepse_market.snapshot_from_response(response)
+    monkeypatch.setattr(nepse_market, "parse_market_html", lambda *args: pytest.fail("page parsed again"))
+    assert nepse_market.snapshot_from_response(response) == first
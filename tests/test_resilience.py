@@ -0,0 +1,307 @@
+"""Tests for nepse_resilience retry and circuit-breaker helpers"""
+import time
+
+import pytest
+
+from nepse_resilience import (CircuitBreaker, CircuitOpenError, PermanentError, RateGovernor, RetryPolicy,
+                              TokenBucket, retry_call)
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0, jitter=0)
+
+
+class Flaky:
+    """Callable failing the first ``failures`` calls, then returning 'ok'"""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, attempt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(f"failure {self.calls}")
+        return "ok"
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# RetryPolicy
+
+def test_policy_delay_doubles_up_to_max_without_jitter():
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=5.0, jitter=0)
+    assert [policy.delay(a) for a in range(1, 5)] == [1.0, 2.0, 4.0, 5.0]
+
+
+def test_policy_jitter_stays_within_cap():
+    policy = RetryPolicy(base_delay=4.0, max_delay=30.0, jitter=0.5)
+    for _ in range(100):
+        assert 2.0 <= policy.delay(1) <= 4.0
+
+
+def test_policy_clamps_arguments():
+    policy = RetryPolicy(max_attempts=0, jitter=3)
+    assert policy.max_attempts == 1
+    assert policy.jitter == 1.0
+
+
+# CircuitBreaker
+
+def test_breaker_opens_after_threshold_and_refuses_calls():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    trip(breaker)
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.05)
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_release_frees_probe_without_outcome():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+# retry_call
+
+def test_retry_call_retries_until_success():
+    func = Flaky(2)
+    retries = []
+    assert retry_call(func, FAST, on_retry=lambda a, e, d: retries.append(a)) == "ok"
+    assert func.calls == 3
+    assert retries == [1, 2]
+
+
+def test_retry_call_raises_last_error_when_exhausted():
+    func = Flaky(5)
+    with pytest.raises(ConnectionError, match="failure 3"):
+        retry_call(func, FAST)
+    assert func.calls == 3
+
+
+def test_retry_call_passes_attempt_numbers():
+    seen = []
+
+    def func(attempt):
+        seen.append(attempt)
+        if attempt < 3:
+            raise ValueError("again")
+        return attempt
+
+    assert retry_call(func, FAST) == 3
+    assert seen == [1, 2, 3]
+
+
+def test_retry_call_does_not_retry_permanent_error():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    func = Flaky(5, error=PermanentError)
+    with pytest.raises(PermanentError):
+        retry_call(func, FAST, breaker)
+    assert func.calls == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_call_only_retries_listed_errors():
+    func = Flaky(1, error=KeyError)
+    with pytest.raises(KeyError):
+        retry_call(func, FAST, retry_on=(ConnectionError,))
+    assert func.calls == 1
+
+
+def test_retry_call_refuses_while_open():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    trip(breaker)
+    func = Flaky(0)
+    with pytest.raises(CircuitOpenError):
+        retry_call(func, RetryPolicy(max_attempts=1), breaker)
+    assert func.calls == 0
+
+
+def test_retry_call_success_closes_half_open_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    assert retry_call(Flaky(0), FAST, breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_nested_call_during_half_open_uses_outer_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    inner = Flaky(0)
+
+    def outer(attempt):
+        return retry_call(inner, FAST, breaker) + "!"
+
+    assert retry_call(outer, FAST, breaker) == "ok!"
+    assert inner.calls == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_nested_failures_count_once_at_outer_level():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    inner = Flaky(3)
+
+    def outer(attempt):
+        return retry_call(inner, FAST, breaker)
+
+    with pytest.raises(ConnectionError):
+        retry_call(outer, RetryPolicy(max_attempts=1), breaker)
+    assert inner.calls == 3
+    assert breaker.state == CircuitBreaker.CLOSED  # one failure, not three
+    assert breaker.allow()
+
+
+def test_circuit_open_error_from_func_is_not_a_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    trip(breaker)
+    func = Flaky(1, error=CircuitOpenError)
+    assert retry_call(func, FAST, breaker) == "ok"
+    assert func.calls == 2
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_recovers_for_later_members_after_outage():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    server = {"down": True, "calls": 0}
+
+    def listing(attempt):
+        server["calls"] += 1
+        if server["down"]:
+            raise ConnectionError("503")
+
+    def apply(attempt):
+        retry_call(listing, FAST, breaker)
+        return "applied"
+
+    with pytest.raises(ConnectionError):
+        retry_call(apply, RetryPolicy(max_attempts=2, base_delay=0, jitter=0), breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    server["down"] = False
+    time.sleep(0.06)
+    calls_before = server["calls"]
+    for _ in range(3):
+        assert retry_call(apply, FAST, breaker) == "applied"
+    assert server["calls"] == calls_before + 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# TokenBucket and RateGovernor
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_up_to_capacity_then_queues():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    assert [bucket._reserve(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket._reserve(1) == pytest.approx(0.5)
+    assert bucket._reserve(1) == pytest.approx(1.0)  # reservations queue behind each other
+    assert bucket.stats()["queued"] == 2
+
+
+def test_bucket_refills_at_rate_but_not_past_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    bucket._reserve(2)
+    clock.now += 0.5
+    assert bucket._reserve(1) == 0.0
+    assert bucket._reserve(1) == pytest.approx(0.5)
+    clock.now += 60
+    assert [bucket._reserve(1) for _ in range(2)] == [0.0, 0.0]
+    assert bucket._reserve(1) > 0
+
+
+def test_bucket_with_zero_rate_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.acquire() == 0.0 for _ in range(10))
+
+
+def test_bucket_acquire_sleeps_for_the_reserved_wait():
+    bucket = TokenBucket(rate=50, capacity=1)
+    bucket.acquire()
+    started = time.monotonic()
+    waited = bucket.acquire()
+    assert waited == pytest.approx(0.02, abs=0.01)
+    assert time.monotonic() - started >= waited * 0.9
+
+
+def test_buckets_sharing_a_state_file_share_one_budget(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "bucket.json"
+    first = TokenBucket(rate=1, capacity=2, state_file=path, clock=clock)
+    second = TokenBucket(rate=1, capacity=2, state_file=path, clock=clock)
+    assert first._reserve(1) == 0.0
+    assert second._reserve(1) == 0.0
+    assert first._reserve(1) == pytest.approx(1.0)
+    assert second._reserve(1) == pytest.approx(2.0)
+    clock.now += 10
+    assert second._reserve(1) == 0.0
+
+
+def test_governors_sharing_a_state_dir_share_limits(tmp_path):
+    first = RateGovernor("example.test", requests_per_sec=2, logins_per_sec=0.5, state_dir=tmp_path)
+    second = RateGovernor("example.test", requests_per_sec=2, logins_per_sec=0.5, state_dir=tmp_path)
+    assert first.requests._reserve(1) == 0.0
+    assert first.requests._reserve(1) == 0.0
+    assert second.requests._reserve(1) == pytest.approx(0.5, abs=0.05)
+    assert second.logins._reserve(1) == 0.0
+    assert first.logins._reserve(1) == pytest.approx(2.0, abs=0.05)
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == \
+        ["example.test.logins.json", "example.test.requests.json"]
+
+
+def test_governor_without_state_dir_keeps_limits_per_instance():
+    first = RateGovernor("example.test", requests_per_sec=1)
+    second = RateGovernor("example.test", requests_per_sec=1)
+    assert first.requests._reserve(1) == 0.0
+    assert second.requests._reserve(1) == 0.0
+
+
+def test_governor_login_also_counts_as_request_and_reports():
+    governor = RateGovernor("example.test", requests_per_sec=100, logins_per_sec=100)
+    governor.login()
+    governor.request()
+    stats = governor.stats()
+    assert (stats["requests"]["acquired"], stats["logins"]["acquired"]) == (2, 1)
+    assert governor.report().startswith("Rate governor (example.test): 2 requests, 1 logins")
+
+
+def test_governor_configure_replaces_only_given_rates():
+    governor = RateGovernor("example.test", requests_per_sec=2, logins_per_sec=0.5)
+    logins = governor.logins
+    governor.configure(requests_per_sec=5)
+    assert governor.requests.rate == 5
+    assert governor.logins is logins
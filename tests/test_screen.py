@@ -0,0 +1,199 @@
+"""Tests for nepse_screen screening, sector aggregation and leaderboards"""
+import pytest
+
+from nepse_screen import (PriceTable, aggregate_sectors, column_name, leaderboard, load_table,
+                          uses_sector)
+
+
+def quote(close, pct_change, volume, high=None, low=None, prev_close=None):
+    prev_close = prev_close if prev_close is not None else close / (1 + pct_change / 100)
+    return {"close": close, "pt_change": close - prev_close, "pct_change": pct_change, "open": prev_close,
+            "high": high if high is not None else close, "low": low if low is not None else close,
+            "volume": volume, "prev_close": prev_close, "as_of": "2026-10-19 15:00"}
+
+
+PRICES = {
+    "NABIL": quote(500.0, 2.0, 10000, high=510, low=490, prev_close=490.2),
+    "NICA": quote(400.0, -1.5, 5000),
+    "HIDCL": quote(200.0, 6.0, 200000, high=210, low=190, prev_close=188.68),
+    "UPPER": quote(300.0, -4.0, 80000),
+    "API": quote(250.0, 0.0, 0),
+}
+SECTORS = {"NABIL": "Commercial Banks", "NICA": "Commercial Banks", "HIDCL": "Hydro Power",
+           "UPPER": "Hydro Power"}
+
+
+@pytest.fixture
+def table():
+    pytest.importorskip("numpy")
+    return PriceTable.from_quotes(PRICES).with_sectors(SECTORS)
+
+
+def symbols(rows):
+    return [row["symbol"] for row in rows]
+
+
+# Columns and filters
+
+def test_column_name_resolves_aliases_and_case():
+    assert column_name("LTP") == "ltp"
+    assert column_name(" pct ") == "pct_change"
+    assert column_name("vol") == "volume"
+
+
+def test_column_name_rejects_unknown_column():
+    with pytest.raises(ValueError, match="unknown column"):
+        column_name("eps")
+
+
+def test_uses_sector():
+    assert uses_sector(["sector==Hydropower"], "pct_change")
+    assert uses_sector([], "Sector")
+    assert not uses_sector(["pct>5"], "turnover")
+
+
+def test_from_quotes_derives_turnover_and_range(table):
+    row = table.screen(["symbol==NABIL"])[0]
+    assert row["turnover"] == 500.0 * 10000
+    assert row["range_pct"] == pytest.approx((510 - 490) / 490.2 * 100)
+    assert table.screen(["symbol==API"])[0]["range_pct"] == 0
+
+
+def test_numeric_filters(table):
+    assert symbols(table.screen(["pct_change>5"])) == ["HIDCL"]
+    assert set(symbols(table.screen(["pct_change<=0"]))) == {"NICA", "UPPER", "API"}
+    assert symbols(table.screen(["volume>=80,000", "pct<0"])) == ["UPPER"]
+    assert symbols(table.screen(["pct_change=0"])) == ["API"]
+
+
+def test_text_filters_ignore_case_and_spacing(table):
+    assert set(symbols(table.screen(["sector==hydropower"]))) == {"HIDCL", "UPPER"}
+    assert set(symbols(table.screen(["sector!='Hydro Power'"]))) == {"NABIL", "NICA", "API"}
+    assert symbols(table.screen(["sector==Unknown"])) == ["API"]
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("pct_change", "bad filter"),
+    ("eps>5", "unknown column"),
+    ("volume>lots", "is not a number"),
+    ("sector>Banks", "only supports"),
+])
+def test_bad_filters(table, expression, message):
+    with pytest.raises(ValueError, match=message):
+        table.mask(expression)
+
+
+def test_sector_column_must_be_loaded():
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError, match="not loaded"):
+        PriceTable.from_quotes(PRICES).screen(["sector==Hydro Power"])
+
+
+def test_screen_sorts_and_limits(table):
+    assert symbols(table.screen(sort="pct_change")) == ["HIDCL", "NABIL", "API", "NICA", "UPPER"]
+    assert symbols(table.screen(sort="pct_change", descending=False, limit=2)) == ["UPPER", "NICA"]
+    assert symbols(table.screen(sort="symbol", descending=False)) == ["API", "HIDCL", "NABIL", "NICA", "UPPER"]
+
+
+def test_screen_rows_are_plain_python(table):
+    row = table.screen(limit=1)[0]
+    assert type(row["volume"]) is float
+    assert type(row["symbol"]) is str
+
+
+def test_load_table_is_built_once_per_index():
+    pytest.importorskip("numpy")
+    first = load_table(PRICES)
+    assert load_table(PRICES) is first
+    assert load_table(dict(PRICES)) is not first
+
+
+# Sector aggregation
+
+def test_aggregate_sectors_totals(table):
+    rows = {row["sector"]: row for row in aggregate_sectors(table)}
+    hydro = rows["Hydro Power"]
+    assert hydro["symbols"] == 2
+    assert (hydro["advancers"], hydro["decliners"], hydro["unchanged"]) == (1, 1, 0)
+    assert hydro["volume"] == 280000
+    assert hydro["turnover"] == 200.0 * 200000 + 300.0 * 80000
+    assert hydro["pct_change"] == pytest.approx(1.0)
+    assert rows["Unknown"]["unchanged"] == 1
+    assert sum(row["turnover_share"] for row in rows.values()) == pytest.approx(100)
+
+
+def test_aggregate_sectors_sorting(table):
+    assert [row["sector"] for row in aggregate_sectors(table)] == ["Hydro Power", "Commercial Banks", "Unknown"]
+    assert [row["sector"] for row in aggregate_sectors(table, "sector")] == \
+        ["Commercial Banks", "Hydro Power", "Unknown"]
+    assert aggregate_sectors(table, "decliners")[0]["decliners"] == 1
+
+
+def test_aggregate_sectors_rejects_unknown_sort(table):
+    with pytest.raises(ValueError, match="cannot sort sectors"):
+        aggregate_sectors(table, "eps")
+
+
+def test_aggregate_sectors_without_turnover():
+    pytest.importorskip("numpy")
+    idle = PriceTable.from_quotes({"API": PRICES["API"]}).with_sectors({})
+    assert aggregate_sectors(idle)[0]["turnover_share"] == 0.0
+
+
+# Leaderboards
+
+def test_leaderboard_gainers_and_losers():
+    assert symbols(leaderboard(PRICES, "gainers")) == ["HIDCL", "NABIL"]
+    assert symbols(leaderboard(PRICES, "losers")) == ["UPPER", "NICA"]
+
+
+def test_leaderboard_turnover_and_volume_skip_untraded():
+    assert symbols(leaderboard(PRICES, "turnover", n=3)) == ["HIDCL", "UPPER", "NABIL"]
+    assert "API" not in symbols(leaderboard(PRICES, "volume", n=10))
+
+
+def test_leaderboard_matches_full_sort():
+    prices = {f"S{i}": quote(100 + i, ((i * 37) % 101 - 50) / 10, i * 13 % 97) for i in range(300)}
+    expected = sorted((s for s in prices if prices[s]["pct_change"] > 0),
+                      key=lambda s: prices[s]["pct_change"], reverse=True)[:15]
+    assert [row["pct_change"] for row in leaderboard(prices, "gainers", 15)] == \
+        [prices[s]["pct_change"] for s in expected]
+
+
+def test_leaderboard_sector_filter():
+    assert symbols(leaderboard(PRICES, "volume", sectors=SECTORS, sector="hydro power")) == ["HIDCL", "UPPER"]
+    assert leaderboard(PRICES, "gainers", sectors=SECTORS, sector="Finance") == []
+
+
+def test_leaderboard_rows_add_symbol_and_turnover():
+    row = leaderboard(PRICES, "gainers", n=1)[0]
+    assert row["symbol"] == "HIDCL"
+    assert row["turnover"] == 200.0 * 200000
+    assert "symbol" not in PRICES["HIDCL"]
+
+
+def test_leaderboard_skips_quotes_with_missing_values():
+    prices = dict(PRICES, BROKEN=dict(quote(100.0, 9.0, 100), pct_change=None),
+                  NOVOL=dict(quote(100.0, 8.0, 100), volume=None))
+    assert symbols(leaderboard(prices, "gainers")) == ["HIDCL", "NABIL"]
+    assert "NOVOL" not in symbols(leaderboard(prices, "volume"))
+
+
+def test_alpha_feed_nulls_parse_as_zero():
+    import nepse_cli
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"stock_live": {"asOf": "now", "prices": [
+                {"symbol": "nabil", "close": 500, "percent_change": None, "volume": None, "high": 510},
+                {"symbol": "upper", "close": "300.5", "percent_change": -4, "volume": 80000},
+                {"symbol": None, "close": 1},
+            ]}}
+
+    index = nepse_cli._parse_alpha_index(Response())
+    assert sorted(index) == ["NABIL", "UPPER"]
+    assert index["NABIL"]["pct_change"] == 0 and index["NABIL"]["volume"] == 0
+    assert index["UPPER"]["close"] == 300.5
+    assert symbols(leaderboard(index, "losers")) == ["UPPER"]